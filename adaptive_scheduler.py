@@ -0,0 +1,159 @@
+"""
+自适应检查调度器
+根据最近的检查与登录结果调整检查间隔：登录或失败后快速复查，链路稳定时逐步拉长间隔，
+认证门户不可用时指数退避并加入随机抖动
+"""
+
+import logging
+import random
+from typing import Any, Dict, Mapping, Optional
+
+
+class AdaptiveScheduler:
+    """自适应检查间隔计算器"""
+    
+    # 非自适应模式下发生错误后的等待时间（秒）
+    ERROR_INTERVAL = 30
+    
+    def __init__(self, min_interval: float = 15, max_interval: float = 300,
+                 backoff_factor: float = 2.0, stable_growth: float = 1.5,
+                 jitter: float = 0.1, adaptive: bool = True,
+                 rng: Optional[random.Random] = None):
+        """
+        初始化调度器
+        
+        Args:
+            min_interval: 检查间隔下限（秒），登录或失败后按此间隔快速复查
+            max_interval: 检查间隔上限（秒）
+            backoff_factor: 连续失败时的指数退避倍数
+            stable_growth: 网络正常时每次检查后间隔的增长倍数
+            jitter: 随机抖动比例（0.1表示±10%），避免多台机器同时探测
+            adaptive: 为False时固定使用max_interval，与旧版行为一致
+            rng: 随机数生成器，便于复现
+        """
+        self.min_interval = max(1.0, float(min_interval))
+        self.max_interval = max(self.min_interval, float(max_interval))
+        self.backoff_factor = max(1.0, backoff_factor)
+        self.stable_growth = max(1.0, stable_growth)
+        self.jitter = min(max(0.0, jitter), 0.5)
+        self.adaptive = adaptive
+        self.logger = logging.getLogger(__name__)
+        self._rng = rng or random.Random()
+        self._interval = self.min_interval
+        self._failures = 0
+        self._last_error = False
+        self.last_reason = '启动'
+    
+    @classmethod
+    def from_config(cls, scheduler_config: Mapping[str, Any]) -> 'AdaptiveScheduler':
+        """根据配置文件的scheduler部分创建调度器"""
+        check_interval = scheduler_config.get('check_interval', 300)
+        return cls(
+            # 未配置下限时不超过 check_interval，旧配置中较短的检查间隔仍然有效
+            min_interval=scheduler_config.get('min_interval', min(15, check_interval)),
+            max_interval=scheduler_config.get('max_interval', check_interval),
+            backoff_factor=scheduler_config.get('backoff_factor', 2.0),
+            stable_growth=scheduler_config.get('stable_growth', 1.5),
+            jitter=scheduler_config.get('jitter', 0.1),
+            adaptive=scheduler_config.get('adaptive', True)
+        )
+    
+    def apply_config(self, scheduler_config: Mapping[str, Any]) -> None:
+        """热更新间隔参数，保留连续失败次数等运行状态"""
+        fresh = self.from_config(scheduler_config)
+        for attr in ('min_interval', 'max_interval', 'backoff_factor', 'stable_growth', 'jitter', 'adaptive'):
+            setattr(self, attr, getattr(fresh, attr))
+        self._interval = min(self.max_interval, max(self.min_interval, self._interval))
+    
+    @property
+    def consecutive_failures(self) -> int:
+        """连续失败次数"""
+        return self._failures
+    
+    def _backoff(self) -> float:
+        """按连续失败次数计算退避间隔"""
+        return min(self.max_interval, self.min_interval * self.backoff_factor ** max(0, self._failures - 1))
+    
+    def restore(self, consecutive_failures: int) -> None:
+        """
+        按历史记录恢复连续失败次数
+        
+        重启或单次运行之间门户持续不可用时继续退避，而不是从最短间隔重新开始
+        """
+        self._failures = max(0, int(consecutive_failures))
+        if self._failures:
+            self._interval = self._backoff()
+            self.last_reason = f'历史记录中连续失败 {self._failures} 次，退避'
+    
+    def record_check(self, connected: bool) -> None:
+        """记录一次网络检查结果"""
+        self._last_error = False
+        if connected:
+            self._failures = 0
+            self._interval = min(self.max_interval, max(self._interval, self.min_interval) * self.stable_growth)
+            self.last_reason = '网络稳定'
+        else:
+            self._interval = self.min_interval
+            self.last_reason = '检测到断网'
+    
+    def record_login(self, success: bool) -> None:
+        """记录一次登录结果"""
+        self._last_error = False
+        if success:
+            self._failures = 0
+            self._interval = self.min_interval
+            self.last_reason = '登录后快速复查'
+        else:
+            self._failures += 1
+            self._interval = self._backoff()
+            self.last_reason = f'连续失败 {self._failures} 次，退避'
+    
+    def record_error(self) -> None:
+        """记录一次运行错误，按失败处理"""
+        self.record_login(False)
+        self._last_error = True
+    
+    def _apply_jitter(self, interval: float) -> float:
+        """加入随机抖动"""
+        if not self.jitter:
+            return interval
+        return interval * (1 + self._rng.uniform(-self.jitter, self.jitter))
+    
+    def next_interval(self) -> float:
+        """
+        计算距离下一次检查的等待时间（秒）
+        
+        Returns:
+            限制在[min_interval, max_interval]内并加入抖动的等待时间
+        """
+        if not self.adaptive:
+            return self.ERROR_INTERVAL if self._last_error else self.max_interval
+        
+        interval = self._apply_jitter(self._interval)
+        return round(min(self.max_interval, max(self.min_interval, interval)), 2)
+    
+    def retry_delay(self, attempt: int, base_delay: float) -> float:
+        """
+        计算登录重试前的等待时间
+        
+        Args:
+            attempt: 刚失败的尝试序号（从1开始）
+            base_delay: 配置的基础重试延迟（秒）
+        
+        Returns:
+            指数退避并加入抖动后的等待时间，不超过max_interval
+        """
+        if not self.adaptive:
+            return base_delay
+        
+        delay = base_delay * self.backoff_factor ** max(0, attempt - 1)
+        return round(min(self.max_interval, self._apply_jitter(delay)), 2)
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取调度器状态"""
+        return {
+            'adaptive': self.adaptive,
+            'current_interval': round(self._interval, 2),
+            'consecutive_failures': self._failures,
+            'reason': self.last_reason
+        }
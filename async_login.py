@@ -0,0 +1,318 @@
+"""
+异步批量登录
+基于asyncio并发执行大量账号/URL绑定的认证流程，适用于一台机器代理整栋宿舍楼账号的场景
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence
+
+from henu_login_lib import HENUAuthenticator, HENULoginError, PortalProtocol
+from metrics import record_login
+from response_classifier import QuickauthClassifier, QuickauthVerdict
+
+try:
+    import aiohttp
+    AIOHTTP_AVAILABLE = True
+except ImportError:
+    AIOHTTP_AVAILABLE = False
+
+
+class AsyncHENUAuthenticator(PortalProtocol):
+    """
+    异步网络认证器
+    
+    与HENUAuthenticator共用门户协议（请求构造与响应判定），
+    以非阻塞方式执行 auth → check → quickauth → verify 流程。
+    login() 是协程，不能代替同步认证器使用
+    """
+    
+    def __init__(self, timeout: int = 10, verify: bool = True, connector: Optional[Any] = None,
+                 verify_probe_type: str = 'stream', endpoints: Optional[Dict[str, str]] = None):
+        """
+        初始化异步认证器
+        
+        Args:
+            timeout: 单个请求超时时间（秒）
+            verify: 登录后是否访问外网验证
+            connector: 共享的aiohttp.TCPConnector，为None时每次登录自建连接
+            verify_probe_type: 登录后验证外网所用的探测方式
+            endpoints: 覆盖默认接口地址，见HENUAuthenticator
+        """
+        if not AIOHTTP_AVAILABLE:
+            raise HENULoginError("需要安装aiohttp才能使用异步认证器")
+        
+        self.timeout = timeout
+        self.verify = verify
+        self.connector = connector
+        self.logger = logging.getLogger(__name__)
+        self.last_login_time = None
+        self.login_count = 0
+        self.quickauth_classifier = QuickauthClassifier()
+        self._apply_endpoints(endpoints, verify_probe_type)
+    
+    def _new_session(self) -> 'aiohttp.ClientSession':
+        """为单个账号创建独立Cookie的会话，连接池可在账号之间共享"""
+        return aiohttp.ClientSession(
+            connector=self.connector,
+            connector_owner=self.connector is None,
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+            timeout=aiohttp.ClientTimeout(total=self.timeout)
+        )
+    
+    async def login(self, url: str, username: str, password: str, operator: str = "local") -> bool:
+        """
+        异步执行登录操作
+        
+        Args:
+            url: 登录URL，包含wlanuserip和wlanacname参数
+            username: 用户名
+            password: 密码
+            operator: 运营商类型（local/yd/lt/dx）
+        
+        Returns:
+            bool: 登录是否成功
+        
+        Raises:
+            HENULoginError: 登录过程中的错误
+        """
+        start_time = time.time()
+        self.logger.debug(f"开始异步登录流程，用户: {username}, 运营商: {operator}")
+        
+        operator_suffix = self.OPERATOR_SUFFIXES.get(operator, "@henulocal")
+        full_username = username + operator_suffix
+        headers = self._build_headers(url)
+        
+        try:
+            wlanuserip, wlanacname = self._extract_url_params(url)
+            async with self._new_session() as session:
+                # 认证接口与用户检查接口互不依赖，并发执行
+                await asyncio.gather(
+                    self._post_api(
+                        session, "认证", self.AUTH_API_URL,
+                        self._build_auth_data(username, password, operator_suffix), headers
+                    ),
+                    self._post_api(
+                        session, "检查", self.CHECK_API_URL,
+                        self._build_check_data(username, password, operator_suffix), headers
+                    )
+                )
+                success = await self._final_authentication_async(
+                    session, full_username, password, wlanuserip, wlanacname, headers
+                )
+        except HENULoginError:
+            record_login({'total': time.time() - start_time}, 'error')
+            raise
+        except Exception as e:
+            record_login({'total': time.time() - start_time}, 'error')
+            raise HENULoginError(f"登录失败: {str(e)}")
+        
+        elapsed_time = time.time() - start_time
+        record_login({'total': elapsed_time}, 'success' if success else 'failure')
+        if success:
+            self.last_login_time = datetime.now()
+            self.login_count += 1
+            self.logger.debug(f"用户 {username} 登录成功，耗时: {elapsed_time:.2f}秒")
+        else:
+            self.logger.warning(f"用户 {username} 登录失败，耗时: {elapsed_time:.2f}秒")
+        
+        return success
+    
+    async def _post_api(self, session: 'aiohttp.ClientSession', api_name: str, api_url: str,
+                        data: Dict[str, str], headers: Dict[str, str]) -> None:
+        """调用认证/检查API，失败只记录警告"""
+        try:
+            async with session.post(api_url, data=data, headers=headers) as response:
+                self._log_api_result(api_name, await response.text())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning(f"{api_name}API调用失败: {e!r}，继续尝试登录")
+    
+    async def _final_authentication_async(self, session: 'aiohttp.ClientSession', full_username: str,
+                                          password: str, wlanuserip: str, wlanacname: str,
+                                          headers: Dict[str, str]) -> bool:
+        """执行最终的认证请求"""
+        quickauth_url = self._build_quickauth_url(full_username, password, wlanuserip, wlanacname)
+        
+        try:
+            async with session.get(quickauth_url, headers=headers) as response:
+                verdict = await self._classify_quickauth_async(response)
+                if not self._check_quickauth_response(verdict):
+                    return False
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"最终认证请求异常: {e!r}")
+            return False
+        
+        if not self.verify:
+            return True
+        
+        probe = self.verify_probe
+        try:
+            async with session.request(probe.method, probe.url, allow_redirects=probe.allow_redirects) as response:
+                # content.read(n) 只返回已缓冲的数据，关键字可能在后续分块中，与同步探测一样逐块读取
+                body = b''
+                reader = probe.body_reader(response.status)
+                if reader is not None:
+                    async for chunk in response.content.iter_chunked(1024):
+                        if reader.feed(chunk):
+                            break
+                    body = reader.body()
+                ok, detail = probe.evaluate(response.status, response.headers, body)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.warning(f"验证访问外网时发生异常: {e!r}")
+            return False
+        
+        if not ok:
+            self.logger.warning(f"验证失败：无法正常访问外网（{detail}）")
+        return ok
+    
+    async def _classify_quickauth_async(self, response: 'aiohttp.ClientResponse') -> QuickauthVerdict:
+        """逐块读取quickauth响应，得出结论后不再读取剩余响应体"""
+        if response.status != 200:
+            return self.quickauth_classifier.classify(response.status, ())
+        
+        reader = self.quickauth_classifier.reader()
+        async for chunk in response.content.iter_chunked(1024):
+            verdict = reader.feed(chunk)
+            if verdict is not None:
+                return verdict
+        return reader.finish()
+    
+    def get_status(self) -> Dict[str, Any]:
+        """获取认证器状态信息"""
+        return {
+            'last_login_time': self.last_login_time.isoformat() if self.last_login_time else None,
+            'login_count': self.login_count,
+            'session_active': False,
+            'last_step_timings': {}
+        }
+
+
+class FleetLoginRunner:
+    """批量登录执行器，以有界并发为一组账号/URL绑定执行登录"""
+    
+    def __init__(self, concurrency: int = 50, timeout: int = 10, verify: bool = True,
+                 endpoints: Optional[Dict[str, str]] = None):
+        """
+        初始化批量登录执行器
+        
+        Args:
+            concurrency: 同时进行的登录数量上限
+            timeout: 单个请求超时时间（秒）
+            verify: 每个账号登录后是否访问外网验证
+            endpoints: 覆盖默认接口地址，见HENUAuthenticator
+        """
+        self.concurrency = max(1, int(concurrency))
+        self.timeout = timeout
+        self.verify = verify
+        self.endpoints = endpoints
+        self.logger = logging.getLogger(__name__)
+        self.last_stats: Dict[str, Any] = {}
+    
+    def run(self, bindings: Sequence[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """同步入口，执行批量登录并返回每个账号的结果"""
+        return asyncio.run(self.run_async(bindings))
+    
+    async def run_async(self, bindings: Sequence[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """
+        并发执行批量登录
+        
+        Args:
+            bindings: 账号绑定列表，每项包含url(或login_url)、username、password、operator
+        
+        Returns:
+            与bindings顺序一致的结果列表
+        """
+        total = len(bindings)
+        if total == 0:
+            self.last_stats = {'total': 0, 'succeeded': 0, 'failed': 0,
+                               'elapsed': 0.0, 'logins_per_second': 0.0}
+            return []
+        
+        backend = 'aiohttp' if AIOHTTP_AVAILABLE else 'threads'
+        self.logger.info(f"开始批量登录: {total} 个账号, 并发上限: {self.concurrency}, 后端: {backend}")
+        
+        semaphore = asyncio.Semaphore(self.concurrency)
+        progress = {'done': 0, 'succeeded': 0}
+        report_every = max(1, total // 10)
+        start_time = time.time()
+        
+        if AIOHTTP_AVAILABLE:
+            connector = aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.concurrency)
+            authenticator = AsyncHENUAuthenticator(self.timeout, self.verify, connector, endpoints=self.endpoints)
+            login_one = authenticator.login
+        else:
+            connector = None
+            executor = ThreadPoolExecutor(max_workers=self.concurrency)
+            loop = asyncio.get_running_loop()
+            
+            async def login_one(url: str, username: str, password: str, operator: str) -> bool:
+                # 无aiohttp时退化为线程池执行同步认证器，每个账号独立会话
+                sync_auth = HENUAuthenticator(timeout=self.timeout, endpoints=self.endpoints)
+                return await loop.run_in_executor(
+                    executor, sync_auth.login, url, username, password, operator
+                )
+        
+        async def worker(binding: Dict[str, str]) -> Dict[str, Any]:
+            url = binding.get('url') or binding.get('login_url', '')
+            username = binding.get('username', '')
+            result = {'username': username, 'url': url, 'success': False, 'error': None, 'elapsed': 0.0}
+            
+            async with semaphore:
+                item_start = time.time()
+                try:
+                    result['success'] = await login_one(
+                        url, username, binding.get('password', ''), binding.get('operator', 'local')
+                    )
+                except Exception as e:
+                    result['error'] = str(e)
+                result['elapsed'] = round(time.time() - item_start, 4)
+            
+            progress['done'] += 1
+            progress['succeeded'] += int(result['success'])
+            if progress['done'] % report_every == 0 or progress['done'] == total:
+                rate = progress['done'] / max(time.time() - start_time, 1e-9)
+                self.logger.info(f"批量登录进度: {progress['done']}/{total}, 速率: {rate:.1f} 次/秒")
+            return result
+        
+        try:
+            results = await asyncio.gather(*(worker(binding) for binding in bindings))
+        finally:
+            if connector is not None:
+                await connector.close()
+            else:
+                executor.shutdown(wait=False)
+        
+        elapsed = time.time() - start_time
+        self.last_stats = {
+            'total': total,
+            'succeeded': progress['succeeded'],
+            'failed': total - progress['succeeded'],
+            'elapsed': round(elapsed, 3),
+            'logins_per_second': round(total / max(elapsed, 1e-9), 2)
+        }
+        self.logger.info(
+            f"批量登录完成: 成功 {self.last_stats['succeeded']}/{total}, "
+            f"耗时 {self.last_stats['elapsed']}秒, 速率 {self.last_stats['logins_per_second']} 次/秒"
+        )
+        return list(results)
+
+
+def load_bindings(path: str) -> List[Dict[str, str]]:
+    """
+    从JSON文件加载账号绑定列表
+    
+    文件可以是绑定列表，也可以是包含"bindings"键的对象
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    
+    if isinstance(data, dict):
+        data = data.get('bindings', [])
+    if not isinstance(data, list):
+        raise HENULoginError(f"账号绑定文件格式错误: {path}")
+    
+    return data
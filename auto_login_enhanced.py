@@ -7,13 +7,19 @@
 import sys
 import time
 import argparse
+import logging
 import signal
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 from henu_login_lib import NetworkChecker, HENUAuthenticator, HENULoginError
+from portal_discovery import PortalDiscovery
 from config_manager import ConfigManager
-from credential_manager import CredentialManager
 from logger_setup import LoggerSetup
+from adaptive_scheduler import AdaptiveScheduler
+from history_store import HistoryStore
+from session_predictor import RENEWAL_REASON, SessionPredictor
+from uplink_bindings import UplinkBinding
 
 
 class AutoLoginService:
@@ -36,52 +42,152 @@ class AutoLoginService:
             log_file=log_config.get('file', 'auto_login.log'),
             max_size_mb=log_config.get('max_size_mb', 10),
             backup_count=log_config.get('backup_count', 5),
-            console_output=log_config.get('console_output', True)
+            console_output=log_config.get('console_output', True),
+            async_queue=log_config.get('async_queue', True),
+            queue_size=log_config.get('queue_size', 10000),
+            log_format=log_config.get('format', 'text'),
+            index_bucket=log_config.get('index_bucket', 60)
         )
         
-        # 初始化凭证管理器
-        security_config = self.config_manager.config.get('security', {})
-        self.credential_manager = CredentialManager(
-            security_config.get('encryption_key_file', '.keyfile')
-        )
+        # 登录与探测历史，重启和单次运行之间保留
+        self.history = HistoryStore.from_config(self.config_manager.config.get('history', {}))
         
         # 初始化网络检查器和认证器
         network_config = self.config_manager.config.get('network', {})
-        self.network_checker = NetworkChecker(
-            test_url=network_config.get('test_url', 'http://www.baidu.com'),
-            timeout=network_config.get('timeout', 5)
-        )
+        self.network_checker = NetworkChecker.from_config(network_config)
+        self.network_checker.history = self.history
+        self.portal_discovery = None
+        if network_config.get('auto_discover', True):
+            self.portal_discovery = PortalDiscovery(
+                probe_url=network_config.get('test_url', 'http://www.baidu.com'),
+                timeout=network_config.get('timeout', 5)
+            )
+            self.network_checker.discovery = self.portal_discovery
         self.authenticator = HENUAuthenticator(
-            timeout=network_config.get('timeout', 10)
+            timeout=network_config.get('timeout', 10),
+            parallel_steps=network_config.get('parallel_login_steps', True),
+            endpoints=self.config_manager.config.get('portal'),
+            history=self.history,
+            dns_cache=self.network_checker.dns_cache
+        )
+        
+        # 多链路绑定：每条链路独立的源地址会话，同一进程内并发检查与登录
+        self.bindings: List[UplinkBinding] = []
+        self._binding_executor: Optional[ThreadPoolExecutor] = None
+        self.build_bindings()
+        
+        # 检查间隔调度器
+        self.scheduler = AdaptiveScheduler.from_config(
+            self.config_manager.config.get('scheduler', {})
+        )
+        # 根据历史会话时长在预计过期前提前续期
+        self.session_predictor = SessionPredictor.from_config(
+            self.config_manager.config.get('session', {}), self.history
         )
         
         # 运行控制
         self.running = True
+        # 收到的退出信号，由主循环记录日志（信号处理器中不写日志）
+        self.exit_signal: Optional[int] = None
+        self.link_monitor = None
+        self.config_watcher = None
+        self._credential_manager = None
+        # 各组件已应用的配置版本，新版本由守护线程在下一次检查开始时应用
+        self._config_version = self.config_manager.version
+        self.config_manager.subscribe(self.apply_config)
         self.setup_signal_handlers()
     
+    def build_bindings(self) -> None:
+        """按配置创建各链路的登录组件（替换并关闭已有的绑定）"""
+        for binding in self.bindings:
+            binding.close()
+        config = self.config_manager.config
+        self.bindings = [
+            UplinkBinding(settings, config.get('network', {}), config.get('portal'), self.history)
+            for settings in self.config_manager.settings.bindings
+        ]
+        if self._binding_executor is not None:
+            self._binding_executor.shutdown(wait=False)
+            self._binding_executor = None
+        if self.bindings:
+            self._binding_executor = ThreadPoolExecutor(
+                max_workers=len(self.bindings), thread_name_prefix='henu-binding'
+            )
+            self.logger.info(f"多链路模式: {', '.join(binding.describe() for binding in self.bindings)}")
+    
+    def apply_config(self, config: Mapping[str, Any]) -> None:
+        """
+        配置重新加载后的监听器（在配置监视线程中执行）
+        
+        只唤醒守护线程立即检查一次，新配置由守护线程在检查开始前应用，
+        不在这里修改可能正被检查或登录使用的组件
+        """
+        if self.link_monitor:
+            self.link_monitor.wakeup()
+    
+    def apply_pending_config(self) -> None:
+        """把最新的配置快照中的超时、间隔与URL应用到各组件（守护线程在每次检查开始时调用）"""
+        version = self.config_manager.version
+        if version == self._config_version:
+            return
+        self._config_version = version
+        config = self.config_manager.config
+        network_config = config.get('network', {})
+        self.network_checker.apply_config(network_config)
+        self.authenticator.apply_config(network_config, config.get('portal'))
+        if tuple(binding.settings for binding in self.bindings) != self.config_manager.settings.bindings:
+            self.build_bindings()
+        else:
+            for binding in self.bindings:
+                binding.apply_config(network_config, config.get('portal'))
+        self.scheduler.apply_config(config.get('scheduler', {}))
+        self.session_predictor = SessionPredictor.reconfigure(
+            self.session_predictor, config.get('session', {}), self.history
+        )
+        if self.portal_discovery:
+            self.portal_discovery.probe_url = network_config.get('test_url', 'http://www.baidu.com')
+            self.portal_discovery.timeout = network_config.get('timeout', 5)
+        level = config.get('logging', {}).get('level', 'INFO')
+        self.logger.setLevel(getattr(logging, level.upper(), logging.INFO))
+        self.logger.info("新配置已生效")
+    
     def setup_signal_handlers(self):
         """设置信号处理器"""
         def signal_handler(signum, frame):
-            self.logger.info(f"收到信号 {signum}，准备退出...")
+            # 只设置标志并唤醒主循环：信号可能打断正持有日志队列锁的线程，在这里写日志会死锁
+            self.exit_signal = signum
             self.running = False
+            if self.link_monitor:
+                self.link_monitor.wakeup()
         
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
     
-    def login_with_retry(self) -> bool:
+    def login_with_retry(self, binding: Optional[UplinkBinding] = None, reason: str = '') -> bool:
         """
         带重试机制的登录
         
+        Args:
+            binding: 要登录的链路，为None时登录默认路由所在的链路
+            reason: 登录原因，写入登录历史（renewal表示会话预计过期前的提前续期）
+        
         Returns:
             是否登录成功
         """
-        network_config = self.config_manager.config.get('network', {})
-        retry_attempts = network_config.get('retry_attempts', 3)
-        retry_delay = network_config.get('retry_delay', 5)
-        login_url = network_config.get('login_url', '')
+        settings = self.config_manager.settings
+        retry_attempts = settings.network.retry_attempts
+        retry_delay = settings.network.retry_delay
+        if binding is None:
+            authenticator, checker, discovery = self.authenticator, self.network_checker, self.portal_discovery
+            login_url = self.resolve_login_url()
+            prefix = ''
+        else:
+            authenticator, checker, discovery = binding.authenticator, binding.network_checker, binding.portal_discovery
+            login_url = binding.resolve_login_url(settings.network.login_url)
+            prefix = f"[{binding.name}] "
         
         # 获取凭证
-        creds = self.config_manager.get_credentials()
+        creds = self.get_credentials(binding)
         
         # 验证配置
         is_valid, errors = self.config_manager.validate_config()
@@ -94,50 +200,142 @@ class AutoLoginService:
         # 尝试登录
         for attempt in range(1, retry_attempts + 1):
             try:
-                self.logger.info(f"尝试登录 ({attempt}/{retry_attempts})...")
+                self.logger.info(f"{prefix}尝试登录 ({attempt}/{retry_attempts})...")
                 
-                success = self.authenticator.login(
+                success = authenticator.login(
                     url=login_url,
                     username=creds['username'],
                     password=creds['password'],
-                    operator=creds['operator']
+                    operator=creds['operator'],
+                    reason=reason
                 )
                 
+                event = {
+                    'event': 'login', 'account': creds['username'], 'attempt': attempt,
+                    'latency': authenticator.last_step_timings.get('total'),
+                    'steps': authenticator.last_step_timings,
+                    'binding': binding.name if binding else None
+                }
                 if success:
-                    self.logger.info("登录成功！")
+                    self.logger.info(f"{prefix}登录成功！", extra={**event, 'outcome': 'success'})
+                    # 门户状态已变化，丢弃登录前建立的探测连接
+                    checker.reset_session()
                     return True
                 else:
-                    self.logger.warning(f"登录失败，尝试 {attempt}/{retry_attempts}")
+                    self.logger.warning(f"{prefix}登录失败，尝试 {attempt}/{retry_attempts}",
+                                        extra={**event, 'outcome': 'failure'})
                     
             except HENULoginError as e:
-                self.logger.error(f"登录错误: {e}")
+                self.logger.error(f"{prefix}登录错误: {e}", extra={
+                    'event': 'login', 'account': creds['username'], 'attempt': attempt, 'outcome': 'error',
+                    'binding': binding.name if binding else None
+                })
             except Exception as e:
-                self.logger.error(f"未知错误: {e}", exc_info=True)
+                self.logger.error(f"{prefix}未知错误: {e}", exc_info=True)
             
             # 如果不是最后一次尝试，等待后重试
             if attempt < retry_attempts:
-                self.logger.info(f"等待 {retry_delay} 秒后重试...")
-                time.sleep(retry_delay)
+                delay = self.scheduler.retry_delay(attempt, retry_delay)
+                self.logger.info(f"{prefix}等待 {delay} 秒后重试...")
+                time.sleep(delay)
         
-        self.logger.error(f"登录失败，已重试 {retry_attempts} 次")
+        self.logger.error(f"{prefix}登录失败，已重试 {retry_attempts} 次")
+        if discovery:
+            # 缓存的门户参数可能已过期，下次登录重新发现
+            discovery.invalidate()
         return False
     
+    @property
+    def credential_manager(self) -> Any:
+        """凭证保险库，第一次需要解密凭证时才创建（网络正常时不必导入cryptography）"""
+        if self._credential_manager is None:
+            from credential_manager import CredentialVault
+            self._credential_manager = CredentialVault.from_config(self.config_manager.config.get('security', {}))
+        return self._credential_manager
+    
+    def get_credentials(self, binding: Optional[UplinkBinding] = None) -> Dict[str, str]:
+        """
+        获取登录凭证，配置中的密文由凭证保险库解密（结果在有效期内缓存）
+        
+        Args:
+            binding: 链路绑定，其未单独配置账号时使用全局凭证
+        """
+        credentials = self.config_manager.settings.credentials
+        if binding is not None:
+            credentials = binding.settings.credentials(credentials)
+        if not credentials.encrypted:
+            return credentials.as_dict()
+        return self.credential_manager.decrypt_credentials({**credentials.as_dict(), 'encrypted': True})
+    
+    def resolve_login_url(self) -> str:
+        """确定登录URL：启用自动发现时优先使用当前网络地址对应的门户参数"""
+        configured_url = self.config_manager.settings.network.login_url
+        if self.portal_discovery is None:
+            return configured_url
+        return self.portal_discovery.resolve_login_url(configured_url)
+    
+    def check_and_login(self, binding: Optional[UplinkBinding] = None) -> Tuple[bool, Optional[bool]]:
+        """
+        检查一条链路，未连接时登录
+        
+        Args:
+            binding: 要检查的链路，为None时检查默认路由所在的链路
+        
+        Returns:
+            (检查时是否已连接, 登录是否成功)，未尝试登录时后者为None
+        """
+        checker = self.network_checker if binding is None else binding.network_checker
+        prefix = '' if binding is None else f"[{binding.name}] "
+        if binding is not None:
+            binding.refresh_source()
+            if binding.source_address is None:
+                # 没有源地址时探测会走默认路由，结论不属于这条链路
+                self.logger.warning(f"{prefix}网卡 {binding.settings.interface} 没有IPv4地址，跳过本次检查")
+                return False, None
+        
+        # 检查网络连接
+        connected = checker.check_internet_connection()
+        if binding is not None:
+            binding.connected = connected
+        timings = checker.last_check_timings
+        probe_event = {
+            'event': 'probe', 'connected': connected, 'steps': timings,
+            'latency': round(sum(timings.values()), 6), 'binding': binding.name if binding else None
+        }
+        if connected:
+            self.logger.info(f"{prefix}网络连接正常，无需登录", extra=probe_event)
+            if self.session_predictor and self.session_predictor.renewal_due(binding.name if binding else ''):
+                self.logger.info(f"{prefix}会话预计即将过期，提前重新登录")
+                # 续期失败时原会话可能仍然有效，不按登录失败退避
+                return True, self.login_with_retry(binding, reason=RENEWAL_REASON) or None
+            return True, None
+        
+        # 网络未连接，尝试登录
+        self.logger.info(f"{prefix}检测到网络未连接，准备登录...", extra=probe_event)
+        success = self.login_with_retry(binding)
+        if binding is not None and success:
+            binding.connected = True
+        return False, success
+    
     def run_once(self) -> bool:
         """
-        运行一次登录检查
+        运行一次登录检查（配置了多链路绑定时并发检查所有链路）
         
         Returns:
             是否需要继续运行
         """
         try:
-            # 检查网络连接
-            if self.network_checker.check_internet_connection():
-                self.logger.info("网络连接正常，无需登录")
-                return True
+            self.apply_pending_config()
+            if self.bindings:
+                results = list(self._binding_executor.map(self.check_and_login, self.bindings))
+            else:
+                results = [self.check_and_login()]
             
-            # 网络未连接，尝试登录
-            self.logger.info("检测到网络未连接，准备登录...")
-            self.login_with_retry()
+            # 所有链路共用一个调度器：任一链路掉线都按掉线处理，任一链路登录失败都退避
+            self.scheduler.record_check(all(connected for connected, _ in results))
+            logins = [success for _, success in results if success is not None]
+            if logins:
+                self.scheduler.record_login(all(logins))
             return True
             
         except KeyboardInterrupt:
@@ -145,32 +343,186 @@ class AutoLoginService:
             return False
         except Exception as e:
             self.logger.error(f"运行时错误: {e}", exc_info=True)
+            self.scheduler.record_error()
             return True
     
     def run_daemon(self):
         """以守护进程模式运行"""
-        scheduler_config = self.config_manager.config.get('scheduler', {})
-        check_interval = scheduler_config.get('check_interval', 300)
+        from link_monitor import LinkMonitor
+        from config_watcher import ConfigWatcher
         
-        self.logger.info(f"启动守护进程模式，检查间隔: {check_interval} 秒")
+        settings = self.config_manager.settings
+        if settings.hot_reload.enabled:
+            self.config_watcher = ConfigWatcher(
+                self.config_manager,
+                poll_interval=settings.hot_reload.poll_interval
+            ).start()
         
-        while self.running:
-            try:
-                if not self.run_once():
-                    break
+        self.link_monitor = LinkMonitor(
+            debounce=settings.scheduler.link_debounce,
+            enabled=settings.scheduler.event_driven
+        )
+        mode = '事件驱动 + 定时兜底' if self.link_monitor.active else '定时检查'
+        self.logger.info(
+            f"启动守护进程模式（{mode}），检查间隔: {self.scheduler.min_interval}-{self.scheduler.max_interval} 秒"
+            if self.scheduler.adaptive else
+            f"启动守护进程模式（{mode}），检查间隔: {self.scheduler.max_interval} 秒"
+        )
+        
+        if self.history:
+            # 门户在上次运行时已连续失败的，启动后继续退避
+            self.scheduler.restore(self.history.consecutive_login_failures())
+        
+        try:
+            while self.running:
+                try:
+                    if not self.run_once():
+                        break
                 
-                if self.running:
-                    self.logger.info(f"等待 {check_interval} 秒后进行下一次检查...")
-                    time.sleep(check_interval)
+                    if self.running:
+                        interval = self.scheduler.next_interval()
+                        reason = self.scheduler.last_reason
+                        if self.session_predictor:
+                            interval, predicted = self.session_predictor.clamp_interval(
+                                interval, [binding.name for binding in self.bindings] or ['']
+                            )
+                            if predicted:
+                                reason = '会话预计即将过期，提前检查'
+                        self.logger.info(f"等待 {interval} 秒后进行下一次检查（{reason}）...")
+                        self.wait_for_next_check(interval)
                     
-            except KeyboardInterrupt:
-                self.logger.info("用户中断，退出守护进程")
-                break
-            except Exception as e:
-                self.logger.error(f"守护进程运行错误: {e}", exc_info=True)
-                time.sleep(30)  # 发生错误时等待30秒后重试
+                except KeyboardInterrupt:
+                    self.logger.info("用户中断，退出守护进程")
+                    break
+                except Exception as e:
+                    self.logger.error(f"守护进程运行错误: {e}", exc_info=True)
+                    self.scheduler.record_error()
+                    self.wait_for_next_check(self.scheduler.next_interval())
+        finally:
+            self.link_monitor.close()
+            self.link_monitor = None
+            if self.config_watcher:
+                self.config_watcher.stop()
+                self.config_watcher = None
         
+        if self.exit_signal is not None:
+            self.logger.info(f"收到信号 {self.exit_signal}，准备退出...")
         self.logger.info("守护进程已停止")
+        # 被systemd等强制结束前，先把异步队列中的日志写出
+        LoggerSetup.flush()
+    
+    def wait_for_next_check(self, timeout: float) -> None:
+        """
+        等待下一次检查，链路、地址或路由发生变化时提前返回
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        """
+        events = self.link_monitor.wait(timeout)
+        if events and self.running:
+            self.logger.info(f"检测到网络变化: {', '.join(events)}，立即检查")
+            # 地址或路由变化后旧连接已不可用
+            self.network_checker.reset_session()
+            if self.portal_discovery and any(e.startswith('address') for e in events):
+                self.portal_discovery.invalidate()
+            for binding in self.bindings:
+                # 绑定的源地址在下一次检查前重新读取，地址变化时会话随之重建
+                binding.network_checker.reset_session()
+    
+    def run_fleet(self, bindings_file: str, concurrency: Optional[int] = None) -> bool:
+        """
+        批量登录绑定文件中的所有账号
+        
+        Args:
+            bindings_file: 账号绑定JSON文件路径
+            concurrency: 并发上限，为None时使用配置中的fleet.concurrency
+            
+        Returns:
+            是否全部登录成功
+        """
+        from async_login import FleetLoginRunner, load_bindings
+        
+        fleet_config = self.config_manager.config.get('fleet', {})
+        network_config = self.config_manager.config.get('network', {})
+        
+        bindings = load_bindings(bindings_file)
+        if any(binding.get('encrypted') for binding in bindings):
+            # 绑定文件中加密的账号一次性批量解密
+            bindings = self.credential_manager.decrypt_batch_credentials(bindings)
+        runner = FleetLoginRunner(
+            concurrency=concurrency or fleet_config.get('concurrency', 50),
+            timeout=network_config.get('timeout', 10),
+            verify=fleet_config.get('verify', True),
+            endpoints=self.config_manager.config.get('portal')
+        )
+        results = runner.run(bindings)
+        
+        for result in results:
+            if not result['success']:
+                self.logger.warning(f"账号 {result['username']} 登录失败: {result['error'] or '认证未通过'}")
+        
+        stats = runner.last_stats
+        print(f"批量登录: 成功 {stats['succeeded']}/{stats['total']}, "
+              f"耗时 {stats['elapsed']} 秒, 速率 {stats['logins_per_second']} 次/秒")
+        return stats['failed'] == 0
+    
+    @staticmethod
+    def print_auth_status(status: Mapping[str, Any], indent: str = '  ') -> None:
+        """打印认证器状态"""
+        print(f"{indent}上次登录时间: {status['last_login_time'] or '从未登录'}")
+        print(f"{indent}累计登录次数: {status['login_count']}")
+        print(f"{indent}会话状态: {'活跃' if status['session_active'] else '未激活'}")
+        if status['last_step_timings']:
+            timings = ', '.join(f"{step}={seconds:.3f}s" for step, seconds in status['last_step_timings'].items())
+            print(f"{indent}上次登录各步骤耗时: {timings}")
+    
+    @staticmethod
+    def print_target_stats(network_checker: NetworkChecker, indent: str = '  ') -> None:
+        """打印各HTTP探测目标的延迟统计（只配置了一个目标时不显示）"""
+        if len(network_checker.probes) < 2:
+            return
+        print(f"{indent}探测目标（按探测顺序）:")
+        for stats in network_checker.target_stats():
+            latency = f"{stats['latency'] * 1000:.0f}ms" if stats['latency'] is not None else '无样本'
+            print(f"{indent}  {stats['url']}: 平均 {latency}，被采用 {stats['wins']} 次，连续失败 {stats['failures']} 次")
+    
+    def show_binding_status(self) -> None:
+        """显示各链路的连接与登录状态（所有链路并发检查）"""
+        def check(binding: UplinkBinding) -> Optional[bool]:
+            binding.refresh_source()
+            if binding.source_address is None:
+                return None
+            return binding.network_checker.check_internet_connection()
+        
+        print("\n[链路状态]")
+        for binding, connected in zip(self.bindings, self._binding_executor.map(check, self.bindings)):
+            state = '无地址' if connected is None else ('正常' if connected else '未连接')
+            print(f"  {binding.describe()}: {state}")
+            self.print_target_stats(binding.network_checker, indent='    ')
+            self.print_auth_status(binding.authenticator.get_status(), indent='    ')
+    
+    def show_session_prediction(self) -> None:
+        """显示学习到的会话时长、下一次提前续期时间与估计减少的离线时间"""
+        def when(ts: Optional[float]) -> str:
+            return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(ts)) if ts else '无'
+        
+        print("\n[会话预测]")
+        for name in [binding.name for binding in self.bindings] or ['']:
+            summary = self.session_predictor.summary(name)
+            indent = '  '
+            if name:
+                print(f"  {name}:")
+                indent = '    '
+            if summary['lifetime_quantile'] is None:
+                print(f"{indent}已观察到掉线 {summary['samples']} 次，样本不足，暂不预测")
+                continue
+            print(f"{indent}会话时长: 中位数 {summary['lifetime_median']:.0f}s，"
+                  f"P{summary['quantile'] * 100:.0f} {summary['lifetime_quantile']:.0f}s（{summary['samples']} 个样本）")
+            print(f"{indent}当前会话预计过期: {when(summary['expiry'])}，下一次提前检查: {when(summary['next_renewal'])}")
+            gain = f"{summary['estimated_gain']:.0f}s" if summary['estimated_gain'] is not None else '未知'
+            outage = f"，被动发现掉线平均离线 {summary['avg_outage']:.0f}s" if summary['avg_outage'] is not None else ''
+            print(f"{indent}提前续期: {summary['renewals']} 次，避免掉线 {summary['prevented_drops']} 次，"
+                  f"估计增加在线时间 {gain}{outage}")
     
     def show_status(self):
         """显示当前状态"""
@@ -178,32 +530,59 @@ class AutoLoginService:
         print("河南大学校园网自动登录工具 - 状态信息")
         print("=" * 60)
         
-        # 网络状态
-        print("\n[网络状态]")
-        is_connected = self.network_checker.check_internet_connection()
-        print(f"  网络连接: {'正常' if is_connected else '未连接'}")
+        if self.bindings:
+            self.show_binding_status()
+        else:
+            # 网络状态
+            print("\n[网络状态]")
+            is_connected = self.network_checker.check_internet_connection()
+            print(f"  网络连接: {'正常' if is_connected else '未连接'}")
+            self.print_target_stats(self.network_checker)
         
-        # 认证器状态
-        print("\n[认证状态]")
-        status = self.authenticator.get_status()
-        print(f"  上次登录时间: {status['last_login_time'] or '从未登录'}")
-        print(f"  累计登录次数: {status['login_count']}")
-        print(f"  会话状态: {'活跃' if status['session_active'] else '未激活'}")
+            # 认证器状态
+            print("\n[认证状态]")
+            self.print_auth_status(self.authenticator.get_status())
+        
+        # 历史记录（只读本地数据库）
+        if self.history:
+            print("\n[最近24小时]")
+            summary = self.history.summary()
+            if summary['checks']:
+                print(f"  网络检查: {summary['checks']} 次，在线比例 {summary['online_ratio']:.1%}")
+            else:
+                print("  网络检查: 无记录")
+            print(f"  登录: 成功 {summary['logins_succeeded']} 次，失败 {summary['logins_failed']} 次")
+            if summary['avg_login_time'] is not None:
+                print(f"  平均登录耗时: {summary['avg_login_time']:.3f}s")
+            failures = self.history.consecutive_login_failures()
+            if failures:
+                print(f"  最近一次成功后连续失败: {failures} 次")
+            last_attempt = self.history.last_login(None)
+            if last_attempt and last_attempt['outcome'] != 'success':
+                when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(last_attempt['ts']))
+                print(f"  上次登录尝试: {when} {last_attempt['outcome']} {last_attempt['error'] or ''}".rstrip())
+        
+        if self.session_predictor:
+            self.show_session_prediction()
         
         # 配置信息
         print("\n[配置信息]")
         print(f"  配置文件: {self.config_manager.config_file}")
-        creds = self.config_manager.get_credentials()
-        print(f"  用户名: {creds['username']}")
-        print(f"  运营商: {creds['operator']}")
+        settings = self.config_manager.settings
+        print(f"  用户名: {self.get_credentials()['username']}")
+        print(f"  运营商: {settings.credentials.operator}")
         
-        network_config = self.config_manager.config.get('network', {})
-        print(f"  登录URL: {network_config.get('login_url', '未配置')}")
+        print(f"  登录URL: {settings.network.login_url or '未配置'}")
+        if self.portal_discovery:
+            cached = self.portal_discovery.get_cached()
+            print(f"  自动发现: {cached['login_url'] if cached else '启用（尚未发现）'}")
         
-        scheduler_config = self.config_manager.config.get('scheduler', {})
-        print(f"  定时检查: {'启用' if scheduler_config.get('enabled') else '禁用'}")
-        if scheduler_config.get('enabled'):
-            print(f"  检查间隔: {scheduler_config.get('check_interval', 300)} 秒")
+        print(f"  定时检查: {'启用' if settings.scheduler.enabled else '禁用'}")
+        if settings.scheduler.enabled:
+            if self.scheduler.adaptive:
+                print(f"  检查间隔: 自适应 {self.scheduler.min_interval}-{self.scheduler.max_interval} 秒")
+            else:
+                print(f"  检查间隔: {self.scheduler.max_interval} 秒")
         
         print("\n" + "=" * 60)
 
@@ -218,6 +597,7 @@ def main():
   %(prog)s                    # 运行一次登录检查
   %(prog)s --daemon           # 以守护进程模式运行
   %(prog)s --status           # 显示状态信息
+  %(prog)s --fleet accounts.json  # 批量登录账号绑定文件中的所有账号
   %(prog)s --config custom.json  # 使用自定义配置文件
         """
     )
@@ -240,6 +620,19 @@ def main():
         help='显示状态信息'
     )
     
+    parser.add_argument(
+        '--fleet',
+        metavar='FILE',
+        help='批量登录账号绑定文件（JSON列表，每项包含url/username/password/operator）'
+    )
+    
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=None,
+        help='批量登录的并发上限（默认使用配置中的fleet.concurrency）'
+    )
+    
     parser.add_argument(
         '--version', '-v',
         action='version',
@@ -250,8 +643,16 @@ def main():
     
     try:
         service = AutoLoginService(config_file=args.config)
+        if not args.daemon and not args.fleet:
+            # 单次运行只探测一次，HTTP探测不必导入requests、建立连接池
+            service.network_checker.direct_probe = True
+            for binding in service.bindings:
+                binding.network_checker.direct_probe = True
         
-        if args.status:
+        if args.fleet:
+            if not service.run_fleet(args.fleet, args.concurrency):
+                return 1
+        elif args.status:
             service.show_status()
         elif args.daemon:
             service.run_daemon()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+配置读取基准测试
+对比逐级查找配置字典（每次读取环境变量、重新校验）与读取编译后的类型化快照，
+覆盖登录、状态查询与单项读取三种热路径，以及每次重新加载时的编译开销
+
+示例:
+    python benchmarks/bench_config.py --number 100000
+    python benchmarks/bench_config.py --output bench_config.json
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+from typing import Any, Callable, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config_manager import ConfigManager
+
+
+def legacy_credentials(manager: ConfigManager) -> Dict[str, str]:
+    """原 get_credentials：每次读取环境变量并按路径查找"""
+    return {
+        'username': os.environ.get('HENU_USERNAME') or manager.get('credentials.username', ''),
+        'password': os.environ.get('HENU_PASSWORD') or manager.get('credentials.password', ''),
+        'operator': os.environ.get('HENU_OPERATOR') or manager.get('credentials.operator', 'local')
+    }
+
+
+def legacy_validate(manager: ConfigManager) -> bool:
+    """原 validate_config：每次重新检查必需项与取值"""
+    errors = []
+    if not manager.get('network.login_url') and not manager.get('network.auto_discover', True):
+        errors.append('login_url')
+    creds = legacy_credentials(manager)
+    if not creds['username'] or not creds['password']:
+        errors.append('credentials')
+    errors.extend(legacy_values(manager.config))
+    return not errors
+
+
+def legacy_values(config: Any) -> list:
+    """原 validate_values：按路径逐项查找"""
+    lookup = ConfigManager._lookup
+    errors = []
+    if lookup(config, 'network.timeout', 0) <= 0:
+        errors.append('timeout')
+    if lookup(config, 'network.probe_type', 'stream') not in ('get', 'stream', 'head', 'generate_204'):
+        errors.append('probe_type')
+    check_interval = lookup(config, 'scheduler.check_interval', 300)
+    min_interval = lookup(config, 'scheduler.min_interval', min(15, check_interval))
+    max_interval = lookup(config, 'scheduler.max_interval', check_interval)
+    if min_interval <= 0 or max_interval < min_interval:
+        errors.append('interval')
+    if lookup(config, 'network.retry_attempts', 0) < 0:
+        errors.append('retry_attempts')
+    return errors
+
+
+def legacy_login_path(manager: ConfigManager) -> Any:
+    network_config = manager.config.get('network', {})
+    retry_attempts = network_config.get('retry_attempts', 3)
+    retry_delay = network_config.get('retry_delay', 5)
+    login_url = manager.get('network.login_url', '')
+    creds = legacy_credentials(manager)
+    valid = legacy_validate(manager)
+    return retry_attempts, retry_delay, login_url, creds['username'], valid
+
+
+def typed_login_path(manager: ConfigManager) -> Any:
+    settings = manager.settings
+    creds = settings.credentials
+    valid, _ = manager.validate_config()
+    return (settings.network.retry_attempts, settings.network.retry_delay,
+            settings.network.login_url, creds.username, valid)
+
+
+def legacy_status_path(manager: ConfigManager) -> Any:
+    creds = legacy_credentials(manager)
+    network_config = manager.config.get('network', {})
+    scheduler_config = manager.config.get('scheduler', {})
+    return (network_config.get('test_url', ''), creds['username'], creds['operator'],
+            network_config.get('login_url', ''), scheduler_config.get('check_interval', 300))
+
+
+def typed_status_path(manager: ConfigManager) -> Any:
+    settings = manager.settings
+    return (settings.network.test_url, settings.credentials.username, settings.credentials.operator,
+            settings.network.login_url, settings.scheduler.check_interval)
+
+
+def measure(func: Callable[[], Any], number: int, repeat: int) -> float:
+    """多次重复取最小值，返回单次调用的纳秒数"""
+    return min(timeit.repeat(func, number=number, repeat=repeat)) / number * 1e9
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='配置读取基准测试')
+    parser.add_argument('--number', type=int, default=50000, help='每轮调用次数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复轮数（取最快一轮）')
+    parser.add_argument('--output', '-o', help='结果保存为JSON')
+    args = parser.parse_args()
+    
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = os.path.join(directory, 'config.json')
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                'network': {'login_url': 'http://172.29.35.36:6060/portal.do?wlanuserip=10.0.0.1'},
+                'credentials': {'username': 'bench', 'password': 'secret'}
+            }, f)
+        manager = ConfigManager(config_file)
+        
+        cases = [
+            ('login', lambda: legacy_login_path(manager), lambda: typed_login_path(manager)),
+            ('status', lambda: legacy_status_path(manager), lambda: typed_status_path(manager)),
+            ('single', lambda: manager.get('network.timeout'), lambda: manager.settings.network.timeout),
+            ('credentials', lambda: legacy_credentials(manager), lambda: manager.settings.credentials),
+        ]
+        
+        results: Dict[str, Any] = {}
+        print(f"{'路径':<12}{'字典查找 ns':>14}{'类型化快照 ns':>16}{'加速':>8}")
+        for name, legacy, typed in cases:
+            legacy_ns = measure(legacy, args.number, args.repeat)
+            typed_ns = measure(typed, args.number, args.repeat)
+            results[name] = {
+                'legacy_ns': round(legacy_ns, 1),
+                'typed_ns': round(typed_ns, 1),
+                'speedup': round(legacy_ns / typed_ns, 2) if typed_ns else None
+            }
+            print(f"{name:<12}{legacy_ns:>14.1f}{typed_ns:>16.1f}{legacy_ns / typed_ns:>7.1f}x")
+        
+        # 编译只在加载与重新加载时发生一次
+        config = dict(manager.config)
+        compile_us = measure(lambda: ConfigManager.compile(config), max(1, args.number // 50), args.repeat) / 1000
+        results['compile_us'] = round(compile_us, 1)
+        print(f"\n每次重新加载的编译开销: {compile_us:.1f} µs")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+日志写出基准测试
+对比同步处理器与异步队列模式下，调用方（登录线程）每条日志的耗时；
+可模拟存储卡上轮转或写入偶尔卡顿的情况
+
+示例:
+    python benchmarks/bench_logging.py --records 2000 --stall-ms 200 --stall-every 500
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from logger_setup import LoggerSetup
+
+
+class StallingHandler(logging.Handler):
+    """每写出N条记录卡顿一次，模拟慢速存储上的轮转"""
+    
+    def __init__(self, inner: logging.Handler, stall: float, every: int):
+        super().__init__(inner.level)
+        self.inner = inner
+        self.stall = stall
+        self.every = every
+        self.count = 0
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+        if self.every and self.count % self.every == 0:
+            time.sleep(self.stall)
+        self.inner.emit(record)
+    
+    def flush(self) -> None:
+        self.inner.flush()
+    
+    def close(self) -> None:
+        self.inner.close()
+        super().close()
+
+
+def run_case(async_queue: bool, args: argparse.Namespace, directory: str) -> Dict[str, Any]:
+    """写入指定数量的DEBUG记录（模拟登录时记录完整响应体），统计调用方耗时"""
+    name = f"bench_logging_{'async' if async_queue else 'sync'}"
+    logger = LoggerSetup.setup_logger(
+        name=name, level='DEBUG', log_file=os.path.join(directory, f'{name}.log'),
+        console_output=False, async_queue=async_queue
+    )
+    # 给文件处理器包上卡顿模拟（异步模式下包装的是后台线程使用的处理器）
+    listener = LoggerSetup._listeners.get(name)
+    if listener is not None:
+        listener.handlers = tuple(StallingHandler(h, args.stall_ms / 1000, args.stall_every) for h in listener.handlers)
+    else:
+        logger.handlers = [StallingHandler(h, args.stall_ms / 1000, args.stall_every) for h in logger.handlers]
+    
+    body = '{"code":"0","message":"认证成功"}' + ' ' * args.body_bytes
+    samples: List[float] = []
+    start = time.perf_counter()
+    for index in range(args.records):
+        t0 = time.perf_counter()
+        logger.debug(f"最终认证响应内容: {body[:args.body_bytes]} #{index}")
+        samples.append((time.perf_counter() - t0) * 1e6)
+    caller_ms = (time.perf_counter() - start) * 1000
+    
+    flush_start = time.perf_counter()
+    LoggerSetup.stop_listener(name)
+    flush_ms = (time.perf_counter() - flush_start) * 1000
+    for handler in logger.handlers:
+        handler.close()
+    logger.handlers.clear()
+    
+    samples.sort()
+    return {
+        'caller_total_ms': round(caller_ms, 2),
+        'p50_us': round(statistics.median(samples), 2),
+        'p99_us': round(samples[int(len(samples) * 0.99) - 1], 2),
+        'max_us': round(samples[-1], 2),
+        'drain_ms': round(flush_ms, 2)
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='日志写出基准测试')
+    parser.add_argument('--records', type=int, default=2000, help='每种模式写入的记录数')
+    parser.add_argument('--body-bytes', type=int, default=200, help='每条记录附带的响应体长度')
+    parser.add_argument('--stall-ms', type=float, default=200, help='模拟卡顿时长（毫秒），0表示不卡顿')
+    parser.add_argument('--stall-every', type=int, default=500, help='每写出多少条记录卡顿一次')
+    parser.add_argument('--output', '-o', help='结果保存为JSON')
+    args = parser.parse_args()
+    
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for mode, async_queue in (('sync', False), ('async', True)):
+            results[mode] = run_case(async_queue, args, directory)
+    
+    print(f"{'模式':<8}{'调用方总耗时ms':>16}{'p50 µs':>10}{'p99 µs':>10}{'最大 µs':>12}{'排空ms':>10}")
+    for mode, result in results.items():
+        print(f"{mode:<8}{result['caller_total_ms']:>16}{result['p50_us']:>10}{result['p99_us']:>10}"
+              f"{result['max_us']:>12}{result['drain_ms']:>10}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+端到端登录基准测试
+针对本地模拟门户运行 HENUAuthenticator.login 与 NetworkChecker，输出 p50/p95/p99 延迟、
+吞吐量和各步骤耗时，结果为JSON，可保存后与其他版本对比
+
+示例:
+    python benchmarks/bench_login.py --iterations 200 --output bench.json
+    python benchmarks/bench_login.py --compare bench.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_portal import MockPortalServer
+from henu_login_lib import HENUAuthenticator, NetworkChecker
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """线性插值计算分位数"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(samples: List[float], wall_time: float, errors: int = 0) -> Dict[str, Any]:
+    """汇总一组耗时样本（秒），输出毫秒"""
+    values = sorted(samples)
+    count = len(values)
+    return {
+        'count': count,
+        'errors': errors,
+        'mean_ms': round(sum(values) / count * 1000, 3) if count else 0.0,
+        'p50_ms': round(percentile(values, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(values, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(values, 0.99) * 1000, 3),
+        'min_ms': round(values[0] * 1000, 3) if count else 0.0,
+        'max_ms': round(values[-1] * 1000, 3) if count else 0.0,
+        'throughput_per_s': round(count / wall_time, 2) if wall_time > 0 else 0.0
+    }
+
+
+def run_samples(iterations: int, func: Callable[[], Any],
+                before: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
+    """重复执行func并计时，func返回False或抛出异常记为错误"""
+    samples, errors = [], 0
+    wall_start = time.perf_counter()
+    for _ in range(iterations):
+        if before:
+            before()
+        start = time.perf_counter()
+        try:
+            ok = func()
+        except Exception:
+            ok = False
+        samples.append(time.perf_counter() - start)
+        errors += 0 if ok is not False else 1
+    return summarize(samples, time.perf_counter() - wall_start, errors)
+
+
+def bench_login(server: MockPortalServer, iterations: int, parallel_steps: bool) -> Dict[str, Any]:
+    """测量完整登录流程及各步骤耗时"""
+    authenticator = HENUAuthenticator(timeout=5, parallel_steps=parallel_steps, endpoints=server.endpoints())
+    login_url = server.login_url()
+    step_samples: Dict[str, List[float]] = {}
+    
+    def login_once() -> bool:
+        success = authenticator.login(login_url, 'bench', 'bench')
+        for step, seconds in authenticator.last_step_timings.items():
+            step_samples.setdefault(step, []).append(seconds)
+        return success
+    
+    # 每次登录前下线，保证完整走一遍门户流程
+    result = run_samples(iterations, login_once, before=lambda: server.set_online('127.0.0.1', False))
+    result['steps'] = {
+        step: {key: value for key, value in summarize(values, 0).items() if key.endswith('_ms')}
+        for step, values in step_samples.items()
+    }
+    return result
+
+
+def bench_probe(server: MockPortalServer, iterations: int, probe_type: str,
+                socket_probe: bool = False) -> Dict[str, Any]:
+    """测量一种探测方式的耗时与读取字节数"""
+    server.set_online('127.0.0.1', True)
+    host_port = server.base_url.split('//', 1)[1]
+    checker = NetworkChecker(
+        test_url=f"{server.base_url}/",
+        timeout=5,
+        probe_type=probe_type,
+        probe_url=f"{server.base_url}/generate_204" if probe_type == 'generate_204' else None,
+        socket_probe=socket_probe,
+        portal_hosts=[host_port],
+        external_hosts=[host_port]
+    )
+    bytes_read: List[int] = []
+    
+    def probe_once() -> bool:
+        ok = checker.check_internet_connection()
+        if checker.last_probe_result is not None:
+            bytes_read.append(checker.last_probe_result.bytes_read)
+        return ok
+    
+    result = run_samples(iterations, probe_once)
+    result['bytes_per_probe'] = round(sum(bytes_read) / len(bytes_read), 1) if bytes_read else 0
+    checker.close()
+    return result
+
+
+def bench_fleet(server: MockPortalServer, accounts: int, concurrency: int) -> Dict[str, Any]:
+    """测量批量登录吞吐量"""
+    from async_login import FleetLoginRunner
+    
+    runner = FleetLoginRunner(concurrency=concurrency, timeout=10, endpoints=server.endpoints())
+    bindings = [
+        {'url': server.login_url(f"10.0.{i // 250}.{i % 250 + 1}"), 'username': f"user{i}", 'password': 'bench'}
+        for i in range(accounts)
+    ]
+    results = runner.run(bindings)
+    summary = summarize([r['elapsed'] for r in results], runner.last_stats['elapsed'],
+                        runner.last_stats['failed'])
+    summary['logins_per_second'] = runner.last_stats['logins_per_second']
+    summary['concurrency'] = concurrency
+    return summary
+
+
+def git_commit() -> Optional[str]:
+    """当前代码的git提交，便于对比版本"""
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """打印与基线结果的p50/p95对比"""
+    print(f"\n与基线 {baseline['meta'].get('git_commit')} 对比（比值<1表示更快）:", file=sys.stderr)
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratios = []
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            if base.get(key):
+                ratios.append(f"{key}={result[key] / base[key]:.2f}x")
+        print(f"  {name}: {', '.join(ratios)}", file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='河南大学校园网登录端到端基准测试')
+    parser.add_argument('--iterations', type=int, default=100, help='每项测试的重复次数')
+    parser.add_argument('--latency', type=float, default=None, help='模拟门户各接口的统一基础延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='模拟门户返回500的概率')
+    parser.add_argument('--page-size', type=int, default=300 * 1024, help='模拟外网首页大小（字节）')
+    parser.add_argument('--fleet-accounts', type=int, default=200, help='批量登录测试的账号数量，0表示跳过')
+    parser.add_argument('--fleet-concurrency', type=int, default=50, help='批量登录并发上限')
+    parser.add_argument('--output', '-o', help='结果JSON输出文件，默认输出到标准输出')
+    parser.add_argument('--compare', help='与之前保存的结果JSON对比')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.CRITICAL)
+    
+    settings: Dict[str, Any] = {'error_rate': args.error_rate, 'page_size': args.page_size}
+    if args.latency is not None:
+        settings['latency'] = {key: args.latency for key in ('auth', 'check', 'quickauth', 'probe')}
+    
+    results: Dict[str, Any] = {}
+    with MockPortalServer(settings=settings) as server:
+        print("运行登录基准（串行步骤）...", file=sys.stderr)
+        results['login_sequential_steps'] = bench_login(server, args.iterations, parallel_steps=False)
+        print("运行登录基准（并发步骤）...", file=sys.stderr)
+        results['login_parallel_steps'] = bench_login(server, args.iterations, parallel_steps=True)
+        
+        for probe_type in ('get', 'stream', 'head', 'generate_204'):
+            print(f"运行探测基准（{probe_type}）...", file=sys.stderr)
+            results[f"probe_{probe_type}"] = bench_probe(server, args.iterations, probe_type)
+        print("运行探测基准（TCP分层）...", file=sys.stderr)
+        results['probe_tiered'] = bench_probe(server, args.iterations, 'stream', socket_probe=True)
+        
+        if args.fleet_accounts > 0:
+            print("运行批量登录基准...", file=sys.stderr)
+            results['fleet_login'] = bench_fleet(server, args.fleet_accounts, args.fleet_concurrency)
+        
+        settings = server.state.settings
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'mock_settings': settings
+        },
+        'results': results
+    }
+    
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
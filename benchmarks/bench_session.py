@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+会话预测基准测试
+模拟门户在登录固定秒数后断开会话，分别以被动检测（session.predictive=false）
+与预测续期两种模式运行守护进程，按固定频率采样门户侧的在线状态，对比在线时间比例
+
+示例:
+    python benchmarks/bench_session.py --lifetime 10 --interval 8 --duration 90
+"""
+
+import argparse
+import compileall
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_startup import ROOT, SCRIPT, write_config
+from benchmarks.mock_portal import MockPortalServer
+from history_store import HistoryStore
+
+
+def run_mode(predictive: bool, args: argparse.Namespace, directory: str) -> Dict[str, Any]:
+    """运行一次守护进程，返回整个过程的在线比例，以及稳定阶段（第一次提前续期之后）的在线比例"""
+    settings = {'latency': {key: 0.0 for key in ('auth', 'check', 'quickauth', 'probe')}, 'jitter': 0.0,
+                'page_size': 4096, 'session_lifetime': args.lifetime}
+    with MockPortalServer(settings=settings) as server:
+        config_file = write_config(directory, server)
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        # 每次检查都发起HTTP探测，掉线时间只取决于检查间隔
+        config['network']['http_probe_max_age'] = 0
+        config['scheduler'] = {'adaptive': False, 'check_interval': args.interval, 'min_interval': args.interval,
+                               'event_driven': False}
+        config['session'] = {'predictive': predictive, 'lead': args.lead, 'min_samples': args.min_samples}
+        history_file = os.path.join(directory, f"history_{'predictive' if predictive else 'reactive'}.db")
+        config['history'] = {'file': history_file}
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f)
+        
+        server.set_online('127.0.0.1', False)
+        process = subprocess.Popen([sys.executable, SCRIPT, '--config', config_file, '--daemon'], cwd=ROOT)
+        samples = []
+        start = time.monotonic()
+        try:
+            while time.monotonic() - start < args.duration:
+                samples.append((time.time(), server.state.is_online('127.0.0.1')))
+                time.sleep(args.sample_interval)
+        finally:
+            process.terminate()
+            process.wait(timeout=10)
+    
+    # 预测模式从第一次提前续期开始算稳定阶段，被动模式取与之相同的时间段
+    history = HistoryStore(history_file)
+    renewals = [row['ts'] for row in history.recent_logins(1000) if row['reason'] == 'renewal']
+    history.close()
+    if predictive:
+        args.learned_at = min(renewals) - samples[0][0] if renewals else None
+    steady_from = samples[0][0] + (getattr(args, 'learned_at', None) or args.duration / 2)
+    steady = [online for ts, online in samples if ts >= steady_from]
+    return {
+        'online_ratio': round(sum(online for _, online in samples) / len(samples), 4),
+        'online_ratio_after_learning': round(sum(steady) / len(steady), 4) if steady else None,
+        'renewals': len(renewals),
+        'quickauth_requests': server.state.counters.get('quickauth', 0)
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='会话预测续期基准测试')
+    parser.add_argument('--lifetime', type=float, default=10, help='模拟门户的会话时长（秒）')
+    parser.add_argument('--interval', type=float, default=8, help='守护进程检查间隔（秒）')
+    parser.add_argument('--lead', type=float, default=2, help='预计过期前提前续期的秒数')
+    parser.add_argument('--min-samples', type=int, default=3, help='开始预测所需的掉线样本数')
+    parser.add_argument('--duration', type=float, default=90, help='每种模式的运行时长（秒）')
+    parser.add_argument('--sample-interval', type=float, default=0.1, help='在线状态采样间隔（秒）')
+    parser.add_argument('--output', '-o', help='结果保存为JSON')
+    args = parser.parse_args()
+    
+    compileall.compile_dir(ROOT, maxlevels=0, quiet=1)
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as directory:
+        # 先运行预测模式，得到学习完成的时间点
+        for mode, predictive in (('predictive', True), ('reactive', False)):
+            print(f"运行会话预测基准（{mode}，{args.duration:.0f} 秒）...", file=sys.stderr)
+            results[mode] = run_mode(predictive, args, directory)
+    
+    print(f"{'模式':<12}{'在线比例':>10}{'稳定阶段在线比例':>18}{'提前续期':>10}{'登录请求':>10}")
+    for mode, result in results.items():
+        steady = result['online_ratio_after_learning']
+        print(f"{mode:<12}{result['online_ratio']:>10.1%}{steady if steady is None else format(steady, '.1%'):>18}"
+              f"{result['renewals']:>10}{result['quickauth_requests']:>10}")
+    
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+冷启动基准测试
+以 python -X importtime 分别运行 auto_login_enhanced.py 的各个命令行模式（对应systemd定时单次运行），
+记录进程总耗时、模块导入耗时以及是否加载了requests、cryptography等重量级模块
+
+示例:
+    python benchmarks/bench_startup.py --iterations 10 --output startup.json
+    python benchmarks/bench_startup.py --compare startup.json
+"""
+
+import argparse
+import compileall
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_login import git_commit
+from benchmarks.mock_portal import MockPortalServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, 'auto_login_enhanced.py')
+
+# 需要关注是否被导入的重量级模块
+HEAVY_MODULES = ('requests', 'urllib3', 'cryptography', 'aiohttp', 'flask', 'yaml')
+
+
+def parse_importtime(stderr: str) -> Tuple[float, Dict[str, float]]:
+    """
+    解析 -X importtime 输出
+    
+    Returns:
+        (顶层导入累计耗时毫秒, 各模块累计耗时毫秒)
+    """
+    total_us = 0
+    modules: Dict[str, float] = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        name = name[1:]
+        depth = len(name) - len(name.lstrip(' '))
+        name = name.strip()
+        modules[name] = int(cumulative) / 1000
+        if depth == 0:
+            total_us += int(cumulative)
+    return total_us / 1000, modules
+
+
+def run_mode(args: List[str], config_file: str, cwd: str) -> Dict[str, Any]:
+    """以 -X importtime 运行一次命令行"""
+    command = [sys.executable, '-X', 'importtime', SCRIPT, '--config', config_file] + args
+    start = time.perf_counter()
+    completed = subprocess.run(command, cwd=cwd, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - start) * 1000
+    import_ms, modules = parse_importtime(completed.stderr)
+    return {
+        'wall_ms': wall_ms,
+        'import_ms': import_ms,
+        'returncode': completed.returncode,
+        'heavy': sorted(name for name in HEAVY_MODULES if name in modules),
+        'top_imports': sorted(
+            ((name, ms) for name, ms in modules.items() if '.' not in name),
+            key=lambda item: item[1], reverse=True
+        )[:8]
+    }
+
+
+def interpreter_baseline(iterations: int) -> float:
+    """空解释器启动耗时（毫秒），用于扣除固定开销"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def write_config(directory: str, server: MockPortalServer) -> str:
+    """生成指向模拟门户的配置文件"""
+    host, port = server.httpd.server_address[:2]
+    config = {
+        'network': {
+            'login_url': server.login_url(),
+            'auto_discover': False,
+            'test_url': f"{server.base_url}/",
+            'probe_type': 'stream',
+            'portal_hosts': [f"{host}:{port}"],
+            'external_hosts': [f"{host}:{port}"],
+            'retry_attempts': 1
+        },
+        'portal': server.endpoints(),
+        'credentials': {'username': 'bench', 'password': 'secret'},
+        'logging': {'file': os.path.join(directory, 'startup.log'), 'console_output': False},
+        'security': {'encryption_key_file': os.path.join(directory, '.keyfile')}
+    }
+    path = os.path.join(directory, 'config.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f)
+    return path
+
+
+def summarize_runs(runs: List[Dict[str, Any]]) -> Dict[str, Any]:
+    return {
+        'wall_ms_p50': round(statistics.median(run['wall_ms'] for run in runs), 2),
+        'wall_ms_min': round(min(run['wall_ms'] for run in runs), 2),
+        'import_ms_p50': round(statistics.median(run['import_ms'] for run in runs), 2),
+        'heavy_modules': runs[-1]['heavy'],
+        'top_imports': [[name, round(ms, 2)] for name, ms in runs[-1]['top_imports']],
+        'failures': sum(1 for run in runs if run['returncode'] != 0)
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]) -> None:
+    """打印与基线结果的对比"""
+    print(f"\n与基线 {baseline['meta'].get('git_commit')} 对比（比值<1表示更快）:", file=sys.stderr)
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratios = [f"{key}={result[key] / base[key]:.2f}x" for key in ('wall_ms_p50', 'import_ms_p50') if base.get(key)]
+        print(f"  {name}: {', '.join(ratios)}", file=sys.stderr)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='命令行各模式冷启动基准测试')
+    parser.add_argument('--iterations', type=int, default=10, help='每个模式的运行次数')
+    parser.add_argument('--output', '-o', help='结果JSON输出文件，默认输出到标准输出')
+    parser.add_argument('--compare', help='与之前保存的结果JSON对比')
+    args = parser.parse_args()
+    
+    # 门户只在登录流程中产生延迟，探测与接口本身不加延迟，测出的是启动开销
+    settings = {'latency': {key: 0.0 for key in ('auth', 'check', 'quickauth', 'probe')}, 'jitter': 0.0,
+                'page_size': 4096}
+    modes: List[Tuple[str, List[str], Optional[bool]]] = [
+        ('help', ['--help'], None),
+        ('once_online', [], True),
+        ('once_offline_login', [], False),
+        ('status', ['--status'], True),
+    ]
+    
+    # 与部署环境一致，先生成字节码缓存（PYTHONDONTWRITEBYTECODE时运行中不会写入），避免把编译源码的时间算进启动
+    compileall.compile_dir(ROOT, maxlevels=0, quiet=1)
+    
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as directory, MockPortalServer(settings=settings) as server:
+        config_file = write_config(directory, server)
+        baseline_ms = interpreter_baseline(args.iterations)
+        for name, mode_args, online in modes:
+            print(f"运行冷启动基准（{name}）...", file=sys.stderr)
+            runs = []
+            for _ in range(args.iterations):
+                if online is not None:
+                    server.set_online('127.0.0.1', online)
+                runs.append(run_mode(mode_args, config_file, directory))
+            results[name] = summarize_runs(runs)
+            results[name]['startup_overhead_ms'] = round(results[name]['wall_ms_p50'] - baseline_ms, 2)
+    
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': args.iterations,
+            'interpreter_ms': round(baseline_ms, 2)
+        },
+        'results': results
+    }
+    
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"结果已保存到: {args.output}", file=sys.stderr)
+    else:
+        print(output)
+    
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            compare(report, json.load(f))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
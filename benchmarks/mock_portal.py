@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+本地模拟认证门户
+模拟 /aaa-auth/api/v1/auth、/user/check-only、/quickauth.do 三个认证接口以及外网探测目标，
+可配置延迟、错误率和响应内容，用于离开校园网时测量登录耗时和回归测试
+"""
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+import urllib.parse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional
+
+
+DEFAULT_SETTINGS = {
+    # 各接口的基础延迟与随机抖动（秒）
+    'latency': {
+        'auth': 0.02,
+        'check': 0.02,
+        'quickauth': 0.05,
+        'probe': 0.01
+    },
+    'jitter': 0.005,
+    # 返回HTTP 500的概率
+    'error_rate': 0.0,
+    # 认证/检查接口返回的JSON
+    'auth_response': {'code': 1, 'msg': 'success'},
+    'check_response': {'code': 1, 'msg': 'success'},
+    # quickauth.do 成功/失败时返回的JSON
+    'quickauth_success': {'code': '0', 'message': '认证成功'},
+    'quickauth_failure': {'code': '1', 'message': '用户名或密码错误'},
+    # 接受的密码，None表示接受任意密码
+    'password': None,
+    # 模拟外网首页大小（字节）
+    'page_size': 300 * 1024,
+    # 为True时未登录的探测请求被劫持到门户页面
+    'captive': True,
+    # 会话在登录多少秒后被门户断开，0表示不断开
+    'session_lifetime': 0
+}
+
+
+class MockPortalState:
+    """模拟门户的共享状态"""
+    
+    def __init__(self, settings: Optional[Dict[str, Any]] = None):
+        self.settings = json.loads(json.dumps(DEFAULT_SETTINGS))
+        for key, value in (settings or {}).items():
+            if isinstance(value, dict) and isinstance(self.settings.get(key), dict):
+                self.settings[key].update(value)
+            else:
+                self.settings[key] = value
+        self.online_ips = set()
+        # 各地址最近一次登录的时间，用于模拟会话超时
+        self.login_times: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.lock = threading.Lock()
+        self._rng = random.Random()
+    
+    def count(self, name: str) -> None:
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+    
+    def delay(self, endpoint: str) -> None:
+        base = self.settings['latency'].get(endpoint, 0)
+        jitter = self.settings['jitter']
+        time.sleep(max(0.0, base + self._rng.uniform(-jitter, jitter)))
+    
+    def should_fail(self) -> bool:
+        return self._rng.random() < self.settings['error_rate']
+    
+    def is_online(self, client_ip: str) -> bool:
+        if not self.settings['captive']:
+            return True
+        with self.lock:
+            lifetime = self.settings['session_lifetime']
+            if lifetime and time.time() - self.login_times.get(client_ip, 0) > lifetime:
+                self.online_ips.discard(client_ip)
+            return client_ip in self.online_ips
+
+
+class MockPortalHandler(BaseHTTPRequestHandler):
+    """模拟门户请求处理器"""
+    
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+    state: MockPortalState = None
+    portal_url = ''
+    
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+    
+    def _send(self, status: int, body: bytes = b'', content_type: str = 'text/html; charset=utf-8',
+              headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+    
+    def _send_json(self, data: Dict[str, Any]) -> None:
+        self._send(200, json.dumps(data, ensure_ascii=False).encode('utf-8'), 'application/json;charset=UTF-8')
+    
+    def _read_form(self) -> Dict[str, str]:
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length).decode('utf-8') if length else ''
+        return {k: v[0] for k, v in urllib.parse.parse_qs(body).items()}
+    
+    def _fail_randomly(self) -> bool:
+        if self.state.should_fail():
+            self.state.count('errors')
+            self._send(500, b'Internal Server Error', 'text/plain')
+            return True
+        return False
+    
+    def do_POST(self) -> None:
+        path = urllib.parse.urlparse(self.path).path
+        self._read_form()
+        if path == '/aaa-auth/api/v1/auth':
+            endpoint, response = 'auth', self.state.settings['auth_response']
+        elif path == '/user/check-only':
+            endpoint, response = 'check', self.state.settings['check_response']
+        else:
+            self._send(404, b'Not Found', 'text/plain')
+            return
+        
+        self.state.count(endpoint)
+        self.state.delay(endpoint)
+        if not self._fail_randomly():
+            self._send_json(response)
+    
+    def do_HEAD(self) -> None:
+        self.do_GET()
+    
+    def do_GET(self) -> None:
+        parsed = urllib.parse.urlparse(self.path)
+        if parsed.path == '/quickauth.do':
+            self._quickauth(urllib.parse.parse_qs(parsed.query))
+        elif parsed.path == '/generate_204':
+            self._probe(generate_204=True)
+        elif parsed.path == '/stats':
+            with self.state.lock:
+                self._send_json({'counters': dict(self.state.counters), 'online': sorted(self.state.online_ips)})
+        elif parsed.path == '/logout':
+            with self.state.lock:
+                self.state.online_ips.discard(self.client_address[0])
+            self._send_json({'code': '0'})
+        else:
+            self._probe(generate_204=False)
+    
+    def _quickauth(self, params: Dict[str, Any]) -> None:
+        self.state.count('quickauth')
+        self.state.delay('quickauth')
+        if self._fail_randomly():
+            return
+        
+        expected_password = self.state.settings['password']
+        password = params.get('passwd', [''])[0]
+        if expected_password is not None and password != expected_password:
+            self._send_json(self.state.settings['quickauth_failure'])
+            return
+        
+        with self.state.lock:
+            self.state.online_ips.add(self.client_address[0])
+            self.state.login_times[self.client_address[0]] = time.time()
+        self._send_json(self.state.settings['quickauth_success'])
+    
+    def _probe(self, generate_204: bool) -> None:
+        self.state.count('probe')
+        self.state.delay('probe')
+        client_ip = self.client_address[0]
+        
+        if not self.state.is_online(client_ip):
+            # 未登录：按真实门户的方式劫持到登录页
+            login_url = f"{self.portal_url}/portalReceiveAction.do?wlanuserip={client_ip}&wlanacname=MOCK-AC"
+            body = f"<html><script>top.self.location.href='{login_url}'</script></html>".encode('utf-8')
+            self._send(200, body)
+            return
+        
+        if generate_204:
+            self._send(204)
+            return
+        
+        head = '<!DOCTYPE html><html><head><title>百度一下，你就知道</title>' \
+               '<link rel="dns-prefetch" href="//s1.bdstatic.com"/></head><body>baidu 搜索'
+        page = head.encode('utf-8')
+        page += b' ' * max(0, self.state.settings['page_size'] - len(page) - 14) + b'</body></html>'
+        self._send(200, page)
+
+
+class _QuietHTTPServer(ThreadingHTTPServer):
+    """忽略客户端提前断开（流式探测读够即关闭连接）产生的错误"""
+    
+    daemon_threads = True
+    # 默认的监听队列只有5，批量登录和TCP探测突发连接时会丢SYN
+    request_queue_size = 256
+    
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        if not isinstance(sys.exc_info()[1], (ConnectionResetError, BrokenPipeError)):
+            super().handle_error(request, client_address)
+
+
+class MockPortalServer:
+    """在后台线程中运行的模拟门户"""
+    
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, settings: Optional[Dict[str, Any]] = None):
+        self.state = MockPortalState(settings)
+        handler = type('BoundMockPortalHandler', (MockPortalHandler,), {'state': self.state})
+        self.httpd = _QuietHTTPServer((host, port), handler)
+        handler.portal_url = self.base_url
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+    
+    def endpoints(self) -> Dict[str, str]:
+        """HENUAuthenticator 可用的接口地址覆盖"""
+        return {
+            'auth_api_url': f"{self.base_url}/aaa-auth/api/v1/auth",
+            'check_api_url': f"{self.base_url}/user/check-only",
+            'quickauth_url': f"{self.base_url}/quickauth.do",
+            'verify_url': f"{self.base_url}/"
+        }
+    
+    def login_url(self, wlanuserip: str = '127.0.0.1') -> str:
+        return f"{self.base_url}/portalReceiveAction.do?wlanuserip={wlanuserip}&wlanacname=MOCK-AC"
+    
+    def set_online(self, client_ip: str, online: bool) -> None:
+        with self.state.lock:
+            if online:
+                self.state.online_ips.add(client_ip)
+                self.state.login_times[client_ip] = time.time()
+            else:
+                self.state.online_ips.discard(client_ip)
+    
+    def start(self) -> 'MockPortalServer':
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+    
+    def __enter__(self) -> 'MockPortalServer':
+        return self.start()
+    
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='河南大学校园网认证门户本地模拟服务器')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=8000, help='监听端口')
+    parser.add_argument('--latency', type=float, default=None, help='所有接口统一的基础延迟（秒）')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='返回500的概率')
+    parser.add_argument('--page-size', type=int, default=DEFAULT_SETTINGS['page_size'], help='模拟外网首页大小（字节）')
+    parser.add_argument('--settings', help='JSON格式的完整设置文件，覆盖默认设置')
+    args = parser.parse_args()
+    
+    settings: Dict[str, Any] = {}
+    if args.settings:
+        with open(args.settings, 'r', encoding='utf-8') as f:
+            settings = json.load(f)
+    if args.latency is not None:
+        settings['latency'] = {key: args.latency for key in DEFAULT_SETTINGS['latency']}
+    settings['error_rate'] = args.error_rate
+    settings['page_size'] = args.page_size
+    
+    server = MockPortalServer(args.host, args.port, settings)
+    print(f"模拟门户已启动: {server.base_url}")
+    print(f"登录URL: {server.login_url()}")
+    print("接口地址配置（写入配置文件的portal部分）:")
+    print(json.dumps(server.endpoints(), indent=4))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
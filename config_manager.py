@@ -6,9 +6,32 @@
 import json
 import os
 import logging
-from typing import Dict, Any, Optional
+import tempfile
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Callable, List, Mapping, Tuple
 from pathlib import Path
 
+from config_snapshot import ConfigSnapshot
+
+
+def freeze(value: Any) -> Any:
+    """递归转换为只读结构（字典->MappingProxyType，列表->元组）"""
+    if isinstance(value, Mapping):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """把只读快照转换回可修改、可序列化的普通字典与列表"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(item) for item in value]
+    return value
+
 
 class ConfigManager:
     """配置文件管理器"""
@@ -16,10 +39,36 @@ class ConfigManager:
     DEFAULT_CONFIG = {
         "network": {
             "login_url": "",
+            "auto_discover": True,
             "test_url": "http://www.baidu.com",
             "timeout": 10,
             "retry_attempts": 3,
-            "retry_delay": 5
+            "retry_delay": 5,
+            "parallel_login_steps": True,
+            "keep_alive": True,
+            "pool_connections": 2,
+            "pool_maxsize": 4,
+            "probe_retries": 1,
+            "probe_type": "stream",
+            "probe_url": "",
+            "probe_max_bytes": 4096,
+            "socket_probe": True,
+            "portal_hosts": ["172.29.35.27:8088", "172.29.35.36:6060"],
+            "external_hosts": ["www.baidu.com:80"],
+            "socket_timeout": 0.5,
+            "http_probe_max_age": 60,
+            "status_ttl": 10,
+            "probe_urls": [],
+            "hedge_delay": 0.3,
+            "dns_ttl": 300,
+            "dns_timeout": 2,
+            "dns_hijack_networks": ["172.29.0.0/16"]
+        },
+        "portal": {
+            "auth_api_url": "",
+            "check_api_url": "",
+            "quickauth_url": "",
+            "verify_url": ""
         },
         "credentials": {
             "username": "",
@@ -29,19 +78,54 @@ class ConfigManager:
         "scheduler": {
             "enabled": False,
             "check_interval": 300,
-            "auto_retry_on_failure": True
+            "auto_retry_on_failure": True,
+            "event_driven": True,
+            "link_debounce": 1.0,
+            "adaptive": True,
+            "backoff_factor": 2.0,
+            "stable_growth": 1.5,
+            "jitter": 0.1
+        },
+        "fleet": {
+            "concurrency": 50,
+            "verify": True
         },
         "logging": {
             "level": "INFO",
             "file": "auto_login.log",
             "max_size_mb": 10,
             "backup_count": 5,
-            "console_output": True
+            "console_output": True,
+            "async_queue": True,
+            "queue_size": 10000,
+            "format": "text",
+            "index_bucket": 60
+        },
+        "hot_reload": {
+            "enabled": True,
+            "poll_interval": 2.0
         },
         "security": {
             "encrypt_credentials": False,
-            "encryption_key_file": ".keyfile"
-        }
+            "encryption_key_file": ".keyfile",
+            "credential_cache_ttl": 300,
+            "kdf_iterations": 480000
+        },
+        "history": {
+            "enabled": True,
+            "file": "history.db",
+            "retention_days": 30
+        },
+        "session": {
+            "predictive": True,
+            "min_samples": 3,
+            "quantile": 0.2,
+            "lead": 30,
+            "proactive_relogin": True,
+            "sample_limit": 50
+        },
+        # 多链路绑定：每项为 {name, interface 或 source_ip, login_url, username, password, operator}
+        "bindings": []
     }
     
     def __init__(self, config_file: Optional[str] = None):
@@ -53,7 +137,68 @@ class ConfigManager:
         """
         self.logger = logging.getLogger(__name__)
         self.config_file = config_file or self._find_config_file()
-        self.config = self._load_config()
+        self.version = 0
+        # 每次发布新快照后调用，参数为新快照
+        self.listeners: List[Callable[[Mapping[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._file_signature = self._stat_signature()
+        config = self._load_config()
+        self._snapshot: Mapping[str, Any] = freeze(config)
+        self._settings = self.compile(config)
+    
+    @property
+    def config(self) -> Mapping[str, Any]:
+        """
+        当前配置的只读快照
+        
+        快照在重新加载或更新时整体替换，持有旧快照的读取方不会看到修改到一半的配置
+        """
+        return self._snapshot
+    
+    @property
+    def settings(self) -> ConfigSnapshot:
+        """
+        当前配置编译后的类型化快照（与 config 同时替换）
+        
+        环境变量覆盖与校验已在编译时完成，热路径上直接读取属性，不再逐级查找字典
+        """
+        return self._settings
+    
+    @classmethod
+    def compile(cls, config: Mapping[str, Any]) -> ConfigSnapshot:
+        """把合并后的配置编译为类型化快照"""
+        return ConfigSnapshot.compile(config, cls.DEFAULT_CONFIG)
+    
+    @config.setter
+    def config(self, new_config: Mapping[str, Any]) -> None:
+        self._publish(self._merge_configs(self.DEFAULT_CONFIG, thaw(new_config)))
+    
+    def _publish(self, config: Dict[str, Any], settings: Optional[ConfigSnapshot] = None) -> Mapping[str, Any]:
+        """原子地发布新快照并通知监听器"""
+        snapshot = freeze(config)
+        settings = settings or self.compile(config)
+        with self._lock:
+            self._snapshot = snapshot
+            self._settings = settings
+            self.version += 1
+        for listener in list(self.listeners):
+            try:
+                listener(snapshot)
+            except Exception as e:
+                self.logger.error(f"应用新配置失败: {e}", exc_info=True)
+        return snapshot
+    
+    def subscribe(self, listener: Callable[[Mapping[str, Any]], None]) -> None:
+        """注册配置变化监听器"""
+        self.listeners.append(listener)
+    
+    def _stat_signature(self) -> Optional[Tuple[int, int, int]]:
+        """配置文件的 (inode, 大小, 修改时间)，用于判断文件是否真的变化"""
+        try:
+            stat = os.stat(self.config_file)
+        except OSError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
     
     def _find_config_file(self) -> str:
         """查找配置文件"""
@@ -73,41 +218,107 @@ class ConfigManager:
         self.logger.warning("未找到配置文件，将使用默认配置")
         return "config.json"
     
+    def _read_config_file(self) -> Dict[str, Any]:
+        """读取并解析配置文件，与默认配置合并（失败时抛出异常）"""
+        with open(self.config_file, 'r', encoding='utf-8') as f:
+            if self.config_file.endswith(('.yaml', '.yml')):
+                import yaml
+                config = yaml.safe_load(f) or {}
+            else:
+                config = json.load(f)
+        
+        if not isinstance(config, dict):
+            raise ValueError("配置文件顶层必须是对象")
+        
+        # 合并默认配置和用户配置
+        return self._merge_configs(self.DEFAULT_CONFIG, config)
+    
     def _load_config(self) -> Dict[str, Any]:
         """加载配置文件"""
         if not os.path.exists(self.config_file):
             self.logger.warning(f"配置文件 {self.config_file} 不存在，使用默认配置")
-            return self.DEFAULT_CONFIG.copy()
+            return thaw(self.DEFAULT_CONFIG)
         
         try:
-            with open(self.config_file, 'r', encoding='utf-8') as f:
-                if self.config_file.endswith(('.yaml', '.yml')):
-                    try:
-                        import yaml
-                        config = yaml.safe_load(f)
-                    except ImportError:
-                        self.logger.error("需要安装PyYAML才能读取YAML配置文件")
-                        return self.DEFAULT_CONFIG.copy()
-                else:
-                    config = json.load(f)
-            
-            # 合并默认配置和用户配置
-            merged_config = self._merge_configs(self.DEFAULT_CONFIG, config)
+            merged_config = self._read_config_file()
             self.logger.info(f"成功加载配置文件: {self.config_file}")
             return merged_config
             
+        except ImportError:
+            self.logger.error("需要安装PyYAML才能读取YAML配置文件")
+            return thaw(self.DEFAULT_CONFIG)
         except Exception as e:
             self.logger.error(f"加载配置文件失败: {e}", exc_info=True)
-            return self.DEFAULT_CONFIG.copy()
+            return thaw(self.DEFAULT_CONFIG)
+    
+    def reload(self, force: bool = False) -> bool:
+        """
+        重新加载配置文件：解析、合并与校验只做一次，通过后发布新快照
+        
+        文件无法解析或配置项取值无效时保留当前快照
+        
+        Args:
+            force: 文件未变化时也重新加载
+        
+        Returns:
+            是否发布了新快照
+        """
+        signature = self._stat_signature()
+        if not force and signature == self._file_signature:
+            return False
+        self._file_signature = signature
+        
+        if signature is None:
+            self.logger.warning(f"配置文件 {self.config_file} 不存在，保留当前配置")
+            return False
+        
+        try:
+            config = self._read_config_file()
+        except Exception as e:
+            self.logger.error(f"重新加载配置文件失败，保留当前配置: {e}")
+            return False
+        
+        settings = self.compile(config)
+        if settings.value_errors:
+            self.logger.error(f"新配置无效，保留当前配置: {'; '.join(settings.value_errors)}")
+            return False
+        
+        if config == thaw(self._snapshot):
+            # 凭据环境变量可能已变化，照常替换编译结果，但不通知监听器
+            self._settings = settings
+            return False
+        
+        self._publish(config, settings)
+        self.logger.info(f"配置已重新加载: {self.config_file}（版本 {self.version}）")
+        return True
+    
+    def update_config(self, new_config: Mapping[str, Any]) -> Tuple[bool, List[str]]:
+        """
+        校验、原子写入并发布新配置（Web界面使用）
+        
+        Args:
+            new_config: 完整或部分配置，缺少的项使用默认值
+        
+        Returns:
+            (是否成功, 错误信息列表)
+        """
+        config = self._merge_configs(self.DEFAULT_CONFIG, thaw(new_config))
+        settings = self.compile(config)
+        if settings.value_errors:
+            return False, list(settings.value_errors)
+        if not self.save_config(config):
+            return False, ["写入配置文件失败"]
+        self._publish(config, settings)
+        return True, []
     
     def _merge_configs(self, default: Dict, user: Dict) -> Dict:
-        """递归合并默认配置和用户配置"""
-        merged = default.copy()
+        """递归合并默认配置和用户配置（返回新字典，不修改默认配置）"""
+        merged = thaw(default)
         for key, value in user.items():
             if key in merged and isinstance(merged[key], dict) and isinstance(value, dict):
                 merged[key] = self._merge_configs(merged[key], value)
             else:
-                merged[key] = value
+                merged[key] = thaw(value)
         return merged
     
     def save_config(self, config: Optional[Dict[str, Any]] = None) -> bool:
@@ -120,7 +331,7 @@ class ConfigManager:
         Returns:
             bool: 是否保存成功
         """
-        config_to_save = config or self.config
+        config_to_save = thaw(config or self.config)
         
         try:
             # 确保目录存在
@@ -128,17 +339,30 @@ class ConfigManager:
             if config_dir:
                 os.makedirs(config_dir, exist_ok=True)
             
-            with open(self.config_file, 'w', encoding='utf-8') as f:
-                if self.config_file.endswith(('.yaml', '.yml')):
-                    try:
-                        import yaml
-                        yaml.safe_dump(config_to_save, f, default_flow_style=False)
-                    except ImportError:
-                        self.logger.error("需要安装PyYAML才能保存YAML配置文件")
-                        return False
-                else:
-                    json.dump(config_to_save, f, indent=4, ensure_ascii=False)
+            # 先写入同目录的临时文件再原子替换，读取方不会读到写了一半的文件
+            fd, temp_path = tempfile.mkstemp(dir=config_dir or '.', prefix='.config-', suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    if self.config_file.endswith(('.yaml', '.yml')):
+                        try:
+                            import yaml
+                            yaml.safe_dump(config_to_save, f, default_flow_style=False, allow_unicode=True)
+                        except ImportError:
+                            self.logger.error("需要安装PyYAML才能保存YAML配置文件")
+                            return False
+                    else:
+                        json.dump(config_to_save, f, indent=4, ensure_ascii=False)
+                    f.flush()
+                    os.fsync(f.fileno())
+                if os.path.exists(self.config_file):
+                    os.chmod(temp_path, os.stat(self.config_file).st_mode & 0o777)
+                os.replace(temp_path, self.config_file)
+            finally:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
             
+            # 自己写入的变化不需要再由监视器重新加载
+            self._file_signature = self._stat_signature()
             self.logger.info(f"配置已保存到: {self.config_file}")
             return True
             
@@ -157,11 +381,14 @@ class ConfigManager:
         Returns:
             配置项的值
         """
-        keys = key_path.split('.')
-        value = self.config
+        return self._lookup(self.config, key_path, default)
         
+    @staticmethod
+    def _lookup(config: Mapping[str, Any], key_path: str, default: Any = None) -> Any:
+        """按点号分隔的路径查找配置项"""
+        value = config
         try:
-            for key in keys:
+            for key in key_path.split('.'):
                 value = value[key]
             return value
         except (KeyError, TypeError):
@@ -176,28 +403,27 @@ class ConfigManager:
             value: 要设置的值
         """
         keys = key_path.split('.')
-        config = self.config
+        new_config = thaw(self.config)
+        config = new_config
         
         for key in keys[:-1]:
-            if key not in config:
+            if not isinstance(config.get(key), dict):
                 config[key] = {}
             config = config[key]
         
         config[keys[-1]] = value
+        # 写时复制：修改副本后发布为新快照
+        self._publish(new_config)
     
     def get_credentials(self) -> Dict[str, str]:
         """
         获取认证凭据
-        优先从环境变量读取，其次从配置文件读取
+        优先从环境变量读取，其次从配置文件读取（环境变量在加载或重新加载配置时读取）
         
         Returns:
             包含username, password, operator的字典
         """
-        return {
-            'username': os.environ.get('HENU_USERNAME') or self.get('credentials.username', ''),
-            'password': os.environ.get('HENU_PASSWORD') or self.get('credentials.password', ''),
-            'operator': os.environ.get('HENU_OPERATOR') or self.get('credentials.operator', 'local')
-        }
+        return self._settings.credentials.as_dict()
     
     def validate_config(self) -> tuple[bool, list[str]]:
         """
@@ -206,26 +432,16 @@ class ConfigManager:
         Returns:
             (是否有效, 错误信息列表)
         """
-        errors = []
-        
-        # 检查必需的配置项
-        login_url = self.get('network.login_url')
-        if not login_url:
-            errors.append("缺少必需的配置项: network.login_url")
-        
-        creds = self.get_credentials()
-        if not creds['username']:
-            errors.append("缺少必需的配置项: credentials.username")
-        if not creds['password']:
-            errors.append("缺少必需的配置项: credentials.password")
-        
-        # 检查配置项的有效性
-        timeout = self.get('network.timeout', 0)
-        if timeout <= 0:
-            errors.append("network.timeout 必须大于0")
-        
-        retry_attempts = self.get('network.retry_attempts', 0)
-        if retry_attempts < 0:
-            errors.append("network.retry_attempts 不能小于0")
-        
+        errors = list(self._settings.errors)
         return len(errors) == 0, errors
+    
+    @classmethod
+    def validate_values(cls, config: Mapping[str, Any]) -> List[str]:
+        """
+        检查配置项取值是否有效（不检查凭据等必需项，重新加载时用于决定是否接受新配置）
+        
+        Returns:
+            错误信息列表
+        """
+        return list(cls.compile(config).value_errors)
+        
\ No newline at end of file
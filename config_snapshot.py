@@ -0,0 +1,448 @@
+"""
+类型化配置快照
+每次加载或重新加载配置时把合并后的字典编译为按部分划分的只读对象，
+环境变量覆盖与配置校验也只在此时执行一次，之后的读取都是普通属性访问
+"""
+
+import ipaddress
+import os
+from typing import Any, Dict, List, Mapping, Optional, Tuple, Union
+
+
+class Settings:
+    """
+    只读配置部分的基类
+    
+    子类用 __slots__ 声明字段（不用dataclass：每次启动生成方法的开销对单次运行不可忽略），
+    DEFAULTS 给出可省略字段的默认值
+    """
+    
+    __slots__ = ()
+    DEFAULTS: Dict[str, Any] = {}
+    # repr 中隐藏的字段
+    SECRET_FIELDS: Tuple[str, ...] = ()
+    
+    def __init__(self, **values: Any):
+        for name in self.__slots__:
+            if name in values:
+                value = values.pop(name)
+            elif name in self.DEFAULTS:
+                value = self.DEFAULTS[name]
+            else:
+                raise TypeError(f"{type(self).__name__} 缺少字段: {name}")
+            object.__setattr__(self, name, value)
+        if values:
+            raise TypeError(f"{type(self).__name__} 没有字段: {', '.join(values)}")
+    
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError(f"{type(self).__name__} 是只读的")
+    
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} 是只读的")
+    
+    def __eq__(self, other: Any) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self) -> str:
+        values = ', '.join(
+            f"{name}={'***' if name in self.SECRET_FIELDS else repr(getattr(self, name))}"
+            for name in self.__slots__
+        )
+        return f"{type(self).__name__}({values})"
+    
+    def replace(self, **changes: Any) -> 'Settings':
+        """返回修改了部分字段的副本"""
+        return type(self)(**{**self.to_dict(), **changes})
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class NetworkSettings(Settings):
+    """network 部分"""
+    
+    __slots__ = (
+        'login_url', 'auto_discover', 'test_url', 'timeout', 'retry_attempts', 'retry_delay',
+        'parallel_login_steps', 'keep_alive', 'pool_connections', 'pool_maxsize', 'probe_retries',
+        'probe_type', 'probe_url', 'probe_max_bytes', 'socket_probe', 'portal_hosts', 'external_hosts',
+        'socket_timeout', 'http_probe_max_age', 'status_ttl', 'probe_urls', 'hedge_delay',
+        'dns_ttl', 'dns_timeout', 'dns_hijack_networks'
+    )
+    login_url: str
+    auto_discover: bool
+    test_url: str
+    timeout: float
+    retry_attempts: int
+    retry_delay: float
+    parallel_login_steps: bool
+    keep_alive: bool
+    pool_connections: int
+    pool_maxsize: int
+    probe_retries: int
+    probe_type: str
+    probe_url: str
+    probe_max_bytes: int
+    socket_probe: bool
+    portal_hosts: Tuple[str, ...]
+    external_hosts: Tuple[str, ...]
+    socket_timeout: float
+    http_probe_max_age: float
+    status_ttl: float
+    # URL字符串，或 {"url", "type", "keywords"} 形式单独指定预期的目标对象
+    probe_urls: Tuple[Union[str, Mapping[str, Any]], ...]
+    hedge_delay: float
+    dns_ttl: float
+    dns_timeout: float
+    dns_hijack_networks: Tuple[str, ...]
+
+
+class PortalSettings(Settings):
+    """portal 部分（接口地址覆盖）"""
+    
+    __slots__ = ('auth_api_url', 'check_api_url', 'quickauth_url', 'verify_url')
+    auth_api_url: str
+    check_api_url: str
+    quickauth_url: str
+    verify_url: str
+    
+    def endpoints(self) -> Dict[str, str]:
+        """HENUAuthenticator 的 endpoints 参数"""
+        return self.to_dict()
+
+
+class CredentialSettings(Settings):
+    """credentials 部分，已应用 HENU_USERNAME/HENU_PASSWORD/HENU_OPERATOR 环境变量"""
+    
+    __slots__ = ('username', 'password', 'operator', 'encrypted')
+    DEFAULTS = {'encrypted': False}
+    SECRET_FIELDS = ('password',)
+    username: str
+    password: str
+    operator: str
+    # 用户名和密码是否为 CredentialVault 加密后的密文
+    encrypted: bool
+    
+    def as_dict(self) -> Dict[str, str]:
+        return {'username': self.username, 'password': self.password, 'operator': self.operator}
+
+
+class SchedulerSettings(Settings):
+    """scheduler 部分"""
+    
+    __slots__ = (
+        'enabled', 'check_interval', 'auto_retry_on_failure', 'event_driven', 'link_debounce', 'adaptive',
+        'min_interval', 'backoff_factor', 'stable_growth', 'jitter', 'max_interval'
+    )
+    DEFAULTS = {'min_interval': None, 'max_interval': None}
+    enabled: bool
+    check_interval: float
+    auto_retry_on_failure: bool
+    event_driven: bool
+    link_debounce: float
+    adaptive: bool
+    # 未配置时为15秒，check_interval 更短时等于 check_interval
+    min_interval: Optional[float]
+    backoff_factor: float
+    stable_growth: float
+    jitter: float
+    # 未配置时等于 check_interval
+    max_interval: Optional[float]
+
+
+class FleetSettings(Settings):
+    """fleet 部分"""
+    
+    __slots__ = ('concurrency', 'verify')
+    concurrency: int
+    verify: bool
+
+
+class LoggingSettings(Settings):
+    """logging 部分"""
+    
+    __slots__ = (
+        'level', 'file', 'max_size_mb', 'backup_count', 'console_output', 'async_queue', 'queue_size',
+        'format', 'index_bucket'
+    )
+    level: str
+    file: str
+    max_size_mb: int
+    backup_count: int
+    console_output: bool
+    async_queue: bool
+    queue_size: int
+    # text 或 json
+    format: str
+    index_bucket: int
+
+
+class HotReloadSettings(Settings):
+    """hot_reload 部分"""
+    
+    __slots__ = ('enabled', 'poll_interval')
+    enabled: bool
+    poll_interval: float
+
+
+class SecuritySettings(Settings):
+    """security 部分"""
+    
+    __slots__ = ('encrypt_credentials', 'encryption_key_file', 'credential_cache_ttl', 'kdf_iterations')
+    encrypt_credentials: bool
+    encryption_key_file: str
+    credential_cache_ttl: float
+    kdf_iterations: int
+
+
+class HistorySettings(Settings):
+    """history 部分"""
+    
+    __slots__ = ('enabled', 'file', 'retention_days')
+    enabled: bool
+    file: str
+    retention_days: float
+
+
+class SessionSettings(Settings):
+    """session 部分（会话时长预测与提前续期）"""
+    
+    __slots__ = ('predictive', 'min_samples', 'quantile', 'lead', 'proactive_relogin', 'sample_limit')
+    predictive: bool
+    min_samples: int
+    quantile: float
+    lead: float
+    proactive_relogin: bool
+    sample_limit: int
+
+
+class BindingSettings(Settings):
+    """bindings 列表中的一项：一条上行链路的源地址、登录URL与凭据"""
+    
+    __slots__ = ('name', 'interface', 'source_ip', 'login_url', 'username', 'password', 'operator', 'encrypted')
+    DEFAULTS = {
+        'name': '', 'interface': '', 'source_ip': '', 'login_url': '',
+        'username': '', 'password': '', 'operator': '', 'encrypted': False
+    }
+    SECRET_FIELDS = ('password',)
+    name: str
+    # 网卡名，每次检查前重新读取其地址；配置了 source_ip 时以 source_ip 为准
+    interface: str
+    source_ip: str
+    # 为空时使用自动发现（或 network.login_url）
+    login_url: str
+    # 为空时使用 credentials 部分的账号
+    username: str
+    password: str
+    operator: str
+    encrypted: bool
+    
+    def credentials(self, fallback: CredentialSettings) -> CredentialSettings:
+        """该链路使用的凭据，未单独配置账号时使用全局凭据（运营商可单独覆盖）"""
+        if not self.username:
+            return fallback.replace(operator=self.operator) if self.operator else fallback
+        return CredentialSettings(
+            username=self.username, password=self.password,
+            operator=self.operator or fallback.operator, encrypted=bool(self.encrypted)
+        )
+
+
+# 环境变量 -> credentials 字段
+CREDENTIAL_ENV_VARS = {
+    'username': 'HENU_USERNAME',
+    'password': 'HENU_PASSWORD',
+    'operator': 'HENU_OPERATOR'
+}
+
+
+def _build_section(cls: type, defaults: Mapping[str, Any], values: Any) -> Any:
+    """按 __slots__ 声明的字段从配置部分取值，缺失时使用默认配置，列表转为元组"""
+    if not isinstance(values, Mapping):
+        values = {}
+    kwargs = {}
+    for name in cls.__slots__:
+        if name in values:
+            value = values[name]
+        elif name in defaults:
+            value = defaults[name]
+        else:
+            continue
+        kwargs[name] = tuple(value) if isinstance(value, list) else value
+    return cls(**kwargs)
+
+
+def _build_bindings(values: Any) -> Tuple[BindingSettings, ...]:
+    """编译 bindings 列表，未命名的绑定依次以网卡名、源地址或序号命名"""
+    if not isinstance(values, (list, tuple)):
+        return ()
+    bindings = []
+    for index, item in enumerate(values):
+        binding = _build_section(BindingSettings, {}, item)
+        if not binding.name:
+            binding = binding.replace(name=binding.interface or binding.source_ip or f"binding{index + 1}")
+        bindings.append(binding)
+    return tuple(bindings)
+
+
+class ConfigSnapshot(Settings):
+    """编译后的完整配置"""
+    
+    __slots__ = (
+        'network', 'portal', 'credentials', 'scheduler', 'fleet', 'logging', 'hot_reload', 'security',
+        'history', 'session', 'bindings', 'value_errors', 'errors'
+    )
+    DEFAULTS = {'bindings': (), 'value_errors': (), 'errors': ()}
+    network: NetworkSettings
+    portal: PortalSettings
+    credentials: CredentialSettings
+    scheduler: SchedulerSettings
+    fleet: FleetSettings
+    logging: LoggingSettings
+    hot_reload: HotReloadSettings
+    security: SecuritySettings
+    history: HistorySettings
+    session: SessionSettings
+    # 多链路绑定，为空时只登录默认路由所在的链路
+    bindings: Tuple[BindingSettings, ...]
+    # 配置项取值错误（重新加载时据此拒绝新配置）
+    value_errors: Tuple[str, ...]
+    # 取值错误加上缺少的必需项，validate_config() 直接返回
+    errors: Tuple[str, ...]
+    
+    SECTIONS = {
+        'network': NetworkSettings,
+        'portal': PortalSettings,
+        'credentials': CredentialSettings,
+        'scheduler': SchedulerSettings,
+        'fleet': FleetSettings,
+        'logging': LoggingSettings,
+        'hot_reload': HotReloadSettings,
+        'security': SecuritySettings,
+        'history': HistorySettings,
+        'session': SessionSettings
+    }
+    
+    @classmethod
+    def compile(cls, config: Mapping[str, Any], defaults: Mapping[str, Any],
+                environ: Optional[Mapping[str, str]] = None) -> 'ConfigSnapshot':
+        """
+        编译合并后的配置
+        
+        Args:
+            config: 已与默认配置合并的配置
+            defaults: 默认配置，补齐缺失或类型错误的部分
+            environ: 环境变量，默认使用 os.environ
+        """
+        environ = os.environ if environ is None else environ
+        sections = {
+            name: _build_section(section_cls, defaults.get(name, {}), config.get(name))
+            for name, section_cls in cls.SECTIONS.items()
+        }
+        
+        # 环境变量优先于配置文件中的凭据
+        credentials = sections['credentials']
+        sections['credentials'] = CredentialSettings(encrypted=bool(credentials.encrypted), **{
+            name: environ.get(var) or getattr(credentials, name)
+            for name, var in CREDENTIAL_ENV_VARS.items()
+        })
+        
+        scheduler = sections['scheduler']
+        if scheduler.min_interval is None:
+            scheduler = scheduler.replace(min_interval=min(15, scheduler.check_interval))
+        if scheduler.max_interval is None:
+            scheduler = scheduler.replace(max_interval=scheduler.check_interval)
+        sections['scheduler'] = scheduler
+        
+        bindings = _build_bindings(config.get('bindings'))
+        value_errors = tuple(_value_errors(sections, bindings))
+        errors = tuple(_required_errors(sections, bindings)) + value_errors
+        return cls(bindings=bindings, value_errors=value_errors, errors=errors, **sections)
+
+
+def _required_errors(sections: Mapping[str, Any], bindings: Tuple[BindingSettings, ...] = ()) -> List[str]:
+    """缺少的必需配置项（配置了多链路绑定时按每个绑定检查）"""
+    errors = []
+    network, credentials = sections['network'], sections['credentials']
+    if not bindings:
+        if not network.login_url and not network.auto_discover:
+            errors.append("缺少必需的配置项: network.login_url（或启用 network.auto_discover）")
+        if not credentials.username:
+            errors.append("缺少必需的配置项: credentials.username")
+        if not credentials.password:
+            errors.append("缺少必需的配置项: credentials.password")
+        return errors
+
+    for binding in bindings:
+        if not binding.login_url and not network.login_url and not network.auto_discover:
+            errors.append(f"缺少必需的配置项: bindings[{binding.name}].login_url（或启用 network.auto_discover）")
+        if binding.username and not binding.password:
+            errors.append(f"缺少必需的配置项: bindings[{binding.name}].password")
+    if any(not binding.username for binding in bindings):
+        if not credentials.username:
+            errors.append("缺少必需的配置项: credentials.username（有绑定未单独配置账号）")
+        if not credentials.password:
+            errors.append("缺少必需的配置项: credentials.password（有绑定未单独配置账号）")
+    return errors
+
+
+def _probe_target_errors(network: NetworkSettings) -> List[str]:
+    """network.probe_urls 中无效或预期不可能满足的目标"""
+    errors = []
+    for target in network.probe_urls:
+        if isinstance(target, str):
+            target = {'url': target}
+        elif not isinstance(target, Mapping):
+            errors.append(f"network.probe_urls 的每一项必须是URL字符串或目标对象: {target!r}")
+            continue
+        url = target.get('url') or ''
+        probe_type = target.get('type') or network.probe_type
+        if probe_type not in ('get', 'stream', 'head', 'generate_204'):
+            errors.append(f"network.probe_urls 中 {url} 的 type 必须是 get/stream/head/generate_204 之一")
+        elif not url and probe_type != 'generate_204':
+            errors.append("network.probe_urls 中的目标缺少 url")
+        elif probe_type in ('get', 'stream') and not target.get('keywords') and 'baidu.com' not in url:
+            # 默认关键字取自百度首页，其他网站的页面不可能匹配
+            errors.append(f"network.probe_urls 中的 {url} 需要指定该页面的 keywords，或改用 head/generate_204 探测")
+    return errors
+
+
+def _value_errors(sections: Mapping[str, Any], bindings: Tuple[BindingSettings, ...] = ()) -> List[str]:
+    """取值无效的配置项"""
+    errors = []
+    names = [binding.name for binding in bindings]
+    for binding in bindings:
+        if not binding.interface and not binding.source_ip:
+            errors.append(f"bindings[{binding.name}] 必须配置 interface 或 source_ip")
+    for name in sorted({name for name in names if names.count(name) > 1}):
+        errors.append(f"bindings 中的名称重复: {name}")
+    network, scheduler, logging_settings = sections['network'], sections['scheduler'], sections['logging']
+    try:
+        if network.timeout <= 0:
+            errors.append("network.timeout 必须大于0")
+        if network.probe_type not in ('get', 'stream', 'head', 'generate_204'):
+            errors.append("network.probe_type 必须是 get/stream/head/generate_204 之一")
+        if network.hedge_delay < 0:
+            errors.append("network.hedge_delay 不能小于0")
+        errors.extend(_probe_target_errors(network))
+        if network.dns_ttl < 0 or network.dns_timeout <= 0:
+            errors.append("network.dns_ttl 不能小于0，network.dns_timeout 必须大于0")
+        for value in network.dns_hijack_networks:
+            try:
+                ipaddress.ip_network(value, strict=False)
+            except ValueError:
+                errors.append(f"network.dns_hijack_networks 中的网段无效: {value}")
+        if scheduler.min_interval <= 0 or scheduler.max_interval < scheduler.min_interval:
+            errors.append("scheduler.min_interval 必须大于0且不大于 scheduler.max_interval")
+        if network.retry_attempts < 0:
+            errors.append("network.retry_attempts 不能小于0")
+        if logging_settings.format not in ('text', 'json'):
+            errors.append("logging.format 必须是 text/json 之一")
+        session = sections['session']
+        if not 0 < session.quantile < 1:
+            errors.append("session.quantile 必须在0和1之间")
+        if session.lead < 0:
+            errors.append("session.lead 不能小于0")
+    except TypeError as e:
+        errors.append(f"配置项类型错误: {e}")
+    return errors
@@ -0,0 +1,155 @@
+"""
+配置文件监视
+Linux上通过inotify（ctypes调用libc）监视配置文件所在目录，文件被写入或原子替换后立即重新加载；
+不支持inotify时按修改时间定期检查
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from typing import Any, Optional
+
+
+class ConfigWatcher:
+    """配置文件变化监视器，变化后调用 ConfigManager.reload()"""
+    
+    # inotify 事件掩码（linux/inotify.h）
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+    
+    EVENT_HEADER = struct.Struct('iIII')
+    
+    def __init__(self, config_manager: Any, poll_interval: float = 2.0,
+                 debounce: float = 0.2, use_inotify: bool = True):
+        """
+        初始化监视器
+        
+        Args:
+            config_manager: ConfigManager实例
+            poll_interval: 不支持inotify时检查修改时间的间隔（秒），inotify模式下兜底检查至少间隔30秒
+            debounce: 收到变化后等待编辑器写完的时间（秒）
+            use_inotify: 是否尝试使用inotify
+        """
+        self.config_manager = config_manager
+        self.poll_interval = max(0.1, poll_interval)
+        self.debounce = debounce
+        self.logger = logging.getLogger(__name__)
+        self._inotify_fd: Optional[int] = None
+        self._wake_r, self._wake_w = os.pipe() if sys.platform != 'win32' else (None, None)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        
+        if use_inotify and sys.platform.startswith('linux'):
+            try:
+                self._inotify_fd = self._open_inotify()
+            except OSError as e:
+                self.logger.warning(f"无法使用inotify监视配置文件，改为定期检查修改时间: {e}")
+    
+    @property
+    def mode(self) -> str:
+        """当前监视方式：inotify 或 mtime"""
+        return 'inotify' if self._inotify_fd is not None else 'mtime'
+    
+    def _open_inotify(self) -> int:
+        """创建inotify实例并监视配置文件所在目录（编辑器与原子写入都会替换文件本身）"""
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        
+        directory = os.path.dirname(os.path.abspath(self.config_manager.config_file))
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE_SELF | self.IN_MOVE_SELF
+        if libc.inotify_add_watch(fd, directory.encode(), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(fd)
+            raise OSError(errno, os.strerror(errno))
+        return fd
+    
+    def _config_changed(self) -> bool:
+        """读取已到达的inotify事件，判断是否涉及配置文件"""
+        name = os.path.basename(self.config_manager.config_file).encode()
+        changed = False
+        while True:
+            try:
+                data = os.read(self._inotify_fd, 65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            offset = 0
+            while offset + self.EVENT_HEADER.size <= len(data):
+                _, mask, _, length = self.EVENT_HEADER.unpack_from(data, offset)
+                offset += self.EVENT_HEADER.size
+                event_name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if event_name == name or mask & (self.IN_DELETE_SELF | self.IN_MOVE_SELF):
+                    changed = True
+        return changed
+    
+    def _run(self) -> None:
+        watched = [fd for fd in (self._inotify_fd, self._wake_r) if fd is not None]
+        # inotify模式下定期检查只作为兜底
+        timeout = self.poll_interval if self._inotify_fd is None else max(self.poll_interval, 30.0)
+        while self._running:
+            if watched:
+                readable, _, _ = select.select(watched, [], [], timeout)
+            else:
+                time.sleep(self.poll_interval)
+                readable = []
+            
+            if not self._running:
+                break
+            if self._wake_r in readable:
+                os.read(self._wake_r, 1024)
+                continue
+            
+            if self._inotify_fd in readable:
+                if not self._config_changed():
+                    continue
+                # 等待编辑器完成写入后再读取
+                select.select([self._wake_r] if self._wake_r is not None else [], [], [], self.debounce)
+                self._config_changed()
+            
+            # 超时后同样比较文件签名（mtime模式，或兜底inotify丢失的事件），未变化时不会读取文件
+            try:
+                self.config_manager.reload()
+            except Exception as e:
+                self.logger.error(f"重新加载配置失败: {e}", exc_info=True)
+    
+    def start(self) -> 'ConfigWatcher':
+        """在后台线程中开始监视"""
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run, name='henu-config-watcher', daemon=True)
+            self._thread.start()
+            self.logger.info(f"已开始监视配置文件（{self.mode}）: {self.config_manager.config_file}")
+        return self
+    
+    def stop(self) -> None:
+        """停止监视并释放文件描述符"""
+        self._running = False
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'\0')
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        for fd in (self._inotify_fd, self._wake_r, self._wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._inotify_fd = self._wake_r = self._wake_w = None
@@ -5,37 +5,92 @@
 
 import os
 import base64
+import hashlib
+import importlib.util
 import logging
-from pathlib import Path
-from typing import Dict, Optional
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
-try:
-    from cryptography.fernet import Fernet
-    from cryptography.hazmat.primitives import hashes
-    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2
-    CRYPTO_AVAILABLE = True
-except ImportError:
-    CRYPTO_AVAILABLE = False
+# cryptography 导入较慢，这里只检查是否安装，第一次加解密时才导入
+CRYPTO_AVAILABLE = importlib.util.find_spec('cryptography') is not None
 
 
-class CredentialManager:
-    """凭证加密管理器"""
+class CredentialVault:
+    """
+    凭证保险库
     
-    def __init__(self, key_file: str = ".keyfile"):
+    密钥来自密钥文件，或由口令经PBKDF2派生（密钥文件中只保存盐值与迭代次数）；
+    密钥在进程内只加载或派生一次。密文直接保存Fernet令牌（本身已是URL安全的Base64），
+    同时兼容旧版再套一层Base64的格式。解密结果在有效期内缓存，每次登录不必重新解密
+    """
+    
+    # Fernet令牌以版本字节0x80开头，Base64编码后固定为该前缀
+    TOKEN_PREFIX = 'gAAAAA'
+    # 旧版格式：对令牌再做一次Base64编码
+    LEGACY_PREFIX = base64.b64encode(TOKEN_PREFIX.encode()).decode()
+    
+    KDF_SCHEME = 'pbkdf2-sha256'
+    KDF_ITERATIONS = 480000
+    PASSPHRASE_ENV = 'HENU_VAULT_PASSPHRASE'
+    
+    # 少于该数量的批量操作直接在当前线程执行
+    BATCH_THRESHOLD = 8
+    
+    # 进程内共享的密钥缓存：密钥文件 (路径, inode, 修改时间) 或 (口令摘要, 盐值, 迭代次数) -> Fernet密钥
+    _key_cache: Dict[Tuple[Any, ...], bytes] = {}
+    _key_cache_lock = threading.Lock()
+    
+    def __init__(self, key_file: str = ".keyfile", passphrase: Optional[str] = None,
+                 cache_ttl: float = 300.0, cache_size: int = 1024, max_workers: int = 4,
+                 kdf_iterations: int = KDF_ITERATIONS):
         """
-        初始化凭证管理器
+        初始化凭证保险库
         
         Args:
-            key_file: 密钥文件路径
+            key_file: 密钥文件路径（使用口令时保存盐值）
+            passphrase: 派生密钥的口令，为None时读取环境变量 HENU_VAULT_PASSPHRASE，仍为空则使用随机密钥
+            cache_ttl: 解密结果缓存时间（秒），0表示不缓存
+            cache_size: 最多缓存的解密结果数量
+            max_workers: 批量加解密的工作线程数
+            kdf_iterations: 新建口令密钥时的PBKDF2迭代次数
         """
         self.logger = logging.getLogger(__name__)
         self.key_file = key_file
-        self.cipher = None
+        self.passphrase = passphrase if passphrase is not None else os.environ.get(self.PASSPHRASE_ENV) or None
+        self.cache_ttl = cache_ttl
+        self.cache_size = max(1, cache_size)
+        self.max_workers = max(1, max_workers)
+        self.kdf_iterations = kdf_iterations
+        self._cipher = None
+        self._cipher_failed = False
+        self._cipher_lock = threading.Lock()
+        self._cache: 'OrderedDict[str, Tuple[float, str]]' = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
         
         if not CRYPTO_AVAILABLE:
             self.logger.warning("cryptography库未安装，凭证加密功能不可用")
-        else:
-            self._initialize_cipher()
+    
+    @classmethod
+    def from_config(cls, security_config: Mapping[str, Any]) -> 'CredentialVault':
+        """根据配置中的 security 部分创建保险库"""
+        return cls(
+            key_file=security_config.get('encryption_key_file', '.keyfile'),
+            cache_ttl=security_config.get('credential_cache_ttl', 300),
+            kdf_iterations=security_config.get('kdf_iterations', cls.KDF_ITERATIONS)
+        )
+    
+    @property
+    def cipher(self) -> Any:
+        """Fernet加密器，第一次加解密时才加载密钥（密钥文件此时才会创建），失败后不再重试"""
+        if self._cipher is None and CRYPTO_AVAILABLE and not self._cipher_failed:
+            with self._cipher_lock:
+                if self._cipher is None and not self._cipher_failed:
+                    self._initialize_cipher()
+        return self._cipher
     
     def _initialize_cipher(self) -> None:
         """初始化加密器"""
@@ -43,23 +98,71 @@ class CredentialManager:
             return
         
         try:
+            from cryptography.fernet import Fernet
             key = self._load_or_create_key()
-            self.cipher = Fernet(key)
+            self._cipher = Fernet(key)
             self.logger.debug("加密器初始化成功")
         except Exception as e:
+            self._cipher_failed = True
             self.logger.error(f"初始化加密器失败: {e}", exc_info=True)
     
     def _load_or_create_key(self) -> bytes:
-        """加载或创建加密密钥"""
-        if os.path.exists(self.key_file):
+        """加载或创建加密密钥（同一进程内只读取或派生一次）"""
+        if not os.path.exists(self.key_file):
+            if self.passphrase:
+                salt = os.urandom(16)
+                header = f"{self.KDF_SCHEME}${self.kdf_iterations}${base64.urlsafe_b64encode(salt).decode()}"
+                self._save_key(header.encode())
+                self.logger.info(f"生成新的口令盐值并保存到: {self.key_file}")
+            else:
+                from cryptography.fernet import Fernet
+                self._save_key(Fernet.generate_key())
+                self.logger.info(f"生成新密钥并保存到: {self.key_file}")
+        
+        stat = os.stat(self.key_file)
+        file_id = (os.path.abspath(self.key_file), stat.st_ino, stat.st_mtime_ns)
+        with self._key_cache_lock:
+            content = self._key_cache.get(file_id)
+        if content is None:
             with open(self.key_file, 'rb') as f:
-                key = f.read()
+                content = f.read().strip()
             self.logger.debug(f"从文件加载密钥: {self.key_file}")
-        else:
-            key = Fernet.generate_key()
-            self._save_key(key)
-            self.logger.info(f"生成新密钥并保存到: {self.key_file}")
+            with self._key_cache_lock:
+                self._key_cache[file_id] = content
+        
+        if not content.startswith(self.KDF_SCHEME.encode() + b'$'):
+            if self.passphrase:
+                self.logger.warning(f"密钥文件 {self.key_file} 保存的是随机密钥，已忽略口令")
+            return content
+        
+        if not self.passphrase:
+            raise ValueError(f"密钥文件 {self.key_file} 需要口令，请设置环境变量 {self.PASSPHRASE_ENV}")
+        _, iterations, salt = content.decode().split('$')
+        return self.derive_key(self.passphrase, base64.urlsafe_b64decode(salt), int(iterations))
+    
+    @classmethod
+    def derive_key(cls, passphrase: str, salt: bytes, iterations: int = KDF_ITERATIONS) -> bytes:
+        """
+        由口令派生Fernet密钥，结果缓存在进程内（派生本身刻意耗时）
+        
+        Args:
+            passphrase: 口令
+            salt: 盐值
+            iterations: PBKDF2迭代次数
+        """
+        cache_key = (hashlib.sha256(passphrase.encode()).digest(), salt, iterations)
+        with cls._key_cache_lock:
+            key = cls._key_cache.get(cache_key)
+        if key is not None:
+            return key
         
+        from cryptography.hazmat.primitives import hashes
+        from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+        
+        kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+        key = base64.urlsafe_b64encode(kdf.derive(passphrase.encode()))
+        with cls._key_cache_lock:
+            cls._key_cache[cache_key] = key
         return key
     
     def _save_key(self, key: bytes) -> None:
@@ -78,6 +181,11 @@ class CredentialManager:
         except:
             pass
     
+    @classmethod
+    def looks_encrypted(cls, value: str) -> bool:
+        """是否为本模块生成的密文（新旧格式）"""
+        return isinstance(value, str) and value.startswith((cls.TOKEN_PREFIX, cls.LEGACY_PREFIX))
+    
     def encrypt(self, plaintext: str) -> Optional[str]:
         """
         加密字符串
@@ -86,25 +194,24 @@ class CredentialManager:
             plaintext: 明文
             
         Returns:
-            加密后的Base64编码字符串，失败返回None
+            Fernet令牌（URL安全的Base64字符串），失败返回None
         """
         if not CRYPTO_AVAILABLE or not self.cipher:
             self.logger.warning("加密功能不可用")
             return None
         
         try:
-            encrypted = self.cipher.encrypt(plaintext.encode())
-            return base64.b64encode(encrypted).decode()
+            return self.cipher.encrypt(plaintext.encode()).decode()
         except Exception as e:
             self.logger.error(f"加密失败: {e}", exc_info=True)
             return None
     
     def decrypt(self, ciphertext: str) -> Optional[str]:
         """
-        解密字符串
+        解密字符串，有效期内直接返回缓存的结果
         
         Args:
-            ciphertext: Base64编码的密文
+            ciphertext: Fernet令牌，或旧版再套一层Base64的令牌
             
         Returns:
             解密后的明文，失败返回None
@@ -113,13 +220,86 @@ class CredentialManager:
             self.logger.warning("解密功能不可用")
             return None
         
+        cached = self._cache_get(ciphertext)
+        if cached is not None:
+            return cached
+        
+        from cryptography.fernet import InvalidToken
+        
         try:
-            encrypted = base64.b64decode(ciphertext.encode())
-            decrypted = self.cipher.decrypt(encrypted)
-            return decrypted.decode()
+            token = ciphertext.encode()
+            if not ciphertext.startswith(self.TOKEN_PREFIX):
+                token = base64.b64decode(token)
+            plaintext = self.cipher.decrypt(token).decode()
+        except InvalidToken:
+            self.logger.error("解密失败: 密文无效或密钥不匹配")
+            return None
         except Exception as e:
             self.logger.error(f"解密失败: {e}", exc_info=True)
             return None
+        
+        self._cache_put(ciphertext, plaintext)
+        return plaintext
+    
+    def _cache_get(self, ciphertext: str) -> Optional[str]:
+        if self.cache_ttl <= 0:
+            return None
+        with self._cache_lock:
+            entry = self._cache.get(ciphertext)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._cache[ciphertext]
+                return None
+            self._cache.move_to_end(ciphertext)
+            return entry[1]
+    
+    def _cache_put(self, ciphertext: str, plaintext: str) -> None:
+        if self.cache_ttl <= 0:
+            return
+        with self._cache_lock:
+            self._cache[ciphertext] = (time.monotonic() + self.cache_ttl, plaintext)
+            self._cache.move_to_end(ciphertext)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+    
+    def clear_cache(self) -> None:
+        """清空解密结果缓存（例如密钥或口令变化后）"""
+        with self._cache_lock:
+            self._cache.clear()
+    
+    def _map(self, func: Any, values: Iterable[str]) -> List[Optional[str]]:
+        """批量执行，数量较多时分发到工作线程"""
+        values = list(values)
+        if len(values) < self.BATCH_THRESHOLD or self.max_workers == 1:
+            return [func(value) for value in values]
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='henu-vault')
+        return list(self._executor.map(func, values))
+    
+    def encrypt_many(self, plaintexts: Iterable[str]) -> List[Optional[str]]:
+        """
+        批量加密
+        
+        Returns:
+            与输入顺序一致的密文列表，失败的项为None
+        """
+        return self._map(self.encrypt, plaintexts)
+    
+    def decrypt_many(self, ciphertexts: Iterable[str]) -> List[Optional[str]]:
+        """
+        批量解密（已缓存的项不再解密）
+        
+        Returns:
+            与输入顺序一致的明文列表，失败的项为None
+        """
+        return self._map(self.decrypt, ciphertexts)
+    
+    def close(self) -> None:
+        """关闭工作线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
     
     def encrypt_credentials(self, username: str, password: str, operator: str = "local") -> Dict[str, str]:
         """
@@ -133,16 +313,17 @@ class CredentialManager:
         Returns:
             包含加密后凭证的字典
         """
+        encrypted_username, encrypted_password = self.encrypt_many([username, password])
         return {
-            'username': self.encrypt(username) or username,
-            'password': self.encrypt(password) or password,
+            'username': encrypted_username or username,
+            'password': encrypted_password or password,
             'operator': operator,
             'encrypted': CRYPTO_AVAILABLE and self.cipher is not None
         }
     
-    def decrypt_credentials(self, encrypted_creds: Dict[str, str]) -> Dict[str, str]:
+    def decrypt_credentials(self, encrypted_creds: Mapping[str, Any]) -> Dict[str, str]:
         """
-        解密凭证
+        解密凭证（只解密看起来是密文的字段，环境变量提供的明文原样保留）
         
         Args:
             encrypted_creds: 包含加密凭证的字典
@@ -150,21 +331,72 @@ class CredentialManager:
         Returns:
             包含明文凭证的字典
         """
+        username = encrypted_creds.get('username', '')
+        password = encrypted_creds.get('password', '')
+        operator = encrypted_creds.get('operator', 'local')
         if not encrypted_creds.get('encrypted', False):
             # 凭证未加密，直接返回
-            return {
-                'username': encrypted_creds.get('username', ''),
-                'password': encrypted_creds.get('password', ''),
-                'operator': encrypted_creds.get('operator', 'local')
-            }
+            return {'username': username, 'password': password, 'operator': operator}
         
         return {
-            'username': self.decrypt(encrypted_creds.get('username', '')) or '',
-            'password': self.decrypt(encrypted_creds.get('password', '')) or '',
-            'operator': encrypted_creds.get('operator', 'local')
+            'username': (self.decrypt(username) or '') if self.looks_encrypted(username) else username,
+            'password': (self.decrypt(password) or '') if self.looks_encrypted(password) else password,
+            'operator': operator
         }
+        
+    def encrypt_batch_credentials(self, accounts: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量加密多个账号的用户名和密码，所有字段一次性分发到工作线程
+        
+        Args:
+            accounts: 包含 username/password 的字典序列（如批量登录的账号绑定），其他字段原样保留
+        """
+        accounts = list(accounts)
+        values = [account.get(key, '') for account in accounts for key in ('username', 'password')]
+        encrypted = iter(self.encrypt_many(values))
+        available = CRYPTO_AVAILABLE and self.cipher is not None
+        
+        results = []
+        for account in accounts:
+            result = dict(account)
+            for key in ('username', 'password'):
+                result[key] = next(encrypted) or account.get(key, '')
+            result['encrypted'] = available
+            results.append(result)
+        return results
+    
+    def decrypt_batch_credentials(self, accounts: Iterable[Mapping[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        批量解密多个账号的用户名和密码，相同的密文只解密一次
+        
+        Args:
+            accounts: 账号字典序列，encrypted 为真的账号中看起来是密文的字段会被解密，其他字段原样保留
+        """
+        accounts = list(accounts)
+        pending = list({
+            account.get(key, ''): None
+            for account in accounts if account.get('encrypted', False)
+            for key in ('username', 'password')
+            if self.looks_encrypted(account.get(key, ''))
+        })
+        plaintexts = dict(zip(pending, self.decrypt_many(pending)))
+        
+        results = []
+        for account in accounts:
+            result = {key: value for key, value in account.items() if key != 'encrypted'}
+            if account.get('encrypted', False):
+                for key in ('username', 'password'):
+                    value = account.get(key, '')
+                    if value in plaintexts:
+                        result[key] = plaintexts[value] or ''
+            results.append(result)
+        return results
     
     @staticmethod
     def is_available() -> bool:
         """检查加密功能是否可用"""
         return CRYPTO_AVAILABLE
+
+
+# 兼容旧名称
+CredentialManager = CredentialVault
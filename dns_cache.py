@@ -0,0 +1,210 @@
+"""
+DNS缓存
+登录前校园网的DNS常被劫持或响应缓慢，每次探测都解析 www.baidu.com 会让检查多等几秒。
+这里缓存最近一次正常的解析结果（A/AAAA），接近过期时先继续使用旧结果并在后台重新解析，
+解析失败时一直沿用旧结果；解析到认证门户网段（默认172.29.0.0/16）的结果视为被劫持，不覆盖正常结果
+"""
+
+import ipaddress
+import logging
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+
+def is_ip_address(host: str) -> bool:
+    """是否为IP地址（无需解析）"""
+    try:
+        ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return True
+
+
+class DnsRecord:
+    """一个主机名最近一次正常的解析结果"""
+    
+    __slots__ = ('addresses', 'resolved_at')
+    
+    def __init__(self, addresses: Tuple[str, ...], resolved_at: float):
+        self.addresses = addresses
+        self.resolved_at = resolved_at
+
+
+class DnsCache:
+    """带TTL、后台刷新与劫持检测的解析缓存"""
+    
+    # 记录存在超过TTL的这一比例后，查询时在后台提前刷新
+    REFRESH_AHEAD = 0.8
+    
+    def __init__(self, ttl: float = 300, timeout: float = 2.0,
+                 hijack_networks: Iterable[str] = ('172.29.0.0/16',), negative_ttl: float = 10):
+        """
+        初始化DNS缓存
+        
+        Args:
+            ttl: 解析结果的有效期（秒）。getaddrinfo不返回记录的TTL，统一使用该值
+            timeout: 没有缓存时等待解析的最长时间（秒），超时后解析继续在后台进行
+            hijack_networks: 解析到这些网段的结果视为被认证门户劫持
+            negative_ttl: 没有缓存且解析失败（或被劫持）后，多少秒内不再等待解析
+        """
+        self.ttl = ttl
+        self.timeout = timeout
+        self.hijack_networks = tuple(ipaddress.ip_network(network, strict=False) for network in hijack_networks)
+        self.negative_ttl = negative_ttl
+        self.logger = logging.getLogger(__name__)
+        self._records: Dict[str, DnsRecord] = {}
+        # 主机名 -> 最近一次被劫持的解析结果
+        self._hijacked: Dict[str, Tuple[str, ...]] = {}
+        self._failed_at: Dict[str, float] = {}
+        self._pending: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    @classmethod
+    def from_config(cls, network_config: Mapping[str, Any]) -> 'DnsCache':
+        """根据配置文件的network部分创建缓存"""
+        return cls(
+            ttl=network_config.get('dns_ttl', 300),
+            timeout=network_config.get('dns_timeout', 2.0),
+            hijack_networks=network_config.get('dns_hijack_networks') or ('172.29.0.0/16',)
+        )
+    
+    def apply_config(self, other: 'DnsCache') -> None:
+        """热更新配置：沿用已缓存的记录，只替换参数"""
+        self.ttl = other.ttl
+        self.timeout = other.timeout
+        self.hijack_networks = other.hijack_networks
+    
+    def is_hijacked(self, address: str) -> bool:
+        """地址是否落在认证门户网段内"""
+        try:
+            ip = ipaddress.ip_address(address.split('%', 1)[0])
+        except ValueError:
+            return False
+        return any(ip in network for network in self.hijack_networks if ip.version == network.version)
+    
+    def lookup(self, host: str) -> Optional[str]:
+        """
+        查询主机的一个地址
+        
+        有缓存时立即返回（必要时在后台刷新）；没有缓存时最多等待timeout秒
+        
+        Returns:
+            IP地址，无法解析或只得到被劫持的结果时返回None
+        """
+        addresses = self.lookup_all(host)
+        return addresses[0] if addresses else None
+    
+    def lookup_all(self, host: str) -> Tuple[str, ...]:
+        """查询主机的所有正常地址（A与AAAA），规则同lookup()"""
+        if is_ip_address(host):
+            return (host,)
+        
+        now = time.monotonic()
+        record = self._records.get(host)
+        if record is not None:
+            if now - record.resolved_at >= self.ttl * self.REFRESH_AHEAD:
+                self._refresh(host)
+            return record.addresses
+        
+        failed_at = self._failed_at.get(host)
+        if failed_at is not None and now - failed_at < self.negative_ttl:
+            return ()
+        
+        try:
+            self._refresh(host).result(timeout=self.timeout)
+        except FutureTimeoutError:
+            self.logger.debug(f"解析 {host} 超过 {self.timeout} 秒，继续在后台解析")
+            self._failed_at[host] = now
+        record = self._records.get(host)
+        return record.addresses if record is not None else ()
+    
+    def hijacked(self, host: str) -> Optional[Tuple[str, ...]]:
+        """主机最近一次被劫持的解析结果，最近一次解析正常时返回None"""
+        return self._hijacked.get(host)
+    
+    def prefetch(self, hosts: Iterable[str]) -> None:
+        """在后台解析尚未缓存或即将过期的主机"""
+        now = time.monotonic()
+        for host in hosts:
+            record = self._records.get(host)
+            if not is_ip_address(host) and (record is None or now - record.resolved_at >= self.ttl * self.REFRESH_AHEAD):
+                self._refresh(host)
+    
+    def invalidate(self) -> None:
+        """
+        标记所有记录为过期（门户状态变化后）
+        
+        记录仍作为最近一次正常的结果使用，下一次查询时在后台重新解析
+        """
+        with self._lock:
+            for record in self._records.values():
+                record.resolved_at = float('-inf')
+            self._failed_at.clear()
+    
+    def _refresh(self, host: str) -> Future:
+        """在后台解析主机，同一主机同时只有一个解析"""
+        with self._lock:
+            future = self._pending.get(host)
+            if future is None:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='henu-dns')
+                future = self._executor.submit(self._resolve, host)
+                self._pending[host] = future
+        return future
+    
+    def _resolve(self, host: str) -> None:
+        """解析主机并更新缓存（在后台线程中执行）"""
+        try:
+            self._update(host)
+        finally:
+            with self._lock:
+                self._pending.pop(host, None)
+    
+    def _update(self, host: str) -> None:
+        """解析一次，只有包含门户网段以外的地址时才更新正常结果"""
+        try:
+            infos = socket.getaddrinfo(host, None, type=socket.SOCK_STREAM)
+        except OSError as e:
+            self.logger.debug(f"解析 {host} 失败: {e}")
+            self._failed_at[host] = time.monotonic()
+            return
+        
+        addresses = tuple(dict.fromkeys(info[4][0] for info in infos))
+        good = tuple(address for address in addresses if not self.is_hijacked(address))
+        if not good:
+            if host not in self._hijacked:
+                kept = '，沿用上次的正常结果' if host in self._records else ''
+                self.logger.info(f"{host} 的DNS解析被劫持到认证门户网段（{', '.join(addresses)}）{kept}")
+            self._hijacked[host] = addresses
+            self._failed_at[host] = time.monotonic()
+            return
+        
+        self._records[host] = DnsRecord(good, time.monotonic())
+        self._hijacked.pop(host, None)
+        self._failed_at.pop(host, None)
+    
+    def summary(self) -> Dict[str, Any]:
+        """状态展示用的缓存内容"""
+        now = time.monotonic()
+        return {
+            'records': {
+                host: {
+                    'addresses': list(record.addresses),
+                    'age': round(now - record.resolved_at, 1) if record.resolved_at != float('-inf') else None
+                }
+                for host, record in list(self._records.items())
+            },
+            'hijacked': {host: list(addresses) for host, addresses in list(self._hijacked.items())}
+        }
+    
+    def close(self) -> None:
+        """关闭后台解析线程池"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -0,0 +1,136 @@
+"""
+事件推送
+单一生产者发布日志、网络状态与登录事件，扇出到任意数量的订阅者，
+以Server-Sent Events格式推送给Web界面，取代各客户端的轮询
+"""
+
+import json
+import logging
+import queue
+import threading
+from typing import Any, Iterable, Optional, Set
+
+
+def format_sse(event: str, data: Any, event_id: Optional[int] = None) -> str:
+    """编码为一条SSE消息"""
+    payload = json.dumps(data, ensure_ascii=False, default=str)
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.extend(f"data: {line}" for line in payload.split('\n'))
+    return '\n'.join(lines) + '\n\n'
+
+
+class Subscription:
+    """单个订阅者的有界事件队列"""
+    
+    def __init__(self, topics: Optional[Set[str]] = None, max_queue: int = 256):
+        self.topics = topics
+        self.dropped = 0
+        self._queue: 'queue.Queue[str]' = queue.Queue(maxsize=max_queue)
+    
+    def wants(self, topic: str) -> bool:
+        return self.topics is None or topic in self.topics
+    
+    def put(self, frame: str) -> None:
+        """放入一条消息，队列已满时丢弃最旧的消息（慢客户端不影响生产者）"""
+        while True:
+            try:
+                self._queue.put_nowait(frame)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+    
+    def get(self, timeout: float) -> Optional[str]:
+        """取出下一条消息，超时返回None"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroadcaster:
+    """事件扇出器"""
+    
+    def __init__(self, max_queue: int = 256):
+        """
+        初始化扇出器
+        
+        Args:
+            max_queue: 每个订阅者最多缓存的消息数
+        """
+        self.max_queue = max_queue
+        self._subscribers: Set[Subscription] = set()
+        self._lock = threading.Lock()
+        self._next_id = 0
+    
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+    
+    def has_subscribers(self, topic: Optional[str] = None) -> bool:
+        """是否有订阅者（可指定主题），没有时生产者可以跳过序列化"""
+        subscribers = self._subscribers
+        if topic is None:
+            return bool(subscribers)
+        return any(sub.wants(topic) for sub in list(subscribers))
+    
+    def subscribe(self, topics: Optional[Iterable[str]] = None) -> Subscription:
+        """
+        新增订阅者
+        
+        Args:
+            topics: 关注的主题（log/status/login），为None时接收全部
+        """
+        subscription = Subscription(set(topics) if topics else None, self.max_queue)
+        with self._lock:
+            self._subscribers = self._subscribers | {subscription}
+        return subscription
+    
+    def unsubscribe(self, subscription: Subscription) -> None:
+        """移除订阅者"""
+        with self._lock:
+            self._subscribers = self._subscribers - {subscription}
+    
+    def publish(self, topic: str, data: Any) -> int:
+        """
+        发布事件，只序列化一次后分发给所有关注该主题的订阅者
+        
+        Returns:
+            收到事件的订阅者数量
+        """
+        # 订阅者集合整体替换，这里读取的是一致的快照
+        targets = [sub for sub in self._subscribers if sub.wants(topic)]
+        if not targets:
+            return 0
+        
+        with self._lock:
+            self._next_id += 1
+            event_id = self._next_id
+        frame = format_sse(topic, data, event_id)
+        for subscription in targets:
+            subscription.put(frame)
+        return len(targets)
+
+
+class BroadcastLogHandler(logging.Handler):
+    """把日志记录作为log事件发布，没有订阅者时不做格式化"""
+    
+    def __init__(self, broadcaster: EventBroadcaster, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.broadcaster = broadcaster
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        if not self.broadcaster.has_subscribers('log'):
+            return
+        try:
+            self.broadcaster.publish('log', {
+                'line': self.format(record),
+                'level': record.levelname,
+                'time': record.created
+            })
+        except Exception:
+            self.handleError(record)
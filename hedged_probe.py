@@ -0,0 +1,220 @@
+"""
+对冲探测
+配置了多个外网探测目标时，先探测历史上最快的目标，超过对冲延迟仍未得到明确结论才启动下一个，
+采用最先得到的明确结论（外网正常，或被门户劫持）。单个目标缓慢或故障时不再误判为离线、
+也不必等满超时；每个目标的延迟统计决定下一次的探测顺序
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from network_probe import BaseProbe, ProbeResult
+
+
+class TargetStats:
+    """单个探测目标的延迟统计"""
+    
+    __slots__ = ('url', 'latency', 'samples', 'failures', 'wins')
+    
+    # 延迟指数加权平均的平滑系数
+    ALPHA = 0.3
+    
+    def __init__(self, url: str):
+        self.url = url
+        self.latency: Optional[float] = None
+        self.samples = 0
+        # 连续异常（超时、无法连接）次数
+        self.failures = 0
+        # 结论被采用的次数
+        self.wins = 0
+    
+    def record(self, latency: float, answered: bool) -> None:
+        """记录一次探测，异常按超时时间计入延迟，使故障目标排到后面"""
+        self.latency = latency if self.latency is None else self.latency + self.ALPHA * (latency - self.latency)
+        self.samples += 1
+        self.failures = 0 if answered else self.failures + 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'url': self.url,
+            'latency': round(self.latency, 4) if self.latency is not None else None,
+            'samples': self.samples,
+            'failures': self.failures,
+            'wins': self.wins
+        }
+
+
+class HedgedProber:
+    """按延迟排序、逐个加开的多目标HTTP探测"""
+    
+    def __init__(self, probes: Sequence[BaseProbe], hedge_delay: float = 0.3):
+        """
+        初始化对冲探测
+        
+        Args:
+            probes: 探测方式相同、目标不同的探测列表，顺序即没有统计数据时的优先级
+            hedge_delay: 当前目标超过多少秒仍无明确结论时启动下一个目标
+        """
+        self.probes = list(probes)
+        self.hedge_delay = max(0.0, float(hedge_delay))
+        self.stats = {probe.url: TargetStats(probe.url) for probe in self.probes}
+        # 加开过备用目标的探测次数
+        self.hedged = 0
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers = 0
+        # 目标URL -> 进行中的探测。被放弃的慢目标可能仍在等待响应，每个目标同时只有一个请求
+        self._inflight: Dict[str, Future] = {}
+    
+    def update(self, probes: Sequence[BaseProbe], hedge_delay: float) -> None:
+        """
+        热更新探测目标：沿用相同目标的统计，线程池保留到检查器关闭
+        
+        进行中的探测按旧目标列表完成，下一次探测使用新目标
+        """
+        probes = list(probes)
+        with self._lock:
+            self.stats = {probe.url: self.stats.get(probe.url) or TargetStats(probe.url) for probe in probes}
+            self.probes = probes
+            self.hedge_delay = max(0.0, float(hedge_delay))
+    
+    @staticmethod
+    def is_definite(result: ProbeResult) -> bool:
+        """
+        结论是否明确：外网正常，或响应中能找到门户登录URL（Location或登录页中带wlanuserip的地址）
+        
+        目标本身的故障（错误状态码、内容不符但看不出门户）不明确，继续等待其他目标；
+        普通的重定向（如跳转到HTTPS）同样不明确
+        """
+        return result.ok or result.portal_url is not None
+    
+    def ordered(self) -> List[BaseProbe]:
+        """按平均延迟排序的探测列表，没有统计数据的目标优先（以便获得样本）"""
+        stats = self.stats
+        
+        def key(probe: BaseProbe) -> float:
+            latency = stats[probe.url].latency if probe.url in stats else None
+            return -1.0 if latency is None else latency
+        return sorted(self.probes, key=key)
+    
+    def _run_one(self, run: Callable[[BaseProbe], ProbeResult], probe: BaseProbe, timeout: float) -> ProbeResult:
+        """执行单个目标的探测并更新统计（被放弃的目标完成后同样计入）"""
+        start = time.perf_counter()
+        try:
+            result = run(probe)
+        except Exception:
+            self._record(probe, max(timeout, time.perf_counter() - start), answered=False)
+            raise
+        self._record(probe, time.perf_counter() - start, answered=True)
+        return result
+    
+    def _record(self, probe: BaseProbe, latency: float, answered: bool) -> None:
+        """计入目标的一次探测（热更新中被移除的目标不再统计）"""
+        with self._lock:
+            stats = self.stats.get(probe.url)
+            if stats is not None:
+                stats.record(latency, answered)
+    
+    def run(self, run: Callable[[BaseProbe], ProbeResult], timeout: float) -> Tuple[BaseProbe, ProbeResult]:
+        """
+        执行一次探测
+        
+        Args:
+            run: 对单个目标执行探测的函数（requests会话或http.client直连）
+            timeout: 单个目标的超时时间（秒），用于计入异常目标的延迟
+        
+        Returns:
+            (采用其结论的探测, 探测结果)；所有目标都没有明确结论时返回最先完成的一个
+        
+        Raises:
+            所有目标都发生异常时抛出最先发生的异常
+        """
+        queue = self.ordered()
+        if len(queue) == 1:
+            probe = queue[0]
+            result = self._run_one(run, probe, timeout)
+            self._win(probe)
+            return probe, result
+        
+        with self._lock:
+            # 上一次探测被放弃、仍未返回的目标不再加入；所有目标都在进行中时等待它们的结果
+            idle = [probe for probe in queue if self._inflight.get(probe.url) is None
+                    or self._inflight[probe.url].done()]
+            queue = idle or queue
+        
+        pending: Dict[Future, BaseProbe] = {}
+        fallback: Optional[Tuple[BaseProbe, ProbeResult]] = None
+        first_error: Optional[BaseException] = None
+        while True:
+            # 启动下一个目标：首次进入、超过对冲延迟，或已完成的目标没有明确结论
+            if queue:
+                probe = queue.pop(0)
+                if pending:
+                    self.hedged += 1
+                    self.logger.debug(f"探测尚无明确结论，加开备用目标 {probe.url}")
+                pending[self._submit(run, probe, timeout)] = probe
+            if not pending:
+                break
+            
+            done, _ = wait(pending, timeout=self.hedge_delay if queue else None, return_when=FIRST_COMPLETED)
+            for future in done:
+                probe = pending.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    self.logger.debug(f"探测目标 {probe.url} 异常: {e}")
+                    first_error = first_error or e
+                    continue
+                if self.is_definite(result):
+                    self._win(probe)
+                    return probe, result
+                fallback = fallback or (probe, result)
+        
+        if fallback is not None:
+            self._win(fallback[0])
+            return fallback
+        raise first_error  # type: ignore[misc]
+    
+    def _submit(self, run: Callable[[BaseProbe], ProbeResult], probe: BaseProbe, timeout: float) -> Future:
+        """启动目标的探测，该目标已有进行中的请求时复用它"""
+        with self._lock:
+            future = self._inflight.get(probe.url)
+            if future is None or future.done():
+                future = self._pool().submit(self._run_one, run, probe, timeout)
+                self._inflight[probe.url] = future
+        return future
+    
+    def _pool(self) -> ThreadPoolExecutor:
+        """
+        探测线程池（调用方持有锁），目标数量增加后换用更大的线程池
+        
+        所有提交都在锁内取当前线程池，换下的旧线程池不会再收到新的探测，已提交的探测在其中完成
+        """
+        if self._executor is None or self._workers < len(self.probes):
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self._workers = len(self.probes)
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='henu-probe')
+        return self._executor
+    
+    def _win(self, probe: BaseProbe) -> None:
+        with self._lock:
+            stats = self.stats.get(probe.url)
+            if stats is not None:
+                stats.wins += 1
+    
+    def summary(self) -> List[Dict[str, Any]]:
+        """各目标的统计，按下一次的探测顺序排列"""
+        stats = self.stats
+        return [stats[probe.url].to_dict() for probe in self.ordered() if probe.url in stats]
+    
+    def close(self) -> None:
+        """关闭线程池（检查器关闭时），进行中的探测在后台完成"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
@@ -3,15 +3,31 @@
 提供生产级别的网络认证功能，支持完整的错误处理、日志记录和安全特性
 """
 
-import socket
-import requests
+import threading
 import time
 import urllib.parse
 import json
 import logging
-from typing import Tuple, Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Tuple, Optional, Dict, Any, Callable, List, Iterator, Mapping, Sequence, Union
 from datetime import datetime
 
+from metrics import LAST_LOGIN_TIMESTAMP, NETWORK_CONNECTED, record_login, record_probe
+from dns_cache import DnsCache
+from hedged_probe import HedgedProber
+from network_probe import (BaseProbe, ProbeResult, create_probe, create_target_probe, parse_host_port,
+                           probe_error_kind, tcp_reachability)
+from portal_discovery import PortalDiscovery, parse_portal_url
+from response_classifier import QuickauthClassifier, QuickauthVerdict
+from source_binding import mount_source_adapter
+
+# requests 只在建立HTTP会话时导入，单次运行且网络正常时不必加载
+if TYPE_CHECKING:
+    import requests
+    
+    from history_store import HistoryStore
+
 
 class HENULoginError(Exception):
     """HENU登录相关的自定义异常"""
@@ -21,10 +37,217 @@ class HENULoginError(Exception):
 class NetworkChecker:
     """网络连接检查器"""
     
-    def __init__(self, test_url: str = "http://www.baidu.com", timeout: int = 5):
+    DEFAULT_PORTAL_HOSTS = ["172.29.35.27:8088", "172.29.35.36:6060"]
+    DEFAULT_EXTERNAL_HOSTS = ["www.baidu.com:80"]
+    
+    def __init__(self, test_url: str = "http://www.baidu.com", timeout: int = 5,
+                 pool_connections: int = 2, pool_maxsize: int = 4,
+                 max_retries: int = 1, keep_alive: bool = True,
+                 probe_type: str = 'stream', probe_url: Optional[str] = None,
+                 probe_max_bytes: int = 4096, socket_probe: bool = True,
+                 portal_hosts: Optional[List[str]] = None,
+                 external_hosts: Optional[List[str]] = None,
+                 socket_timeout: float = 0.5, http_probe_max_age: float = 60,
+                 direct_probe: bool = False, source_address: Optional[str] = None,
+                 probe_urls: Optional[Sequence[Union[str, Mapping[str, Any]]]] = None, hedge_delay: float = 0.3,
+                 dns_cache: Optional[DnsCache] = None):
+        """
+        初始化网络检查器
+        
+        Args:
+            test_url: 用于检测外网的URL
+            timeout: 检测超时时间（秒）
+            pool_connections: 连接池缓存的主机数量
+            pool_maxsize: 每个主机保持的最大连接数
+            max_retries: 连接失败时的重试次数
+            keep_alive: 是否复用TCP连接
+            probe_type: 探测方式（get/stream/head/generate_204）
+            probe_url: 探测目标URL，为空时关键字类探测使用test_url，generate_204使用其默认端点
+            probe_max_bytes: 流式探测最多读取的字节数
+            socket_probe: 是否先用TCP连接探测，结果不明确时才发起HTTP探测
+            portal_hosts: 认证门户的 "host:port" 列表
+            external_hosts: 外网主机的 "host:port" 列表
+            socket_timeout: TCP探测超时时间（秒）
+            http_probe_max_age: TCP探测结果未变化时，复用上次HTTP探测结论的最长时间（秒）
+            direct_probe: HTTP探测直接使用http.client而不建立requests会话（适合只探测一次的单次运行）
+            source_address: TCP与HTTP探测使用的本机源地址（多链路绑定），为None时由路由表决定
+            probe_urls: 多个HTTP探测目标（URL字符串，或单独指定type/keywords的目标对象），
+                非空时代替probe_url/test_url，按延迟排序对冲探测
+            hedge_delay: 对冲探测中当前目标超过多少秒无明确结论时加开下一个目标
+            dns_cache: TCP与HTTP探测共用的DNS缓存，为None时使用默认参数创建
+        """
         self.test_url = test_url
         self.timeout = timeout
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.keep_alive = keep_alive
         self.logger = logging.getLogger(__name__)
+        self._session_lock = threading.Lock()
+        self._session: Optional['requests.Session'] = None
+        self._last_state: Optional[bool] = None
+        targets = probe_urls or [probe_url or ('' if probe_type == 'generate_204' else test_url)]
+        # 同一URL只保留第一个目标（统计按URL记录）
+        probes: Dict[str, BaseProbe] = {}
+        for target in targets:
+            probe = create_target_probe(target, probe_type, probe_max_bytes)
+            probes.setdefault(probe.url, probe)
+        self.probes: List[BaseProbe] = list(probes.values())
+        # 第一个目标代表探测方式，用于日志与历史记录
+        self.probe = self.probes[0]
+        self.prober = HedgedProber(self.probes, hedge_delay)
+        self.last_probe_result: Optional[ProbeResult] = None
+        self.socket_probe = socket_probe
+        self.portal_hosts = [parse_host_port(t) for t in (portal_hosts or self.DEFAULT_PORTAL_HOSTS)]
+        self.external_hosts = [parse_host_port(t) for t in (external_hosts or self.DEFAULT_EXTERNAL_HOSTS)]
+        self.socket_timeout = socket_timeout
+        self.http_probe_max_age = http_probe_max_age
+        self.direct_probe = direct_probe
+        self.source_address = source_address
+        self.last_socket_result: Optional[Dict[str, Any]] = None
+        self.dns_cache = dns_cache or DnsCache()
+        self._http_verdict_fingerprint: Optional[Tuple[bool, bool]] = None
+        self._http_verdict_time = 0.0
+        self.discovery: Optional[PortalDiscovery] = None
+        # 每次检查的结果与各层耗时写入历史存储，label为多链路时的绑定名称
+        self.history: Optional['HistoryStore'] = None
+        self.label = ''
+        self._check_timings: Dict[str, float] = {}
+        self._check_detail = ''
+        # 热更新时记录的新配置，由执行检查的线程在下一次检查开始时应用
+        self._pending_config: Optional[Mapping[str, Any]] = None
+        self._config_lock = threading.Lock()
+    
+    @property
+    def last_check_timings(self) -> Dict[str, float]:
+        """上一次网络检查各层探测的耗时（秒），如 {'tcp': 0.001, 'http': 0.05}"""
+        return dict(self._check_timings)
+    
+    @classmethod
+    def from_config(cls, network_config: Mapping[str, Any], source_address: Optional[str] = None) -> 'NetworkChecker':
+        """根据配置文件的network部分创建检查器"""
+        return cls(
+            test_url=network_config.get('test_url', 'http://www.baidu.com'),
+            timeout=network_config.get('timeout', 5),
+            pool_connections=network_config.get('pool_connections', 2),
+            pool_maxsize=network_config.get('pool_maxsize', 4),
+            max_retries=network_config.get('probe_retries', 1),
+            keep_alive=network_config.get('keep_alive', True),
+            probe_type=network_config.get('probe_type', 'stream'),
+            probe_url=network_config.get('probe_url') or None,
+            probe_max_bytes=network_config.get('probe_max_bytes', 4096),
+            socket_probe=network_config.get('socket_probe', True),
+            portal_hosts=network_config.get('portal_hosts') or None,
+            external_hosts=network_config.get('external_hosts') or None,
+            socket_timeout=network_config.get('socket_timeout', 0.5),
+            http_probe_max_age=network_config.get('http_probe_max_age', 60),
+            source_address=source_address,
+            probe_urls=network_config.get('probe_urls') or None,
+            hedge_delay=network_config.get('hedge_delay', 0.3),
+            dns_cache=DnsCache.from_config(network_config)
+        )
+    
+    def apply_config(self, network_config: Mapping[str, Any]) -> None:
+        """
+        热更新配置：只记录新配置，下一次检查开始时由执行检查的线程应用
+        
+        配置监视线程或Web请求线程直接修改探测参数时，进行中的检查会读到一半旧、一半新的配置
+        
+        Args:
+            network_config: 新配置的network部分
+        """
+        with self._config_lock:
+            self._pending_config = network_config
+    
+    def _apply_pending_config(self) -> None:
+        """应用待生效的配置：超时、探测方式与目标主机随本次检查生效，连接池参数变化时重建连接池"""
+        with self._config_lock:
+            network_config, self._pending_config = self._pending_config, None
+        if network_config is None:
+            return
+        
+        fresh = self.from_config(network_config)
+        pool_changed = ((fresh.pool_connections, fresh.pool_maxsize, fresh.max_retries, fresh.keep_alive)
+                        != (self.pool_connections, self.pool_maxsize, self.max_retries, self.keep_alive))
+        # 对冲探测器与其线程池保留到检查器关闭，只换入新的目标列表（进行中的探测可能仍在使用线程池）
+        self.prober.update(fresh.probes, fresh.prober.hedge_delay)
+        self.dns_cache.apply_config(fresh.dns_cache)
+        for attr in ('test_url', 'timeout', 'pool_connections', 'pool_maxsize', 'max_retries', 'keep_alive',
+                     'probes', 'probe', 'socket_probe', 'portal_hosts', 'external_hosts',
+                     'socket_timeout', 'http_probe_max_age'):
+            setattr(self, attr, getattr(fresh, attr))
+        
+        if pool_changed:
+            self.reset_session()
+        else:
+            # 探测方式或目标可能已变化，不再沿用旧的HTTP探测结论
+            self._http_verdict_fingerprint = None
+    
+    def _build_session(self) -> 'requests.Session':
+        """创建带连接池和重试策略的会话"""
+        import requests
+        from urllib3.util.retry import Retry
+        
+        session = requests.Session()
+        retry = Retry(
+            total=self.max_retries,
+            connect=self.max_retries,
+            read=0,
+            status=0,
+            backoff_factor=0.2,
+            allowed_methods=frozenset(['GET', 'HEAD'])
+        )
+        mount_source_adapter(
+            session, self.source_address,
+            # 每个探测目标至少保留一个主机的连接
+            pool_connections=max(self.pool_connections, len(self.probes)),
+            pool_maxsize=self.pool_maxsize,
+            max_retries=retry
+        )
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        return session
+    
+    @property
+    def session(self) -> 'requests.Session':
+        """长期复用的探测会话，首次使用时创建"""
+        session = self._session
+        if session is None:
+            with self._session_lock:
+                if self._session is None:
+                    self._session = self._build_session()
+                session = self._session
+        return session
+    
+    def reset_session(self) -> None:
+        """
+        丢弃当前连接池
+        
+        认证门户状态变化（登录成功、掉线）后，旧连接可能仍指向门户的劫持页面，
+        必须重建连接池。正在使用旧会话的请求不受影响，旧会话在替换后关闭。
+        """
+        with self._session_lock:
+            old_session, self._session = self._session, None
+        if old_session is not None:
+            old_session.close()
+            self.logger.debug("探测连接池已重置")
+    
+        # 门户状态变化后HTTP结论失效；DNS结果在后台重新解析，解析完成前沿用上次的正常结果
+        self.dns_cache.invalidate()
+        self._http_verdict_fingerprint = None
+    
+    def close(self) -> None:
+        """关闭连接池、对冲探测与后台解析线程池"""
+        self.reset_session()
+        self.prober.close()
+        self.dns_cache.close()
+    
+    def set_source_address(self, source_address: Optional[str]) -> None:
+        """更换探测使用的源地址（绑定网卡的地址变化时），旧连接池随之丢弃"""
+        if source_address != self.source_address:
+            self.source_address = source_address
+            self._last_state = None
+            self.reset_session()
     
     def check_internet_connection(self) -> bool:
         """
@@ -33,39 +256,169 @@ class NetworkChecker:
         Returns:
             bool: True表示网络正常，False表示需要登录
         """
-        try:
-            self.logger.info(f"正在检查网络连接，访问 {self.test_url} ...")
-            temp_session = requests.Session()
-            temp_response = temp_session.get(self.test_url, timeout=self.timeout)
-            
-            if temp_response.status_code == 200:
-                response_text_lower = temp_response.text.lower()
-                if 'baidu' in response_text_lower or '搜索' in response_text_lower:
-                    self.logger.info(f"网络连接正常，能够访问 {self.test_url}")
-                    return True
-                else:
-                    self.logger.warning(f"访问 {self.test_url} 返回200但内容不符合预期，可能被重定向到登录页")
-                    return False
+        self._apply_pending_config()
+        check_start = time.perf_counter()
+        self._check_timings = {}
+        self._check_detail = ''
+        # 同时在后台解析本次检查用到的所有主机，逐个查询时只需等待最慢的一个
+        self.dns_cache.prefetch(self.dns_hosts())
+        if self.socket_probe:
+            connected = self._tiered_probe()
+        else:
+            connected = self._http_probe()
+        
+        # 网络状态变化时丢弃连接池，避免复用门户状态变化前建立的连接
+        if self._last_state is not None and connected != self._last_state:
+            self.reset_session()
+        self._last_state = connected
+        NETWORK_CONNECTED.set(1 if connected else 0)
+        if self.history is not None:
+            self.history.record_probe(connected, self.probe.name, time.perf_counter() - check_start,
+                                      self._check_timings, self._check_detail, binding=self.label)
+        
+        return connected
+    
+    def dns_hosts(self) -> List[str]:
+        """TCP与HTTP探测需要解析的主机名"""
+        hosts = [host for host, _ in self.external_hosts + self.portal_hosts]
+        hosts += [probe.host for probe in self.probes if probe.host]
+        return list(dict.fromkeys(hosts))
+    
+    def _resolve(self, host: str) -> Optional[str]:
+        """通过DNS缓存解析主机名（有缓存时不等待解析）"""
+        return self.dns_cache.lookup(host)
+    
+    def check_socket_reachability(self) -> Dict[str, Any]:
+        """
+        TCP层探测：同时向门户主机和外网主机发起非阻塞连接
+        
+        Returns:
+            包含portal、external两个布尔值及各主机连接耗时的字典
+        """
+        targets = [('portal', host, port) for host, port in self.portal_hosts]
+        targets += [('external', host, port) for host, port in self.external_hosts]
+        
+        addresses, resolved_targets = [], []
+        for group, host, port in targets:
+            ip = self._resolve(host)
+            if ip is not None:
+                addresses.append((ip, port))
+                resolved_targets.append((group, host, port))
+        
+        probe_start = time.perf_counter()
+        latencies = tcp_reachability(addresses, self.socket_timeout, self.source_address)
+        result: Dict[str, Any] = {'portal': False, 'external': False, 'latency': {}}
+        for (group, host, port), latency in zip(resolved_targets, latencies):
+            result['latency'][f"{host}:{port}"] = None if latency is None else round(latency, 6)
+            if latency is not None:
+                result[group] = True
+        hijacked = [host for group, host, _ in targets if group == 'external' and self.dns_cache.hijacked(host)]
+        if hijacked:
+            result['dns_hijacked'] = hijacked
+        elapsed = time.perf_counter() - probe_start
+        record_probe('tcp', 'socket', elapsed, 'ok' if result['external'] else 'fail')
+        self._check_timings['tcp'] = round(elapsed, 6)
+        
+        self.last_socket_result = result
+        self.logger.debug(f"TCP探测结果: {result}")
+        return result
+    
+    def _tiered_probe(self) -> bool:
+        """
+        分层探测：先做TCP探测，只有结果不明确时才发起HTTP探测
+        
+        - 外网主机无法连接：结论明确，需要登录（或网络完全断开），不再发起HTTP请求
+        - 外网主机可以连接：认证门户可能劫持了TCP连接，结论不明确。
+          TCP探测结果与上次HTTP探测时相同且未超过 http_probe_max_age 时复用上次结论，
+          否则发起HTTP探测
+        """
+        socket_result = self.check_socket_reachability()
+        fingerprint = (socket_result['portal'], socket_result['external'])
+        
+        if not socket_result['external']:
+            if socket_result['portal']:
+                hijacked = '（外网主机的DNS解析被劫持）' if socket_result.get('dns_hijacked') else ''
+                self._check_detail = f"外网主机无法连接而认证门户可达{hijacked}"
+                self.logger.info(f"外网主机无法连接而认证门户可达{hijacked}，需要登录")
             else:
-                self.logger.warning(f"访问 {self.test_url} 返回状态码 {temp_response.status_code}")
-                return False
-                
-        except requests.exceptions.Timeout:
-            self.logger.warning(f"访问 {self.test_url} 超时")
-            return False
-        except requests.exceptions.ConnectionError:
-            self.logger.warning(f"无法连接到 {self.test_url}")
+                self._check_detail = "外网主机与认证门户均无法连接"
+                self.logger.warning("外网主机与认证门户均无法连接，网络可能已断开")
+            self._http_verdict_fingerprint = None
             return False
-        except requests.exceptions.RequestException as e:
-            self.logger.warning(f"访问 {self.test_url} 发生请求异常: {e}")
+        
+        if (self._http_verdict_fingerprint == fingerprint and self._last_state is not None
+                and time.monotonic() - self._http_verdict_time < self.http_probe_max_age):
+            self.logger.debug(f"TCP探测结果未变化，沿用上次HTTP探测结论: {self._last_state}")
+            self._check_detail = "TCP探测结果未变化，沿用上次HTTP探测结论"
+            return self._last_state
+        
+        connected = self._http_probe()
+        self._http_verdict_fingerprint = fingerprint
+        self._http_verdict_time = time.monotonic()
+        return connected
+    
+    def target_stats(self) -> List[Dict[str, Any]]:
+        """各HTTP探测目标的延迟统计，按下一次的探测顺序排列"""
+        return self.prober.summary()
+    
+    def _run_target(self, probe: BaseProbe) -> ProbeResult:
+        """对单个目标执行HTTP探测"""
+        address = self._resolve(probe.host) if probe.host else None
+        if self.direct_probe and probe.supports_direct:
+            return probe.run_direct(self.timeout, self.source_address, address)
+        return probe.run(self.session, self.timeout, address)
+    
+    def _http_probe(self) -> bool:
+        """通过HTTP请求探测外网，配置了多个目标时对冲探测并采用最先得到的明确结论"""
+        probe_url = ', '.join(probe.url for probe in self.prober.ordered())
+        probe_start = time.perf_counter()
+        outcome = 'error'
+        try:
+            self.logger.info(f"正在检查网络连接（{self.probe.name}），访问 {probe_url} ...")
+            probe, result = self.prober.run(self._run_target, self.timeout)
+            probe_url = probe.url
+            self.last_probe_result = result
+            self._check_detail = result.detail
+            self.logger.debug(
+                f"探测耗时 {result.latency * 1000:.1f}ms，读取 {result.bytes_read} 字节，期望: {self.probe.expected}"
+            )
+            
+            if result.ok:
+                outcome = 'ok'
+                self.logger.info(f"网络连接正常，能够访问 {probe_url}")
+                return True
+            
+            outcome = 'fail'
+            self.logger.warning(f"访问 {probe_url} {result.detail}")
+            if result.portal_url and self.discovery is not None:
+                self.discovery.remember(result.portal_url)
             return False
+                
         except Exception as e:
-            self.logger.error(f"网络检查发生未知错误: {e}", exc_info=True)
+            kind = probe_error_kind(e)
+            self._check_detail = f"HTTP探测异常（{kind or 'unknown'}）: {e}"
+            if kind == 'timeout':
+                self.logger.warning(f"访问 {probe_url} 超时")
+            elif kind == 'connection':
+                self.logger.warning(f"无法连接到 {probe_url}")
+            elif kind == 'request':
+                self.logger.warning(f"访问 {probe_url} 发生请求异常: {e}")
+            else:
+                self.logger.error(f"网络检查发生未知错误: {e}", exc_info=True)
             return False
+        finally:
+            elapsed = time.perf_counter() - probe_start
+            record_probe('http', self.probe.name, elapsed, outcome)
+            self._check_timings['http'] = round(elapsed, 6)
 
 
-class HENUAuthenticator:
-    """河南大学网络认证器"""
+class PortalProtocol:
+    """
+    认证门户协议：接口地址、请求构造与响应判定
+    
+    不发起任何请求，同步的HENUAuthenticator与异步的AsyncHENUAuthenticator各自负责传输，
+    使用方需要提供 logger 属性
+    """
     
     # 运营商后缀映射
     OPERATOR_SUFFIXES = {
@@ -75,14 +428,226 @@ class HENUAuthenticator:
         "dx": "@henudx"
     }
     
-    def __init__(self, timeout: int = 10):
+    # 认证系统接口地址
+    AUTH_API_URL = "http://172.29.35.27:8088/aaa-auth/api/v1/auth"
+    CHECK_API_URL = "http://172.29.35.27:8882/user/check-only"
+    QUICKAUTH_URL = "http://172.29.35.36:6060/quickauth.do"
+    VERIFY_URL = "http://www.baidu.com"
+    CAMPUS_CODE = '92c8c96e4c37100777c7190b76d28233'
+    USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+    
+    # 可通过配置覆盖的接口地址（配置键 -> 属性名）
+    ENDPOINT_KEYS = {
+        'auth_api_url': 'AUTH_API_URL',
+        'check_api_url': 'CHECK_API_URL',
+        'quickauth_url': 'QUICKAUTH_URL',
+        'verify_url': 'VERIFY_URL'
+    }
+    
+    def _apply_endpoints(self, endpoints: Optional[Mapping[str, str]], verify_probe_type: str) -> None:
+        """应用接口地址覆盖，并创建登录后验证外网所用的探测"""
+        for key, value in (endpoints or {}).items():
+            attr = self.ENDPOINT_KEYS.get(key)
+            if attr and value:
+                setattr(self, attr, value)
+        
+        self.verify_probe = create_probe(
+            verify_probe_type,
+            url=None if verify_probe_type == 'generate_204' else self.VERIFY_URL
+        )
+    
+    def _extract_url_params(self, url: str) -> Tuple[str, str]:
+        """从URL中提取wlanuserip和wlanacname参数"""
+        try:
+            wlanuserip, wlanacname, _ = parse_portal_url(url)
+            
+            if not wlanuserip or not wlanacname:
+                raise HENULoginError("无法从URL获取 wlanuserip 或 wlanacname 参数")
+            
+            self.logger.debug(f"提取参数: wlanuserip={wlanuserip}, wlanacname={wlanacname}")
+            return wlanuserip, wlanacname
+        
+        except Exception as e:
+            raise HENULoginError(f"解析URL参数失败: {str(e)}")
+    
+    @classmethod
+    def _build_headers(cls, url: str) -> Dict[str, str]:
+        """构造登录请求头"""
+        return {
+            'User-Agent': cls.USER_AGENT,
+            'Referer': url
+        }
+    
+    @classmethod
+    def _build_auth_data(cls, username: str, password: str, operator_suffix: str) -> Dict[str, str]:
+        """构造认证API表单"""
+        return {
+            'campusCode': cls.CAMPUS_CODE,
+            'username': username,
+            'password': password,
+            'operatorSuffix': operator_suffix
+        }
+    
+    @staticmethod
+    def _build_check_data(username: str, password: str, operator_suffix: str) -> Dict[str, str]:
+        """构造用户检查API表单"""
+        return {
+            'username': username,
+            'password': password,
+            'operatorSuffix': operator_suffix
+        }
+    
+    def _build_quickauth_url(self, full_username: str, password: str,
+                             wlanuserip: str, wlanacname: str) -> str:
+        """构造最终认证请求URL"""
+        quickauth_params = {
+            'userid': full_username,
+            'passwd': password,
+            'wlanuserip': wlanuserip,
+            'wlanacname': wlanacname,
+            'wlanacIp': '172.22.254.253',
+            'ssid': '',
+            'vlan': '',
+            'mac': '',
+            'version': '0',
+            'portalpageid': '9',
+            'timestamp': int(time.time() * 1000),
+            'uuid': '83206179-4e59-4357-afd1-b0bd2d670f26',
+            'portaltype': '0',
+            'hostname': '',
+            'bindCtrlId': ''
+        }
+        
+        return self.QUICKAUTH_URL + '?' + urllib.parse.urlencode(
+            quickauth_params, quote_via=urllib.parse.quote
+        )
+    
+    def _log_api_result(self, api_name: str, response_text: str) -> None:
+        """记录认证/检查API的返回结果（仅告警，不中断登录流程）"""
+        self.logger.debug(f"{api_name}API响应: {response_text}")
+        
+        try:
+            result = json.loads(response_text)
+        except (json.JSONDecodeError, TypeError):
+            self.logger.debug(f"{api_name}API响应非JSON格式，继续执行")
+            return
+        
+        if not isinstance(result, dict) or result.get('code') not in [1, -1]:
+            msg = result.get('msg', '未知错误') if isinstance(result, dict) else '未知错误'
+            self.logger.warning(f"{api_name}API返回警告: {msg}")
+        else:
+            self.logger.debug(f"{api_name}API调用成功")
+    
+    def _check_quickauth_response(self, verdict: QuickauthVerdict) -> bool:
+        """
+        判断最终认证响应是否成功
+        
+        明确的失败代码直接判定失败；没有可识别的结果代码时继续验证外网，由验证结果决定
+        """
+        if verdict.ok is False:
+            self.logger.error(f"最终认证请求失败，{verdict.detail}")
+            return False
+        
+        if verdict.ok is None:
+            self.logger.info(f"无法从认证响应判断结果（{verdict.detail}），以外网验证结果为准")
+        return True
+
+
+class HENUAuthenticator(PortalProtocol):
+    """河南大学网络认证器"""
+    
+    def __init__(self, timeout: int = 10, parallel_steps: bool = True, verify_probe_type: str = 'stream',
+                 endpoints: Optional[Dict[str, str]] = None, history: Optional['HistoryStore'] = None,
+                 source_address: Optional[str] = None, dns_cache: Optional[DnsCache] = None):
+        """
+        初始化认证器
+        
+        Args:
+            timeout: 请求超时时间（秒）
+            parallel_steps: 是否并发执行相互独立的认证API与检查API
+            verify_probe_type: 登录后验证外网所用的探测方式
+            endpoints: 覆盖默认接口地址，键为 auth_api_url/check_api_url/quickauth_url/verify_url，
+                       用于连接本地模拟门户或门户地址变更
+            history: 登录历史存储，记录每次登录尝试，状态查询从中读取上次登录时间与累计次数
+            source_address: 登录请求使用的本机源地址（多链路绑定），为None时由路由表决定
+            dns_cache: 登录后验证外网时使用的DNS缓存（通常与网络检查器共用），为None时由requests解析
+        """
         self.timeout = timeout
+        self.parallel_steps = parallel_steps
         self.logger = logging.getLogger(__name__)
-        self.session = requests.Session()
+        self._session: Optional['requests.Session'] = None
+        self._session_lock = threading.Lock()
         self.last_login_time: Optional[datetime] = None
         self.login_count = 0
+        self.last_step_timings: Dict[str, float] = {}
+        self._step_timings: Dict[str, float] = {}
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.history = history
+        self.source_address = source_address
+        self.dns_cache = dns_cache
+        # 多链路时的绑定名称，写入登录历史
+        self.label = ''
+        self.quickauth_classifier = QuickauthClassifier()
+        self._apply_endpoints(endpoints, verify_probe_type)
+        # 热更新时记录的 (network部分, portal部分)，由执行登录的线程在下一次登录开始时应用
+        self._pending_config: Optional[Tuple[Mapping[str, Any], Optional[Mapping[str, str]]]] = None
+        self._config_lock = threading.Lock()
+    
+    @property
+    def session(self) -> 'requests.Session':
+        """登录会话，第一次登录时才创建（并导入requests）"""
+        session = self._session
+        if session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    session = requests.Session()
+                    if self.source_address:
+                        mount_source_adapter(session, self.source_address)
+                    self._session = session
+                session = self._session
+        return session
+    
+    def close(self) -> None:
+        """关闭登录会话，下一次登录时重新创建"""
+        with self._session_lock:
+            old_session, self._session = self._session, None
+        if old_session is not None:
+            old_session.close()
     
-    def login(self, url: str, username: str, password: str, operator: str = "local") -> bool:
+    def set_source_address(self, source_address: Optional[str]) -> None:
+        """更换登录使用的源地址，旧会话（及其Cookie）随之丢弃"""
+        if source_address != self.source_address:
+            self.source_address = source_address
+            self.close()
+    
+    def apply_config(self, network_config: Mapping[str, Any], endpoints: Optional[Mapping[str, str]] = None) -> None:
+        """
+        热更新配置：只记录新配置，超时、并发步骤与接口地址在下一次登录开始时生效
+        
+        Args:
+            network_config: 新配置的network部分
+            endpoints: 新配置的portal部分
+        """
+        with self._config_lock:
+            self._pending_config = (network_config, endpoints)
+    
+    def _apply_pending_config(self) -> None:
+        """应用待生效的配置（登录开始前，在执行登录的线程中）"""
+        with self._config_lock:
+            pending, self._pending_config = self._pending_config, None
+        if pending is None:
+            return
+        
+        network_config, endpoints = pending
+        self.timeout = network_config.get('timeout', self.timeout)
+        self.parallel_steps = network_config.get('parallel_login_steps', self.parallel_steps)
+        # 先恢复默认接口地址，配置中删除的覆盖项随之失效
+        for attr in self.ENDPOINT_KEYS.values():
+            self.__dict__.pop(attr, None)
+        self._apply_endpoints(endpoints, self.verify_probe.name)
+    
+    def login(self, url: str, username: str, password: str, operator: str = "local", reason: str = '') -> bool:
         """
         执行登录操作
         
@@ -91,6 +656,7 @@ class HENUAuthenticator:
             username: 用户名
             password: 密码
             operator: 运营商类型（local/yd/lt/dx）
+            reason: 登录原因，写入登录历史（renewal表示会话过期前的提前续期）
             
         Returns:
             bool: 登录是否成功
@@ -98,7 +664,10 @@ class HENUAuthenticator:
         Raises:
             HENULoginError: 登录过程中的错误
         """
+        self._apply_pending_config()
         try:
+            # 最先清空：之后任何一步抛出异常，记录的都是本次登录的耗时
+            self._step_timings = {}
             start_time = time.time()
             self.logger.info(f"开始登录流程，用户: {username}, 运营商: {operator}")
             
@@ -107,32 +676,35 @@ class HENUAuthenticator:
             full_username = username + operator_suffix
             
             # 设置请求头
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Referer': url
-            }
+            headers = self._build_headers(url)
             
             # 1. 获取登录页面，提取URL参数
             self.logger.debug("步骤1: 获取登录页面参数")
-            wlanuserip, wlanacname = self._extract_url_params(url)
-            
-            # 2. 认证接口
-            self.logger.debug("步骤2: 调用认证接口")
-            self._call_auth_api(username, password, operator_suffix, headers)
+            with self._timed_step('extract_params'):
+                wlanuserip, wlanacname = self._extract_url_params(url)
             
-            # 3. 检查用户接口
-            self.logger.debug("步骤3: 调用用户检查接口")
-            self._call_check_api(username, password, operator_suffix, headers)
+            # 2、3. 认证接口与用户检查接口互不依赖，作为同一阶段执行
+            self.logger.debug("步骤2/3: 调用认证接口与用户检查接口")
+            self._run_stage('auth_check', [
+                ('auth_api', self._call_auth_api, (username, password, operator_suffix, headers)),
+                ('check_api', self._call_check_api, (username, password, operator_suffix, headers))
+            ])
             
-            # 4. 最终认证请求
+            # 4. 最终认证请求，等待前一阶段全部完成后执行
             self.logger.debug("步骤4: 发起最终认证请求")
             success = self._final_authentication(
                 full_username, password, wlanuserip, wlanacname, url, headers
             )
             
             elapsed_time = time.time() - start_time
+            self._step_timings['total'] = round(elapsed_time, 4)
+            self.last_step_timings = dict(self._step_timings)
+            self.logger.debug(f"各步骤耗时: {self.last_step_timings}")
+            record_login(self.last_step_timings, 'success' if success else 'failure')
+            self._record_history('success' if success else 'failure', username, reason=reason)
             
             if success:
+                LAST_LOGIN_TIMESTAMP.set(time.time())
                 self.last_login_time = datetime.now()
                 self.login_count += 1
                 self.logger.info(f"登录成功！耗时: {elapsed_time:.2f}秒, 累计登录次数: {self.login_count}")
@@ -143,125 +715,109 @@ class HENUAuthenticator:
             
         except HENULoginError as e:
             self.logger.error(f"登录过程中发生错误: {e}", exc_info=True)
+            record_login(self._step_timings, 'error')
+            self._record_history('error', username, str(e), reason)
             raise
         except Exception as e:
             self.logger.error(f"登录过程中发生未知错误: {e}", exc_info=True)
+            record_login(self._step_timings, 'error')
+            self._record_history('error', username, str(e), reason)
             raise HENULoginError(f"登录失败: {str(e)}")
     
-    def _extract_url_params(self, url: str) -> Tuple[str, str]:
-        """从URL中提取wlanuserip和wlanacname参数"""
+    def _record_history(self, outcome: str, username: str, error: Optional[str] = None, reason: str = '') -> None:
+        """把本次登录尝试写入历史存储"""
+        if self.history is not None:
+            self.history.record_login(outcome, self._step_timings, username=username, error=error,
+                                      binding=self.label, reason=reason)
+    
+    @contextmanager
+    def _timed_step(self, step: str) -> Iterator[None]:
+        """记录单个步骤的耗时（秒）"""
+        step_start = time.perf_counter()
         try:
-            parsed_url = urllib.parse.urlparse(url)
-            query_params = urllib.parse.parse_qs(parsed_url.query)
-            wlanuserip = query_params.get('wlanuserip', [None])[0]
-            wlanacname = query_params.get('wlanacname', [None])[0]
-            
-            if not wlanuserip or not wlanacname:
-                raise HENULoginError("无法从URL获取 wlanuserip 或 wlanacname 参数")
+            yield
+        finally:
+            self._step_timings[step] = round(time.perf_counter() - step_start, 4)
+    
+    def _run_stage(self, stage: str, steps: List[Tuple[str, Callable[..., Any], tuple]]) -> None:
+        """
+        执行一个登录阶段，阶段内的步骤相互独立，可并发执行
+        
+        Args:
+            stage: 阶段名称，其总耗时记录为 stage:<名称>
+            steps: (步骤名称, 可调用对象, 参数) 列表
+        """
+        def run_step(step: str, func: Callable[..., Any], args: tuple) -> Any:
+            with self._timed_step(step):
+                return func(*args)
+        
+        with self._timed_step(f'stage:{stage}'):
+            if not self.parallel_steps or len(steps) < 2:
+                for step, func, args in steps:
+                    run_step(step, func, args)
+                return
             
-            self.logger.debug(f"提取参数: wlanuserip={wlanuserip}, wlanacname={wlanacname}")
-            return wlanuserip, wlanacname
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='henu-login')
             
-        except Exception as e:
-            raise HENULoginError(f"解析URL参数失败: {str(e)}")
+            futures = [self._executor.submit(run_step, step, func, args) for step, func, args in steps]
+            for future in futures:
+                future.result()
     
     def _call_auth_api(self, username: str, password: str, operator_suffix: str, headers: Dict) -> None:
         """调用认证API"""
-        auth_url = "http://172.29.35.27:8088/aaa-auth/api/v1/auth"
-        auth_data = {
-            'campusCode': '92c8c96e4c37100777c7190b76d28233',
-            'username': username,
-            'password': password,
-            'operatorSuffix': operator_suffix
-        }
+        import requests
+        
+        auth_data = self._build_auth_data(username, password, operator_suffix)
         
         try:
-            response = self.session.post(auth_url, data=auth_data, timeout=self.timeout, headers=headers)
-            self.logger.debug(f"认证API响应: {response.text}")
+            response = self.session.post(self.AUTH_API_URL, data=auth_data, timeout=self.timeout, headers=headers)
+            self._log_api_result("认证", response.text)
             
-            try:
-                result = response.json()
-                if result.get('code') not in [1, -1]:
-                    msg = result.get('msg', '未知错误')
-                    self.logger.warning(f"认证API返回警告: {msg}")
-                else:
-                    self.logger.debug("认证API调用成功")
-            except json.JSONDecodeError:
-                self.logger.debug("认证API响应非JSON格式，继续执行")
-                
         except requests.exceptions.RequestException as e:
             self.logger.warning(f"认证API调用失败: {e}，继续尝试登录")
     
     def _call_check_api(self, username: str, password: str, operator_suffix: str, headers: Dict) -> None:
         """调用用户检查API"""
-        check_url = "http://172.29.35.27:8882/user/check-only"
-        check_data = {
-            'username': username,
-            'password': password,
-            'operatorSuffix': operator_suffix
-        }
+        import requests
+        
+        check_data = self._build_check_data(username, password, operator_suffix)
         
         try:
-            response = self.session.post(check_url, data=check_data, timeout=self.timeout, headers=headers)
-            self.logger.debug(f"检查API响应: {response.text}")
+            response = self.session.post(self.CHECK_API_URL, data=check_data, timeout=self.timeout, headers=headers)
+            self._log_api_result("检查", response.text)
             
-            try:
-                result = response.json()
-                if result.get('code') not in [1, -1]:
-                    msg = result.get('msg', '未知错误')
-                    self.logger.warning(f"检查API返回警告: {msg}")
-                else:
-                    self.logger.debug("检查API调用成功")
-            except json.JSONDecodeError:
-                self.logger.debug("检查API响应非JSON格式，继续执行")
-                
         except requests.exceptions.RequestException as e:
             self.logger.warning(f"检查API调用失败: {e}，继续尝试登录")
     
     def _final_authentication(self, full_username: str, password: str, wlanuserip: str, 
                              wlanacname: str, original_url: str, headers: Dict) -> bool:
         """执行最终的认证请求"""
-        quickauth_base_url = "http://172.29.35.36:6060/quickauth.do"
-        quickauth_params = {
-            'userid': full_username,
-            'passwd': password,
-            'wlanuserip': wlanuserip,
-            'wlanacname': wlanacname,
-            'wlanacIp': '172.22.254.253',
-            'ssid': '',
-            'vlan': '',
-            'mac': '',
-            'version': '0',
-            'portalpageid': '9',
-            'timestamp': int(time.time() * 1000),
-            'uuid': '83206179-4e59-4357-afd1-b0bd2d670f26',
-            'portaltype': '0',
-            'hostname': '',
-            'bindCtrlId': ''
-        }
+        import requests
         
-        quickauth_url = quickauth_base_url + '?' + urllib.parse.urlencode(
-            quickauth_params, quote_via=urllib.parse.quote
-        )
+        quickauth_url = self._build_quickauth_url(full_username, password, wlanuserip, wlanacname)
         
         try:
             self.logger.debug(f"发起最终认证请求: {quickauth_url}")
-            response = self.session.get(quickauth_url, headers=headers, timeout=self.timeout)
-            
-            self.logger.debug(f"最终认证响应状态码: {response.status_code}")
-            self.logger.debug(f"最终认证响应内容: {response.text[:200]}...")
+            with self._timed_step('quickauth'):
+                # 流式读取，得出结论后不再读取剩余响应体
+                response = self.session.get(quickauth_url, headers=headers, timeout=self.timeout, stream=True)
+                try:
+                    verdict = self.quickauth_classifier.classify(
+                        response.status_code, response.iter_content(chunk_size=1024)
+                    )
+                finally:
+                    response.close()
             
-            if response.status_code != 200:
-                self.logger.error(f"最终认证请求失败，状态码: {response.status_code}")
-                return False
+            self.logger.debug(f"最终认证响应状态码: {response.status_code}，读取 {verdict.bytes_read} 字节")
+            self.logger.debug(f"最终认证响应内容: {verdict.preview.decode('utf-8', 'replace')}...")
             
-            # 检查响应内容
-            if 'error' in response.text.lower() or 'fail' in response.text.lower():
-                self.logger.error("认证响应包含错误信息")
+            if not self._check_quickauth_response(verdict):
                 return False
             
             # 验证是否能访问外网
-            return self._verify_internet_access()
+            with self._timed_step('verify'):
+                return self._verify_internet_access()
             
         except requests.exceptions.RequestException as e:
             self.logger.error(f"最终认证请求异常: {e}")
@@ -269,14 +825,17 @@ class HENUAuthenticator:
     
     def _verify_internet_access(self) -> bool:
         """验证是否能访问外网"""
+        import requests
+        
         try:
-            test_response = self.session.get("http://www.baidu.com", timeout=5)
-            if test_response.status_code == 200 and len(test_response.text) > 500:
-                if 'baidu' in test_response.text.lower() or '搜索' in test_response.text:
-                    self.logger.info("验证成功：能够访问外网")
-                    return True
+            host = self.verify_probe.host
+            address = self.dns_cache.lookup(host) if self.dns_cache is not None and host else None
+            result = self.verify_probe.run(self.session, 5, address)
+            if result.ok:
+                self.logger.info("验证成功：能够访问外网")
+                return True
             
-            self.logger.warning("验证失败：无法正常访问外网")
+            self.logger.warning(f"验证失败：无法正常访问外网（{result.detail}）")
             return False
             
         except requests.RequestException as e:
@@ -284,9 +843,23 @@ class HENUAuthenticator:
             return False
     
     def get_status(self) -> Dict[str, Any]:
-        """获取认证器状态信息"""
-        return {
+        """
+        获取认证器状态信息
+        
+        配置了历史存储时，上次登录时间、累计次数与步骤耗时取自历史记录，
+        包含此前运行（单次运行、重启前）以及其他进程的登录
+        """
+        status = {
             'last_login_time': self.last_login_time.isoformat() if self.last_login_time else None,
             'login_count': self.login_count,
-            'session_active': bool(self.session.cookies)
+            'session_active': self._session is not None and bool(self._session.cookies),
+            'last_step_timings': self.last_step_timings
         }
+        if self.history is not None:
+            binding = self.label or None
+            last = self.history.last_login('success', binding=binding)
+            if last is not None:
+                status['last_login_time'] = datetime.fromtimestamp(last['ts']).isoformat()
+                status['last_step_timings'] = last['timings']
+            status['login_count'] = self.history.login_count('success', binding=binding)
+        return status
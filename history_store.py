@@ -0,0 +1,298 @@
+"""
+登录与探测历史
+把每次网络检查与登录尝试（含各步骤耗时和结果）写入本地SQLite数据库，
+单次运行、重启之后仍能查询上次登录时间、累计登录次数与近期成功率，
+状态查询和调度器只读本地索引，不产生网络请求
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Mapping, Optional
+
+
+class HistoryStore:
+    """基于SQLite的登录与探测历史"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS probes (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            connected INTEGER NOT NULL,
+            probe_type TEXT NOT NULL,
+            latency REAL NOT NULL,
+            timings TEXT NOT NULL,
+            detail TEXT NOT NULL DEFAULT '',
+            binding TEXT NOT NULL DEFAULT ''
+        );
+        -- 覆盖索引：按时间窗口统计时不必回表
+        CREATE INDEX IF NOT EXISTS probes_ts ON probes (ts, connected, latency);
+        CREATE TABLE IF NOT EXISTS logins (
+            id INTEGER PRIMARY KEY,
+            ts REAL NOT NULL,
+            outcome TEXT NOT NULL,
+            username TEXT NOT NULL DEFAULT '',
+            total REAL,
+            timings TEXT NOT NULL,
+            error TEXT,
+            binding TEXT NOT NULL DEFAULT '',
+            reason TEXT NOT NULL DEFAULT ''
+        );
+        CREATE INDEX IF NOT EXISTS logins_ts ON logins (ts, outcome, total);
+        CREATE INDEX IF NOT EXISTS logins_outcome_ts ON logins (outcome, ts);
+    """
+
+    # 建表之后新增的列，打开旧数据库时补上（表名, 列名, 列定义）
+    MIGRATIONS = (
+        ('probes', 'binding', "TEXT NOT NULL DEFAULT ''"),
+        ('logins', 'binding', "TEXT NOT NULL DEFAULT ''"),
+        ('logins', 'reason', "TEXT NOT NULL DEFAULT ''"),
+    )
+    # 依赖新增列的索引，补列之后创建
+    INDEXES = (
+        'CREATE INDEX IF NOT EXISTS probes_binding ON probes (binding, connected, ts)',
+    )
+
+    def __init__(self, path: str = 'history.db', retention_days: float = 30):
+        """
+        初始化历史存储，数据库在第一次读写时才打开
+
+        Args:
+            path: 数据库文件路径，":memory:" 表示只保存在内存中
+            retention_days: 记录保留天数，打开数据库时删除更早的记录，0表示不清理
+        """
+        self.path = path
+        self.retention_days = retention_days
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @classmethod
+    def from_config(cls, history_config: Mapping[str, Any]) -> Optional['HistoryStore']:
+        """根据配置文件的history部分创建历史存储，未启用时返回None"""
+        if not history_config.get('enabled', True):
+            return None
+        return cls(
+            path=history_config.get('file', 'history.db'),
+            retention_days=history_config.get('retention_days', 30)
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        """打开数据库并建表（调用方持有锁）"""
+        if self._conn is None:
+            # 守护进程、Web界面与定时单次运行可能同时写同一个文件
+            conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.executescript(self.SCHEMA)
+            for table, column, definition in self.MIGRATIONS:
+                columns = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+            for statement in self.INDEXES:
+                conn.execute(statement)
+            if self.retention_days:
+                cutoff = time.time() - self.retention_days * 86400
+                conn.execute('DELETE FROM probes WHERE ts < ?', (cutoff,))
+                conn.execute('DELETE FROM logins WHERE ts < ?', (cutoff,))
+            self._conn = conn
+        return self._conn
+
+    def _write(self, sql: str, params: tuple) -> None:
+        """写入一条记录，失败只记录警告，不影响登录流程"""
+        try:
+            with self._lock:
+                self._connection().execute(sql, params)
+        except sqlite3.Error as e:
+            self.logger.warning(f"写入历史记录失败: {e}")
+
+    def _query(self, sql: str, params: tuple = ()) -> List[sqlite3.Row]:
+        """执行查询，失败时返回空列表"""
+        try:
+            with self._lock:
+                return self._connection().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            self.logger.warning(f"读取历史记录失败: {e}")
+            return []
+
+    def record_probe(self, connected: bool, probe_type: str, latency: float,
+                     timings: Optional[Mapping[str, float]] = None, detail: str = '', binding: str = '') -> None:
+        """
+        记录一次网络检查
+
+        Args:
+            connected: 网络是否正常
+            probe_type: HTTP探测方式
+            latency: 整次检查耗时（秒）
+            timings: 各层探测耗时（秒），如 {'tcp': 0.001, 'http': 0.05}
+            detail: 探测结论说明
+            binding: 多链路时的绑定名称
+        """
+        self._write(
+            'INSERT INTO probes (ts, connected, probe_type, latency, timings, detail, binding) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (time.time(), int(connected), probe_type, round(latency, 6), json.dumps(dict(timings or {})), detail,
+             binding)
+        )
+
+    def record_login(self, outcome: str, timings: Optional[Mapping[str, float]] = None,
+                     username: str = '', error: Optional[str] = None, binding: str = '',
+                     reason: str = '') -> None:
+        """
+        记录一次登录尝试
+
+        Args:
+            outcome: success/failure/error
+            timings: 各步骤耗时（秒），total为总耗时
+            username: 登录用户名（不记录密码）
+            error: 异常信息
+            binding: 多链路时的绑定名称
+            reason: 登录原因，renewal表示会话预计过期前的提前续期，空表示检测到掉线后登录
+        """
+        timings = dict(timings or {})
+        self._write(
+            'INSERT INTO logins (ts, outcome, username, total, timings, error, binding, reason) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (time.time(), outcome, username, timings.get('total'), json.dumps(timings), error, binding, reason)
+        )
+
+    @staticmethod
+    def _row(row: sqlite3.Row) -> Dict[str, Any]:
+        """数据库行转换为字典，timings解析为字典"""
+        record = dict(row)
+        record['timings'] = json.loads(record['timings'])
+        if 'connected' in record:
+            record['connected'] = bool(record['connected'])
+        return record
+
+    def last_login(self, outcome: Optional[str] = 'success', binding: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """最近一次登录记录，outcome为None时不区分结果，binding不为None时只查该绑定"""
+        conditions, params = [], []
+        if outcome is not None:
+            conditions.append('outcome = ?')
+            params.append(outcome)
+        if binding is not None:
+            conditions.append('binding = ?')
+            params.append(binding)
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ''
+        rows = self._query(f'SELECT * FROM logins {where}ORDER BY ts DESC LIMIT 1', tuple(params))
+        return self._row(rows[0]) if rows else None
+
+    def login_count(self, outcome: str = 'success', since: Optional[float] = None,
+                    binding: Optional[str] = None) -> int:
+        """登录次数，since为Unix时间戳时只统计之后的记录，binding不为None时只统计该绑定"""
+        if binding is None:
+            rows = self._query(
+                'SELECT COUNT(*) FROM logins WHERE outcome = ? AND ts >= ?', (outcome, since or 0)
+            )
+        else:
+            rows = self._query(
+                'SELECT COUNT(*) FROM logins WHERE outcome = ? AND ts >= ? AND binding = ?',
+                (outcome, since or 0, binding)
+            )
+        return rows[0][0] if rows else 0
+
+    def consecutive_login_failures(self) -> int:
+        """最近一次成功登录之后的连续失败次数"""
+        rows = self._query(
+            "SELECT COUNT(*) FROM logins WHERE outcome != 'success' AND ts > "
+            "COALESCE((SELECT MAX(ts) FROM logins WHERE outcome = 'success'), 0)"
+        )
+        return rows[0][0] if rows else 0
+
+    def session_spans(self, binding: str = '', limit: int = 50, dropped_only: bool = False) -> List[Dict[str, Any]]:
+        """
+        最近若干次成功登录各自的会话区间，按时间正序
+
+        Args:
+            binding: 绑定名称，默认链路为空字符串
+            limit: 最多返回的会话数
+            dropped_only: 只返回检测到掉线的会话，从最近的会话往前查找直到凑够limit个。
+                提前续期生效后大部分会话以续期结束，最近limit个会话里可能已经没有掉线样本
+
+        Returns:
+            每项包含 login（登录时间）、reason（登录原因）、next_login（下一次成功登录时间，当前会话为None）、
+            dropped（之后第一次检测到离线的时间，未掉线为None）与 last_online（掉线前最后一次检测到在线的时间）
+        """
+        sql = "SELECT ts, reason FROM logins WHERE outcome = 'success' AND binding = ? ORDER BY ts DESC"
+        rows = self._query(sql, (binding,)) if dropped_only else self._query(f'{sql} LIMIT ?', (binding, limit))
+        spans: List[Dict[str, Any]] = []
+        next_login = None
+        for row in rows:
+            span = self._session_span(binding, row['ts'], row['reason'], next_login)
+            next_login = row['ts']
+            if dropped_only and span['dropped'] is None:
+                continue
+            spans.append(span)
+            if len(spans) >= limit:
+                break
+        spans.reverse()
+        return spans
+
+    def _session_span(self, binding: str, login_ts: float, reason: str, next_login: Optional[float]) -> Dict[str, Any]:
+        """一次成功登录到下一次成功登录之间的会话区间"""
+        end = next_login if next_login is not None else float('inf')
+        dropped = self._query(
+            'SELECT MIN(ts) FROM probes WHERE binding = ? AND connected = 0 AND ts > ? AND ts < ?',
+            (binding, login_ts, end)
+        )
+        dropped_ts = dropped[0][0] if dropped else None
+        last_online_ts = None
+        if dropped_ts is not None:
+            last_online = self._query(
+                'SELECT MAX(ts) FROM probes WHERE binding = ? AND connected = 1 AND ts > ? AND ts < ?',
+                (binding, login_ts, dropped_ts)
+            )
+            last_online_ts = last_online[0][0] if last_online else None
+        return {
+            'login': login_ts, 'reason': reason, 'next_login': next_login,
+            'dropped': dropped_ts, 'last_online': last_online_ts
+        }
+
+    def recent_logins(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """最近的登录记录，按时间倒序"""
+        return [self._row(row) for row in self._query('SELECT * FROM logins ORDER BY ts DESC LIMIT ?', (limit,))]
+
+    def recent_probes(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """最近的网络检查记录，按时间倒序"""
+        return [self._row(row) for row in self._query('SELECT * FROM probes ORDER BY ts DESC LIMIT ?', (limit,))]
+
+    def summary(self, window: float = 86400) -> Dict[str, Any]:
+        """
+        最近一段时间的统计
+
+        Args:
+            window: 统计窗口（秒），默认24小时
+
+        Returns:
+            检查次数、在线比例、登录成功/失败次数与平均登录耗时
+        """
+        since = time.time() - window
+        probes = self._query(
+            'SELECT COUNT(*), SUM(connected), AVG(latency) FROM probes WHERE ts >= ?', (since,)
+        )
+        logins = self._query(
+            'SELECT outcome, COUNT(*), AVG(total) FROM logins WHERE ts >= ? GROUP BY outcome', (since,)
+        )
+        checks, online, probe_latency = tuple(probes[0]) if probes else (0, 0, None)
+        by_outcome = {row[0]: (row[1], row[2]) for row in logins}
+        success_count, success_avg = by_outcome.get('success', (0, None))
+        return {
+            'window': window,
+            'checks': checks,
+            'online_ratio': round(online / checks, 4) if checks else None,
+            'avg_probe_latency': round(probe_latency, 4) if probe_latency is not None else None,
+            'logins_succeeded': success_count,
+            'logins_failed': sum(count for outcome, (count, _) in by_outcome.items() if outcome != 'success'),
+            'avg_login_time': round(success_avg, 4) if success_avg is not None else None
+        }
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
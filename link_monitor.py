@@ -0,0 +1,156 @@
+"""
+链路变化监听
+在Linux上通过rtnetlink套接字订阅链路、地址和路由变化，网络变化时立即唤醒守护进程；
+其他平台退化为可中断的定时等待
+"""
+
+import logging
+import os
+import select
+import socket
+import struct
+import sys
+import time
+from typing import List, Optional
+
+
+class LinkMonitor:
+    """rtnetlink 链路/地址/路由变化监听器"""
+    
+    # rtnetlink 多播组（linux/rtnetlink.h）
+    RTMGRP_LINK = 0x1
+    RTMGRP_IPV4_IFADDR = 0x10
+    RTMGRP_IPV4_ROUTE = 0x40
+    RTMGRP_IPV6_IFADDR = 0x100
+    RTMGRP_IPV6_ROUTE = 0x400
+    
+    # netlink 消息类型
+    NLMSG_HEADER = struct.Struct('=LHHLL')
+    MESSAGE_TYPES = {
+        16: 'link_changed',
+        17: 'link_removed',
+        20: 'address_added',
+        21: 'address_removed',
+        24: 'route_added',
+        25: 'route_removed'
+    }
+    
+    def __init__(self, debounce: float = 1.0, enabled: bool = True):
+        """
+        初始化监听器
+        
+        Args:
+            debounce: 收到第一个事件后继续收集事件的时间（秒），合并DHCP续租等产生的一连串消息
+            enabled: 是否启用netlink监听，为False时只做可中断的定时等待
+        """
+        self.debounce = debounce
+        self.logger = logging.getLogger(__name__)
+        self._sock: Optional[socket.socket] = None
+        self._wake_r, self._wake_w = os.pipe() if sys.platform != 'win32' else (None, None)
+        
+        if enabled and self.is_supported():
+            try:
+                self._sock = self._open_socket()
+                self.logger.info("已启用netlink链路变化监听")
+            except OSError as e:
+                self.logger.warning(f"无法创建netlink套接字，退化为定时检查: {e}")
+    
+    @staticmethod
+    def is_supported() -> bool:
+        """当前平台是否支持rtnetlink"""
+        return sys.platform.startswith('linux') and hasattr(socket, 'AF_NETLINK')
+    
+    @property
+    def active(self) -> bool:
+        """netlink监听是否正在工作"""
+        return self._sock is not None
+    
+    def _open_socket(self) -> socket.socket:
+        """创建并绑定rtnetlink套接字"""
+        groups = (self.RTMGRP_LINK | self.RTMGRP_IPV4_IFADDR | self.RTMGRP_IPV4_ROUTE
+                  | self.RTMGRP_IPV6_IFADDR | self.RTMGRP_IPV6_ROUTE)
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+        sock.setblocking(False)
+        sock.bind((0, groups))
+        return sock
+    
+    def _read_events(self) -> List[str]:
+        """读取套接字中已到达的全部netlink消息"""
+        events = []
+        while True:
+            try:
+                data = self._sock.recv(65536)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as e:
+                # ENOBUFS：内核缓冲区溢出丢了消息，视为发生过变化
+                self.logger.debug(f"读取netlink消息失败: {e}")
+                events.append('overflow')
+                break
+            
+            offset = 0
+            while offset + self.NLMSG_HEADER.size <= len(data):
+                length, msg_type, _, _, _ = self.NLMSG_HEADER.unpack_from(data, offset)
+                if length < self.NLMSG_HEADER.size:
+                    break
+                event = self.MESSAGE_TYPES.get(msg_type)
+                if event:
+                    events.append(event)
+                offset += (length + 3) & ~3
+        return events
+    
+    def wait(self, timeout: float) -> List[str]:
+        """
+        等待网络变化或超时
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            发生的事件名称列表（已去重），超时或被 wakeup() 唤醒时返回空列表
+        """
+        watched = [fd for fd in (self._sock, self._wake_r) if fd is not None]
+        if not watched:
+            time.sleep(timeout)
+            return []
+        
+        deadline = time.monotonic() + timeout
+        events: List[str] = []
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            readable, _, _ = select.select(watched, [], [], remaining)
+            if not readable:
+                break
+            if self._wake_r in readable:
+                os.read(self._wake_r, 1024)
+                break
+            if self._sock in readable:
+                events.extend(self._read_events())
+                if events:
+                    # 合并短时间内的一连串变化
+                    deadline = min(deadline, time.monotonic() + self.debounce)
+        
+        return sorted(set(events))
+    
+    def wakeup(self) -> None:
+        """唤醒正在 wait() 的线程（可在信号处理器中调用）"""
+        if self._wake_w is not None:
+            try:
+                os.write(self._wake_w, b'\0')
+            except OSError:
+                pass
+    
+    def close(self) -> None:
+        """关闭套接字"""
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+        for fd in (self._wake_r, self._wake_w):
+            if fd is not None:
+                try:
+                    os.close(fd)
+                except OSError:
+                    pass
+        self._wake_r = self._wake_w = None
@@ -0,0 +1,260 @@
+"""
+日志文件读取
+从文件末尾按块反向读取最后N行，不足时继续读取RotatingFileHandler的备份文件；
+行数统计按文件增长增量更新，不必每次重新扫描整个文件。
+JSON行格式的日志可按时间与级别查询，借助旁边的 .idx 索引直接定位到相关字节范围
+"""
+
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 索引文件与日志文件同名，加此后缀（轮转备份 auto_login.log.1 对应 auto_login.log.1.idx）
+INDEX_SUFFIX = '.idx'
+
+# 不低于此级别的记录逐条写入索引（数量少，按级别查询时只读这些行），更低级别每个时间桶只记第一条
+EXACT_INDEX_LEVEL = logging.WARNING
+
+
+def index_path(log_path: str) -> str:
+    """日志文件对应的索引文件路径"""
+    return log_path + INDEX_SUFFIX
+
+
+def load_index(path: str) -> List[Tuple[int, int, int]]:
+    """
+    读取索引文件
+    
+    每行为 "时间桶起始时间 级别数值 字节偏移"，记录该时间桶内该级别第一条记录的位置
+    （不低于 EXACT_INDEX_LEVEL 的记录每条都有一行）
+    
+    Returns:
+        按偏移排序的 (时间桶起始时间, 级别, 偏移) 列表，文件不存在时为空
+    """
+    entries = []
+    try:
+        with open(path, 'r', encoding='ascii', errors='replace') as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and all(part.isdigit() for part in parts):
+                    entries.append((int(parts[0]), int(parts[1]), int(parts[2])))
+    except OSError:
+        return []
+    entries.sort(key=lambda entry: entry[2])
+    return entries
+
+
+def index_ranges(entries: List[Tuple[int, int, int]], size: int, since: Optional[float] = None,
+                 level: Optional[int] = None) -> List[Tuple[int, Optional[int]]]:
+    """
+    根据索引计算可能包含匹配记录的字节范围
+    
+    时间桶按写出时间划分，同一时间桶的记录在文件中连续；只有含所需级别、且下一个时间桶
+    开始得晚于since的时间桶才需要读取，从该级别第一条记录读到下一个时间桶开始处。
+    所需级别不低于 EXACT_INDEX_LEVEL 时只读取索引中的各行
+    
+    Args:
+        entries: load_index() 的结果
+        size: 日志文件当前大小，超出的偏移（文件被截断）忽略
+        since: 只要此Unix时间戳之后的记录
+        level: 只要不低于此级别的记录
+    
+    Returns:
+        按偏移排序的 (起始偏移, 结束偏移) 列表，结束偏移为None表示只读一行
+    """
+    regions: List[Tuple[int, int, List[Tuple[int, int]]]] = []
+    for bucket, levelno, offset in entries:
+        if offset >= size:
+            break
+        if not regions or regions[-1][0] != bucket:
+            regions.append((bucket, offset, []))
+        regions[-1][2].append((levelno, offset))
+    
+    exact = level is not None and level >= EXACT_INDEX_LEVEL
+    ranges: List[Tuple[int, Optional[int]]] = []
+    for i, (bucket, start, marks) in enumerate(regions):
+        next_bucket, end = (regions[i + 1][0], regions[i + 1][1]) if i + 1 < len(regions) else (None, size)
+        if since is not None and next_bucket is not None and next_bucket <= since:
+            continue
+        offsets = [offset for levelno, offset in marks if level is None or levelno >= level]
+        if exact:
+            ranges.extend((offset, None) for offset in offsets)
+        elif offsets:
+            ranges.append((min(offsets), end))
+    return ranges
+
+
+class LogTailReader:
+    """日志尾部读取器"""
+    
+    BLOCK_SIZE = 64 * 1024
+    
+    def __init__(self, log_file: str, backup_count: int = 5, encoding: str = 'utf-8'):
+        """
+        初始化读取器
+        
+        Args:
+            log_file: 日志文件路径
+            backup_count: RotatingFileHandler保留的备份数量（log_file.1 ... log_file.N）
+            encoding: 日志文件编码
+        """
+        self.log_file = log_file
+        self.backup_count = max(0, int(backup_count))
+        self.encoding = encoding
+        self._lock = threading.Lock()
+        # 行数统计状态：(inode, 已统计的字节数, 换行符数量, 最后一个字节是否为换行)
+        self._count_state: Optional[Tuple[int, int, int, bool]] = None
+    
+    def _files(self) -> List[str]:
+        """当前日志文件及已存在的备份，从新到旧"""
+        files = [self.log_file]
+        files += [f"{self.log_file}.{i}" for i in range(1, self.backup_count + 1)]
+        return [path for path in files if os.path.exists(path)]
+    
+    def _tail_file(self, path: str, lines: int) -> List[bytes]:
+        """
+        从单个文件末尾反向读取最多lines行
+        
+        Returns:
+            按时间顺序排列的行（不含换行符）
+        """
+        with open(path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            buffer = b''
+            # 多读到一个换行符，保证丢弃开头可能被截断的一段后仍有足够的完整行
+            while position > 0 and buffer.count(b'\n') <= lines:
+                size = min(self.BLOCK_SIZE, position)
+                position -= size
+                f.seek(position)
+                buffer = f.read(size) + buffer
+        
+        if buffer.endswith(b'\n'):
+            buffer = buffer[:-1]
+        if not buffer and position == 0:
+            return []
+        
+        parts = buffer.split(b'\n')
+        if position > 0:
+            # 第一段可能是被截断的行
+            parts = parts[1:]
+        return parts[-lines:] if lines > 0 else []
+    
+    def tail(self, lines: int = 100) -> List[str]:
+        """
+        读取最后lines行，当前文件行数不足时继续读取备份文件
+        
+        Args:
+            lines: 需要的行数
+        
+        Returns:
+            按时间顺序排列的日志行（已去除行尾空白）
+        """
+        collected: List[bytes] = []
+        for path in self._files():
+            needed = lines - len(collected)
+            if needed <= 0:
+                break
+            try:
+                collected = self._tail_file(path, needed) + collected
+            except OSError:
+                continue
+        return [line.decode(self.encoding, errors='replace').rstrip() for line in collected]
+    
+    def query(self, since: Optional[float] = None, level: Optional[int] = None,
+              limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        按时间与级别查询JSON行格式的日志
+        
+        有索引的文件只读取索引指出的字节范围；没有索引的文件（例如开启JSON格式之前轮转的备份）整体扫描
+        
+        Args:
+            since: 只返回此Unix时间戳之后的记录
+            level: 只返回不低于此级别的记录（logging.ERROR等）
+            limit: 最多返回的记录数，超出时保留最新的
+        
+        Returns:
+            按时间顺序排列的记录字典
+        """
+        collected: List[Dict[str, Any]] = []
+        for path in self._files():
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            entries = load_index(index_path(path))
+            ranges = index_ranges(entries, size, since, level) if entries else [(0, size)]
+            
+            matched: List[Dict[str, Any]] = []
+            try:
+                with open(path, 'rb') as f:
+                    for start, end in ranges:
+                        f.seek(start)
+                        data = f.readline() if end is None else f.read(end - start)
+                        matched.extend(self._match(data, since, level))
+            except OSError:
+                continue
+            collected = matched + collected
+            if len(collected) >= limit:
+                break
+            # 本文件第二个时间桶已不晚于since时，第一条记录早于since，更早的备份不必再读
+            if since is not None and any(bucket != entries[0][0] and bucket <= since for bucket, _, _ in entries):
+                break
+        return collected[-limit:] if limit > 0 else []
+    
+    def _match(self, data: bytes, since: Optional[float], level: Optional[int]) -> List[Dict[str, Any]]:
+        """解析一段JSON行并按时间与级别过滤，无法解析的行（文本格式、被截断的行）跳过"""
+        records = []
+        for line in data.split(b'\n'):
+            if not line.startswith(b'{'):
+                continue
+            try:
+                record = json.loads(line.decode(self.encoding, errors='replace'))
+            except ValueError:
+                continue
+            if not isinstance(record, dict):
+                continue
+            if since is not None and record.get('ts', 0) < since:
+                continue
+            if level is not None:
+                levelno = logging.getLevelName(record.get('level', ''))
+                if not isinstance(levelno, int) or levelno < level:
+                    continue
+            records.append(record)
+        return records
+    
+    def count_lines(self) -> int:
+        """
+        统计当前日志文件的行数
+        
+        文件只增长时只扫描新增部分；文件被轮转（inode变化）或截断时重新统计
+        """
+        try:
+            stat = os.stat(self.log_file)
+        except OSError:
+            self._count_state = None
+            return 0
+        
+        with self._lock:
+            state = self._count_state
+            if state is None or state[0] != stat.st_ino or stat.st_size < state[1]:
+                state = (stat.st_ino, 0, 0, True)
+            
+            inode, offset, newlines, ends_with_newline = state
+            if stat.st_size > offset:
+                with open(self.log_file, 'rb') as f:
+                    f.seek(offset)
+                    while True:
+                        block = f.read(self.BLOCK_SIZE)
+                        if not block:
+                            break
+                        newlines += block.count(b'\n')
+                        offset += len(block)
+                        ends_with_newline = block.endswith(b'\n')
+            
+            self._count_state = (inode, offset, newlines, ends_with_newline)
+            # 与readlines()一致：末尾没有换行的最后一行也算一行
+            return newlines + (0 if ends_with_newline or offset == 0 else 1)
@@ -3,17 +3,156 @@
 提供统一的日志配置和管理功能
 """
 
+import atexit
+import json
 import logging
 import logging.handlers
 import os
+import queue
 import sys
+import time
 from pathlib import Path
-from typing import Optional
+from typing import Dict, List, Optional, Set
+
+from log_reader import EXACT_INDEX_LEVEL, index_path
+from metrics import REGISTRY
+
+
+LOG_RECORDS_DROPPED = REGISTRY.counter(
+    'henu_log_records_dropped_total', '异步日志队列已满时丢弃的日志记录数'
+)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    只把日志记录放入队列的处理器
+    
+    标准QueueHandler在调用线程上格式化消息和异常堆栈；这里原样入队，
+    时间格式化、堆栈格式化与写文件都由后台线程完成。队列已满时丢弃新记录而不是阻塞调用方
+    """
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+    
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            LOG_RECORDS_DROPPED.inc()
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    JSON行格式：每条记录一行JSON对象
+    
+    固定字段为 ts、time、level、logger、msg、src，通过 extra 传入的结构化字段
+    （event、step、latency、account 等）原样输出，异常堆栈放在 exc 字段
+    """
+    
+    STRUCTURED_FIELDS = (
+        'event', 'step', 'latency', 'account', 'outcome', 'attempt', 'connected', 'steps', 'binding'
+    )
+    
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+            'src': f"{record.filename}:{record.lineno}"
+        }
+        for field in self.STRUCTURED_FIELDS:
+            value = record.__dict__.get(field)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        if record.stack_info:
+            entry['stack'] = self.formatStack(record.stack_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class IndexedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """
+    带时间/级别索引的轮转文件处理器
+    
+    每个时间桶（按写出时间划分）内每个级别第一次写出记录时，在 .idx 文件追加一行
+    "时间桶起始时间 级别数值 字节偏移"，WARNING及以上的记录每条都追加一行；
+    LogTailReader.query() 据此只读取相关的字节范围。索引随日志文件一起轮转
+    """
+    
+    def __init__(self, filename: str, maxBytes: int = 0, backupCount: int = 0,
+                 encoding: Optional[str] = None, bucket_seconds: int = 60):
+        super().__init__(filename, maxBytes=maxBytes, backupCount=backupCount, encoding=encoding)
+        self.bucket_seconds = max(1, int(bucket_seconds))
+        self.index_file = index_path(self.baseFilename)
+        self._bucket: Optional[int] = None
+        self._levels: Set[int] = set()
+        if os.path.getsize(self.baseFilename) == 0:
+            # 日志文件是新建的或已被清空，旧索引的偏移已失效
+            self._remove(self.index_file)
+    
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    
+    def emit(self, record: logging.LogRecord) -> None:
+        try:
+            if self.shouldRollover(record):
+                self.doRollover()
+            if self.stream is None:
+                self.stream = self._open()
+            self._index(record.levelno)
+            logging.FileHandler.emit(self, record)
+        except Exception:
+            self.handleError(record)
+    
+    def _index(self, levelno: int) -> None:
+        """记录即将写出的位置（低于WARNING的级别每个时间桶只记一次）"""
+        bucket = int(time.time() // self.bucket_seconds) * self.bucket_seconds
+        if bucket != self._bucket:
+            self._bucket = bucket
+            self._levels = set()
+        if levelno in self._levels and levelno < EXACT_INDEX_LEVEL:
+            return
+        self._levels.add(levelno)
+        offset = self.stream.tell()
+        with open(self.index_file, 'a', encoding='ascii') as f:
+            f.write(f"{bucket} {levelno} {offset}\n")
+    
+    def doRollover(self) -> None:
+        super().doRollover()
+        # 与日志文件相同的方式轮转索引：.idx -> .1.idx -> .2.idx ...
+        for i in range(self.backupCount - 1, 0, -1):
+            source = index_path(f"{self.baseFilename}.{i}")
+            if os.path.exists(source):
+                os.replace(source, index_path(f"{self.baseFilename}.{i + 1}"))
+        if self.backupCount > 0 and os.path.exists(self.index_file):
+            os.replace(self.index_file, index_path(f"{self.baseFilename}.1"))
+        else:
+            self._remove(self.index_file)
+        self._bucket = None
+        self._levels = set()
 
 
 class LoggerSetup:
     """日志系统配置器"""
     
+    # 日志文件使用的格式
+    DETAILED_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+    DETAILED_DATE_FORMAT = '%Y-%m-%d %H:%M:%S'
+    
+    # 异步模式下各日志器的后台写出线程
+    _listeners: Dict[str, logging.handlers.QueueListener] = {}
+    _atexit_registered = False
+    
     @staticmethod
     def setup_logger(
         name: str = 'henu_login',
@@ -21,7 +160,11 @@ class LoggerSetup:
         log_file: Optional[str] = None,
         max_size_mb: int = 10,
         backup_count: int = 5,
-        console_output: bool = True
+        console_output: bool = True,
+        async_queue: bool = False,
+        queue_size: int = 10000,
+        log_format: str = 'text',
+        index_bucket: int = 60
     ) -> logging.Logger:
         """
         设置日志系统
@@ -33,6 +176,10 @@ class LoggerSetup:
             max_size_mb: 日志文件最大大小（MB）
             backup_count: 保留的日志文件备份数量
             console_output: 是否输出到控制台
+            async_queue: 是否经队列由后台线程写日志（写文件与轮转不阻塞登录流程）
+            queue_size: 异步队列容量，写出跟不上时丢弃超出的记录
+            log_format: 日志文件格式，text为文本行，json为JSON行（同时写出时间/级别索引，支持按条件查询）
+            index_bucket: JSON格式索引的时间桶长度（秒）
             
         Returns:
             配置好的logger对象
@@ -40,13 +187,15 @@ class LoggerSetup:
         logger = logging.getLogger(name)
         logger.setLevel(getattr(logging, level.upper(), logging.INFO))
         
-        # 清除已存在的处理器
+        # 清除已存在的处理器（重新配置时先写完并停止旧的后台线程）
+        LoggerSetup.stop_listener(name)
         logger.handlers.clear()
+        handlers: List[logging.Handler] = []
         
         # 创建格式化器
         detailed_formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s',
-            datefmt='%Y-%m-%d %H:%M:%S'
+            LoggerSetup.DETAILED_FORMAT,
+            datefmt=LoggerSetup.DETAILED_DATE_FORMAT
         )
         
         simple_formatter = logging.Formatter(
@@ -62,15 +211,25 @@ class LoggerSetup:
                 if log_dir:
                     os.makedirs(log_dir, exist_ok=True)
                 
-                file_handler = logging.handlers.RotatingFileHandler(
-                    log_file,
-                    maxBytes=max_size_mb * 1024 * 1024,
-                    backupCount=backup_count,
-                    encoding='utf-8'
-                )
+                if log_format == 'json':
+                    file_handler = IndexedRotatingFileHandler(
+                        log_file,
+                        maxBytes=max_size_mb * 1024 * 1024,
+                        backupCount=backup_count,
+                        encoding='utf-8',
+                        bucket_seconds=index_bucket
+                    )
+                    file_handler.setFormatter(JsonLinesFormatter(datefmt=LoggerSetup.DETAILED_DATE_FORMAT))
+                else:
+                    file_handler = logging.handlers.RotatingFileHandler(
+                        log_file,
+                        maxBytes=max_size_mb * 1024 * 1024,
+                        backupCount=backup_count,
+                        encoding='utf-8'
+                    )
+                    file_handler.setFormatter(detailed_formatter)
                 file_handler.setLevel(logging.DEBUG)
-                file_handler.setFormatter(detailed_formatter)
-                logger.addHandler(file_handler)
+                handlers.append(file_handler)
             except Exception as e:
                 print(f"警告: 无法创建日志文件 {log_file}: {e}", file=sys.stderr)
         
@@ -79,10 +238,69 @@ class LoggerSetup:
             console_handler = logging.StreamHandler(sys.stdout)
             console_handler.setLevel(logging.INFO)
             console_handler.setFormatter(simple_formatter)
-            logger.addHandler(console_handler)
+            handlers.append(console_handler)
+        
+        if async_queue and handlers:
+            record_queue: 'queue.Queue[logging.LogRecord]' = queue.Queue(maxsize=max(1, queue_size))
+            listener = logging.handlers.QueueListener(record_queue, *handlers, respect_handler_level=True)
+            listener.start()
+            LoggerSetup._listeners[name] = listener
+            if not LoggerSetup._atexit_registered:
+                # 先于logging模块自身的清理执行，保证队列中的记录写完
+                atexit.register(LoggerSetup.shutdown)
+                LoggerSetup._atexit_registered = True
+            logger.addHandler(LazyQueueHandler(record_queue))
+        else:
+            for handler in handlers:
+                logger.addHandler(handler)
         
         return logger
     
+    @staticmethod
+    def flush(timeout: float = 2.0) -> bool:
+        """
+        等待异步队列中已有的记录写出
+        
+        只轮询未完成计数而不获取队列锁；守护进程退出前由主循环调用（不要在信号处理器中写日志）
+        
+        Args:
+            timeout: 最长等待时间（秒）
+        
+        Returns:
+            是否在超时前全部写出
+        """
+        deadline = time.monotonic() + timeout
+        for listener in list(LoggerSetup._listeners.values()):
+            while listener.queue.unfinished_tasks:
+                if time.monotonic() >= deadline:
+                    return False
+                time.sleep(0.005)
+            for handler in listener.handlers:
+                handler.flush()
+        return True
+    
+    @staticmethod
+    def stop_listener(name: str) -> None:
+        """
+        写完队列中的记录并停止指定日志器的后台线程
+        
+        之后的记录改为由原处理器同步写出，退出过程中的日志不会丢失
+        """
+        listener = LoggerSetup._listeners.pop(name, None)
+        if listener is None:
+            return
+        listener.stop()
+        logger = logging.getLogger(name)
+        logger.handlers = [h for h in logger.handlers if not isinstance(h, LazyQueueHandler)]
+        for handler in listener.handlers:
+            logger.addHandler(handler)
+    
+    @staticmethod
+    def shutdown() -> None:
+        """停止所有后台写出线程（进程退出时自动调用）"""
+        for name in list(LoggerSetup._listeners):
+            LoggerSetup.stop_listener(name)
+    
     @staticmethod
     def get_logger(name: str = 'henu_login') -> logging.Logger:
         """获取已配置的logger"""
@@ -0,0 +1,254 @@
+"""
+运行指标
+以计数器、仪表和直方图记录登录各步骤与网络探测的耗时和结果，
+按Prometheus文本格式导出，无需额外依赖
+"""
+
+import abc
+import bisect
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# 适合网络请求的默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prometheus文本格式的Content-Type
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    """转义标签值"""
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    """格式化样本值"""
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric(abc.ABC):
+    """指标基类，按标签值分别保存样本"""
+    
+    TYPE = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+    
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _label_text(self, key: Tuple[str, ...], extra: Optional[Tuple[str, str]] = None) -> str:
+        pairs = list(zip(self.labelnames, key))
+        if extra:
+            pairs.append(extra)
+        if not pairs:
+            return ''
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+    
+    @abc.abstractmethod
+    def _samples(self) -> Iterable[str]:
+        """各标签值的样本行"""
+    
+    def render(self) -> List[str]:
+        """导出为Prometheus文本格式的行"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    """只增不减的计数器"""
+    
+    TYPE = 'counter'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        """增加计数"""
+        if amount < 0:
+            raise ValueError("计数器只能增加")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def get(self, **labels: str) -> float:
+        """读取当前值"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+    
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{self._label_text(key)} {_format_value(value)}"
+
+
+class Gauge(_Metric):
+    """可任意设置的仪表"""
+    
+    TYPE = 'gauge'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+    
+    def set(self, value: float, **labels: str) -> None:
+        """设置当前值"""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+    
+    def get(self, **labels: str) -> float:
+        """读取当前值"""
+        with self._lock:
+            return self._values.get(self._key(labels), 0.0)
+    
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            yield f"{self.name}{self._label_text(key)} {_format_value(value)}"
+
+
+class Histogram(_Metric):
+    """耗时直方图，记录分桶计数、总和与次数"""
+    
+    TYPE = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if not math.isinf(b)))
+        # 每个标签组合: [各分桶（非累积）计数..., +Inf分桶计数, 总和]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+    
+    def observe(self, value: float, **labels: str) -> None:
+        """记录一个观测值"""
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+    
+    def get_count(self, **labels: str) -> int:
+        """某个标签组合的观测次数"""
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return int(sum(state[:-1])) if state else 0
+    
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets + (math.inf,), state[:-1]):
+                cumulative += count
+                yield f"{self.name}_bucket{self._label_text(key, ('le', _format_value(bound)))} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{self._label_text(key)} {_format_value(state[-1])}"
+            yield f"{self.name}_count{self._label_text(key)} {_format_value(cumulative)}"
+
+
+class MetricsRegistry:
+    """指标注册表"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def _register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标 {metric.name} 已以不同类型或标签注册")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """获取或创建计数器"""
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """获取或创建仪表"""
+        return self._register(Gauge(name, documentation, labelnames))
+    
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        """获取或创建直方图"""
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def render(self) -> str:
+        """导出全部指标（Prometheus文本格式）"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# 进程内默认注册表与内置指标
+REGISTRY = MetricsRegistry()
+
+LOGIN_STEP_SECONDS = REGISTRY.histogram(
+    'henu_login_step_duration_seconds', '登录各步骤耗时（秒）', ('step',)
+)
+LOGINS_TOTAL = REGISTRY.counter(
+    'henu_logins_total', '登录次数（按结果）', ('result',)
+)
+LAST_LOGIN_TIMESTAMP = REGISTRY.gauge(
+    'henu_last_login_success_timestamp_seconds', '最近一次登录成功的Unix时间戳'
+)
+PROBE_SECONDS = REGISTRY.histogram(
+    'henu_probe_duration_seconds', '网络探测耗时（秒）', ('tier', 'kind')
+)
+PROBES_TOTAL = REGISTRY.counter(
+    'henu_probes_total', '网络探测次数（按结果）', ('tier', 'kind', 'result')
+)
+NETWORK_CONNECTED = REGISTRY.gauge(
+    'henu_network_connected', '最近一次检查的网络状态（1在线，0需要登录）'
+)
+
+
+def record_login(step_timings: Dict[str, float], result: str) -> None:
+    """
+    记录一次登录的各步骤耗时与结果
+    
+    Args:
+        step_timings: HENUAuthenticator记录的步骤耗时（秒）
+        result: success / failure / error
+    """
+    for step, seconds in step_timings.items():
+        LOGIN_STEP_SECONDS.observe(seconds, step=step)
+    LOGINS_TOTAL.inc(result=result)
+
+
+def record_probe(tier: str, kind: str, seconds: float, result: str) -> None:
+    """
+    记录一次网络探测
+    
+    Args:
+        tier: 探测层级（tcp / http）
+        kind: 探测方式（TCP层为socket，HTTP层为探测类型）
+        seconds: 耗时（秒）
+        result: ok / fail / error
+    """
+    PROBE_SECONDS.observe(seconds, tier=tier, kind=kind)
+    PROBES_TOTAL.inc(tier=tier, kind=kind, result=result)
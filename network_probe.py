@@ -0,0 +1,441 @@
+"""
+网络探测引擎
+提供多种低开销的外网探测方式，每种探测方式声明自己期望的响应
+"""
+
+import abc
+import errno
+import select
+import socket
+import sys
+import time
+import urllib.parse
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Type, Union
+
+from portal_discovery import find_portal_url
+from response_classifier import KeywordScanner
+
+if TYPE_CHECKING:
+    import requests
+
+
+class ProbeResult:
+    """单次探测结果"""
+    
+    __slots__ = ('ok', 'status_code', 'latency', 'bytes_read', 'detail', 'portal_url')
+    
+    def __init__(self, ok: bool, status_code: Optional[int], latency: float,
+                 bytes_read: int, detail: str = '', portal_url: Optional[str] = None):
+        self.ok = ok
+        self.status_code = status_code
+        self.latency = latency
+        self.bytes_read = bytes_read
+        self.detail = detail
+        self.portal_url = portal_url
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典，便于日志和API输出"""
+        return {
+            'ok': self.ok,
+            'status_code': self.status_code,
+            'latency': round(self.latency, 4),
+            'bytes_read': self.bytes_read,
+            'detail': self.detail,
+            'portal_url': self.portal_url
+        }
+
+
+class BodyReader:
+    """逐块读取响应体，达到字节上限时停止"""
+    
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self._body = bytearray()
+    
+    def feed(self, chunk: bytes) -> bool:
+        """读入一块数据，返回是否已读够（调用方应停止读取）"""
+        self._body += chunk
+        return self.max_bytes is not None and len(self._body) >= self.max_bytes
+    
+    def body(self) -> bytes:
+        body = bytes(self._body)
+        return body if self.max_bytes is None else body[:self.max_bytes]
+
+
+class KeywordBodyReader(BodyReader):
+    """逐块读取响应体，找到关键字或达到字节上限时停止；每块只检查新到达的数据"""
+    
+    def __init__(self, keywords: Iterable[bytes], max_bytes: int):
+        super().__init__(max_bytes)
+        self.scanner = KeywordScanner(keywords)
+    
+    def feed(self, chunk: bytes) -> bool:
+        found = self.scanner.feed(chunk)
+        full = super().feed(chunk)
+        return found or full
+
+
+class BaseProbe(abc.ABC):
+    """
+    探测方式基类
+    
+    子类通过类属性声明请求方式，并实现 evaluate() 判断响应是否符合预期。
+    evaluate() 与传输无关，同步和异步调用方都可以复用。
+    """
+    
+    name = ''
+    method = 'GET'
+    stream = False
+    allow_redirects = False
+    default_url = "http://www.baidu.com"
+    expected = ''
+    
+    def __init__(self, url: Optional[str] = None, max_bytes: int = 4096,
+                 keywords: Optional[Iterable[str]] = None):
+        """
+        初始化探测方式
+        
+        Args:
+            url: 探测目标URL，为None时使用该探测方式的默认URL
+            max_bytes: 最多读取的响应体字节数（仅流式探测使用）
+            keywords: 响应体中应出现的关键字，出现任意一个即视为真实外网页面
+        """
+        self.url = url or self.default_url
+        self.max_bytes = max_bytes
+        self.keywords = tuple(k.lower().encode('utf-8') for k in (keywords or ('baidu', '百度', '搜索')))
+    
+    @abc.abstractmethod
+    def evaluate(self, status_code: int, headers: Mapping[str, str], body: bytes) -> Tuple[bool, str]:
+        """
+        判断响应是否符合预期
+        
+        Returns:
+            (是否符合预期, 说明)
+        """
+    
+    def body_reader(self, status_code: int) -> Optional[BodyReader]:
+        """
+        按状态码决定如何读取响应体，默认不读取
+    
+        同步与异步传输都用返回的读取器逐块读取，读取器表示已读够时立即停止
+        
+        Returns:
+            读取器，为None时不读取响应体
+        """
+        return None
+    
+    def _read_body(self, status_code: int, chunks: Iterable[bytes]) -> bytes:
+        """从响应体分块中读取所需内容"""
+        reader = self.body_reader(status_code)
+        if reader is None:
+            return b''
+        for chunk in chunks:
+            if reader.feed(chunk):
+                break
+        return reader.body()
+    
+    @property
+    def host(self) -> str:
+        """探测目标的主机名"""
+        return urllib.parse.urlsplit(self.url).hostname or ''
+    
+    def _target(self, address: Optional[str]) -> Tuple[str, Dict[str, str]]:
+        """
+        请求URL与附加请求头
+        
+        给出已解析的地址时直接连接该地址、Host头保持原主机名，省去DNS解析。
+        只用于不跟随重定向的HTTP探测（HTTPS需要按主机名校验证书）
+        """
+        parts = urllib.parse.urlsplit(self.url)
+        if not address or parts.scheme != 'http' or self.allow_redirects:
+            return self.url, {}
+        netloc = (f"[{address}]" if ':' in address else address) + (f":{parts.port}" if parts.port else '')
+        return urllib.parse.urlunsplit(parts._replace(netloc=netloc)), {'Host': parts.netloc}
+    
+    def run(self, session: 'requests.Session', timeout: float, address: Optional[str] = None) -> ProbeResult:
+        """
+        执行一次探测
+        
+        Args:
+            session: 请求会话
+            timeout: 超时时间（秒）
+            address: 探测目标已解析的IP地址，为None时由requests解析主机名
+        
+        Raises:
+            requests.exceptions.RequestException: 网络请求失败
+        """
+        url, headers = self._target(address)
+        start = time.perf_counter()
+        response = session.request(
+            self.method, url, timeout=timeout, headers=headers,
+            allow_redirects=self.allow_redirects, stream=self.stream
+        )
+        try:
+            body = self._read_body(response.status_code, response.iter_content(chunk_size=1024))
+        finally:
+            response.close()
+        
+        return self._result(response.status_code, response.headers, body, start)
+    
+    @property
+    def supports_direct(self) -> bool:
+        """能否不经过requests直接探测（需要跟随重定向的探测不支持）"""
+        return not self.allow_redirects
+    
+    def run_direct(self, timeout: float, source_address: Optional[str] = None,
+                   address: Optional[str] = None) -> ProbeResult:
+        """
+        用标准库http.client执行一次探测，不需要导入requests，也不保留连接
+        
+        单次运行的进程只探测一次，省去导入requests与建立连接池的开销
+        
+        Args:
+            timeout: 超时时间（秒）
+            source_address: 连接使用的本机源地址，为None时由路由表决定
+            address: 探测目标已解析的IP地址，为None时由http.client解析主机名
+        
+        Raises:
+            OSError, http.client.HTTPException: 网络请求失败
+        """
+        import http.client
+        
+        url, headers = self._target(address)
+        parts = urllib.parse.urlsplit(url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == 'https' else http.client.HTTPConnection
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        
+        start = time.perf_counter()
+        connection = connection_class(parts.hostname, parts.port, timeout=timeout,
+                                      source_address=(source_address, 0) if source_address else None)
+        try:
+            connection.request(self.method, path, headers={'Connection': 'close', **headers})
+            response = connection.getresponse()
+            body = self._read_body(response.status, iter(lambda: response.read(1024), b''))
+        finally:
+            connection.close()
+        
+        return self._result(response.status, response.headers, body, start)
+    
+    def _result(self, status_code: int, headers: Mapping[str, str], body: bytes, start: float) -> ProbeResult:
+        ok, detail = self.evaluate(status_code, headers, body)
+        # 被门户劫持时顺便记下登录URL，供门户参数发现使用
+        portal_url = None if ok else find_portal_url(headers, body)
+        return ProbeResult(ok, status_code, time.perf_counter() - start, len(body), detail, portal_url)
+    
+    def _match_keywords(self, body: bytes) -> bool:
+        """响应体中是否包含任意关键字"""
+        body_lower = body.lower()
+        return any(keyword in body_lower for keyword in self.keywords)
+
+
+class FullPageProbe(BaseProbe):
+    """完整下载页面并检查关键字（兼容旧版行为，开销最大）"""
+    
+    name = 'get'
+    allow_redirects = True
+    expected = '状态码200，页面包含关键字'
+    
+    def body_reader(self, status_code: int) -> Optional[BodyReader]:
+        return BodyReader()
+    
+    def evaluate(self, status_code: int, headers: Mapping[str, str], body: bytes) -> Tuple[bool, str]:
+        if status_code != 200:
+            return False, f"返回状态码 {status_code}"
+        if not self._match_keywords(body):
+            return False, "返回200但内容不符合预期，可能被重定向到登录页"
+        return True, "页面内容符合预期"
+
+
+class StreamProbe(BaseProbe):
+    """流式读取响应体的前N个字节，找到关键字即停止"""
+    
+    name = 'stream'
+    stream = True
+    expected = '状态码200，前N字节内包含关键字'
+    
+    def body_reader(self, status_code: int) -> Optional[BodyReader]:
+        if status_code != 200:
+            return None
+        return KeywordBodyReader(self.keywords, self.max_bytes)
+    
+    def evaluate(self, status_code: int, headers: Mapping[str, str], body: bytes) -> Tuple[bool, str]:
+        if status_code != 200:
+            return False, f"返回状态码 {status_code}"
+        if not self._match_keywords(body):
+            return False, f"前 {len(body)} 字节内未找到预期关键字，可能被重定向到登录页"
+        return True, f"前 {len(body)} 字节内找到预期关键字"
+
+
+class HeadProbe(BaseProbe):
+    """HEAD请求，只检查状态码且不允许重定向"""
+    
+    name = 'head'
+    method = 'HEAD'
+    expected = '状态码200，且未被重定向'
+    
+    def evaluate(self, status_code: int, headers: Mapping[str, str], body: bytes) -> Tuple[bool, str]:
+        if 300 <= status_code < 400:
+            return False, f"被重定向到 {headers.get('Location', '未知地址')}，可能需要登录"
+        if status_code != 200:
+            return False, f"返回状态码 {status_code}"
+        return True, "HEAD请求返回200"
+
+
+class Generate204Probe(BaseProbe):
+    """访问 generate_204 端点，外网正常时返回空响应的204"""
+    
+    name = 'generate_204'
+    stream = True
+    default_url = "http://connect.rom.miui.com/generate_204"
+    expected = '状态码204，响应体为空'
+    
+    def evaluate(self, status_code: int, headers: Mapping[str, str], body: bytes) -> Tuple[bool, str]:
+        if status_code != 204:
+            return False, f"返回状态码 {status_code}（期望204），可能被认证门户劫持"
+        if headers.get('Content-Length', '0') not in ('', '0'):
+            return False, "返回204但带有响应体，可能被认证门户劫持"
+        return True, "返回204"
+
+
+PROBE_TYPES: Dict[str, Type[BaseProbe]] = {
+    probe.name: probe for probe in (FullPageProbe, StreamProbe, HeadProbe, Generate204Probe)
+}
+
+
+def create_probe(probe_type: str = 'stream', url: Optional[str] = None, max_bytes: int = 4096,
+                 keywords: Optional[Iterable[str]] = None) -> BaseProbe:
+    """
+    根据名称创建探测方式
+    
+    Args:
+        probe_type: 探测方式（get/stream/head/generate_204）
+        url: 探测目标URL
+        max_bytes: 流式探测最多读取的字节数
+        keywords: 期望出现的关键字
+    
+    Raises:
+        ValueError: 未知的探测方式
+    """
+    probe_class = PROBE_TYPES.get(probe_type)
+    if probe_class is None:
+        raise ValueError(f"未知的探测方式: {probe_type}，可选: {', '.join(PROBE_TYPES)}")
+    return probe_class(url=url, max_bytes=max_bytes, keywords=keywords)
+
+
+def create_target_probe(target: Union[str, Mapping[str, Any]], probe_type: str = 'stream',
+                        max_bytes: int = 4096) -> BaseProbe:
+    """
+    根据 network.probe_urls 中的一项创建探测
+    
+    每个目标的预期不同（默认关键字只适用于百度）：URL字符串沿用全局的探测方式与默认关键字，
+    对象形式 {"url": ..., "type": ..., "keywords": [...]} 为该目标单独指定探测方式与关键字
+    
+    Args:
+        target: URL字符串或目标对象
+        probe_type: 目标未指定type时使用的探测方式
+        max_bytes: 流式探测最多读取的字节数
+    
+    Raises:
+        ValueError: 未知的探测方式
+    """
+    if isinstance(target, str):
+        return create_probe(probe_type, url=target, max_bytes=max_bytes)
+    return create_probe(
+        target.get('type') or probe_type,
+        url=target.get('url') or None,
+        max_bytes=target.get('max_bytes', max_bytes),
+        keywords=target.get('keywords') or None
+    )
+
+
+def probe_error_kind(error: BaseException) -> Optional[str]:
+    """
+    对探测异常分类，requests与http.client两种传输的异常统一处理（不会为此导入requests）
+    
+    Returns:
+        timeout、connection、request 之一，不是网络请求异常时返回None
+    """
+    requests = sys.modules.get('requests')
+    if requests is not None and isinstance(error, requests.exceptions.RequestException):
+        if isinstance(error, requests.exceptions.Timeout):
+            return 'timeout'
+        if isinstance(error, requests.exceptions.ConnectionError):
+            return 'connection'
+        return 'request'
+    if isinstance(error, socket.timeout):
+        return 'timeout'
+    if isinstance(error, OSError):
+        return 'connection'
+    http_client = sys.modules.get('http.client')
+    if http_client is not None and isinstance(error, http_client.HTTPException):
+        return 'request'
+    return None
+
+
+def parse_host_port(target: str, default_port: int = 80) -> Tuple[str, int]:
+    """解析 "host:port" 形式的探测目标"""
+    host, sep, port = target.rpartition(':')
+    if not sep or not port.isdigit() or host.endswith(':'):
+        # 无端口或裸IPv6地址
+        return target.strip('[]'), default_port
+    return host.strip('[]'), int(port)
+
+
+def tcp_reachability(addresses: Sequence[Tuple[str, int]], timeout: float,
+                     source_address: Optional[str] = None) -> List[Optional[float]]:
+    """
+    对一组已解析的地址同时发起非阻塞TCP连接
+    
+    所有连接在同一个select循环中等待，总耗时不超过timeout，
+    局域网内的门户主机通常在亚毫秒内完成握手。
+    
+    Args:
+        addresses: (IP, 端口) 列表，必须是IP地址，不做DNS解析
+        timeout: 等待连接建立的最长时间（秒）
+        source_address: 连接使用的本机源地址，为None时由路由表决定
+    
+    Returns:
+        与addresses顺序一致的列表，元素为连接耗时（秒），无法连接时为None
+    """
+    results: List[Optional[float]] = [None] * len(addresses)
+    pending: Dict[socket.socket, int] = {}
+    start = time.perf_counter()
+    
+    for index, (ip, port) in enumerate(addresses):
+        family = socket.AF_INET6 if ':' in ip else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        if source_address:
+            try:
+                sock.bind((source_address, 0))
+            except OSError:
+                # 源地址暂不可用（网卡掉线、地址族不同），该目标视为不可达
+                sock.close()
+                continue
+        code = sock.connect_ex((ip, port))
+        if code == 0:
+            results[index] = time.perf_counter() - start
+            sock.close()
+        elif code in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EALREADY, getattr(errno, 'WSAEWOULDBLOCK', -1)):
+            pending[sock] = index
+        else:
+            sock.close()
+    
+    try:
+        while pending:
+            remaining = timeout - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            _, writable, errored = select.select([], list(pending), list(pending), remaining)
+            if not writable and not errored:
+                break
+            for sock in set(writable) | set(errored):
+                index = pending.pop(sock)
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    results[index] = time.perf_counter() - start
+                sock.close()
+    finally:
+        for sock in pending:
+            sock.close()
+    
+    return results
@@ -0,0 +1,161 @@
+"""
+网络状态缓存
+由后台探测发布最近一次网络检查结果及时间戳，状态查询直接读取缓存；
+缓存过期时多个并发调用方共享同一次进行中的探测，不会各自访问外网
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from metrics import REGISTRY
+
+
+STATUS_REQUESTS = REGISTRY.counter(
+    'henu_status_requests_total', '网络状态查询次数（按来源：cache/stale/coalesced/probe）', ('source',)
+)
+
+
+class _Flight:
+    """一次进行中的探测，等待方从这里取得结果"""
+    
+    __slots__ = ('done', 'snapshot')
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.snapshot: Optional[Dict[str, Any]] = None
+
+
+class NetworkStatusService:
+    """带TTL与请求合并的网络状态服务"""
+    
+    def __init__(self, network_checker: Any, ttl: float = 10.0):
+        """
+        初始化状态服务
+        
+        Args:
+            network_checker: NetworkChecker实例，探测只通过本服务发起
+            ttl: 缓存有效期（秒），过期后下一次查询触发后台刷新
+        """
+        self.network_checker = network_checker
+        self.ttl = max(0.0, float(ttl))
+        self.logger = logging.getLogger(__name__)
+        self._snapshot: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._inflight: Optional[_Flight] = None
+        # 每次发布新结果后调用，参数为对外快照
+        self.listeners: List[Callable[[Dict[str, Any]], None]] = []
+    
+    @classmethod
+    def from_config(cls, network_checker: Any, network_config: Dict[str, Any]) -> 'NetworkStatusService':
+        """根据配置文件的network部分创建状态服务"""
+        return cls(network_checker, ttl=network_config.get('status_ttl', 10))
+    
+    def _is_fresh(self, snapshot: Optional[Dict[str, Any]], max_age: float) -> bool:
+        return snapshot is not None and time.monotonic() - snapshot['_monotonic'] < max_age
+    
+    def _public(self, snapshot: Dict[str, Any], stale: bool = False) -> Dict[str, Any]:
+        """返回给调用方的快照副本（不含内部字段）"""
+        result = {key: value for key, value in snapshot.items() if not key.startswith('_')}
+        result['age'] = round(time.monotonic() - snapshot['_monotonic'], 3)
+        result['stale'] = stale
+        return result
+    
+    def publish(self, connected: bool) -> Dict[str, Any]:
+        """
+        发布一次检查结果（自动登录线程在自行检查或登录后调用）
+        
+        Args:
+            connected: 网络是否正常
+        
+        Returns:
+            发布的快照
+        """
+        checker = self.network_checker
+        snapshot = {
+            'connected': connected,
+            'checked_at': time.time(),
+            'probe_type': checker.probe.name,
+            'last_probe': checker.last_probe_result.to_dict() if checker.last_probe_result else None,
+            'socket': checker.last_socket_result,
+            'targets': checker.target_stats(),
+            'dns': checker.dns_cache.summary(),
+            '_monotonic': time.monotonic()
+        }
+        # 整体替换引用，读取方无需加锁
+        self._snapshot = snapshot
+        for listener in self.listeners:
+            try:
+                listener(self._public(snapshot))
+            except Exception as e:
+                self.logger.debug(f"状态监听器出错: {e}")
+        return snapshot
+    
+    def refresh(self) -> Dict[str, Any]:
+        """
+        立即探测并发布结果；已有探测进行中时等待并复用它的结果
+        
+        Returns:
+            最新快照
+        """
+        with self._lock:
+            flight = self._inflight
+            leader = flight is None
+            if leader:
+                flight = self._inflight = _Flight()
+        
+        if not leader:
+            STATUS_REQUESTS.inc(source='coalesced')
+            flight.done.wait()
+            return self._public(flight.snapshot)
+        
+        STATUS_REQUESTS.inc(source='probe')
+        try:
+            try:
+                connected = self.network_checker.check_internet_connection()
+            except Exception as e:
+                self.logger.error(f"网络状态探测失败: {e}", exc_info=True)
+                connected = False
+            flight.snapshot = self.publish(connected)
+            return self._public(flight.snapshot)
+        finally:
+            with self._lock:
+                self._inflight = None
+            flight.done.set()
+    
+    def invalidate(self) -> None:
+        """丢弃缓存（登录成功后调用），下一次查询重新探测"""
+        self._snapshot = None
+    
+    def _refresh_in_background(self) -> None:
+        """启动后台刷新（已有探测进行中时不重复启动）"""
+        if self._inflight is not None:
+            return
+        threading.Thread(target=self.refresh, name='henu-status-refresh', daemon=True).start()
+    
+    def get(self, max_age: Optional[float] = None) -> Dict[str, Any]:
+        """
+        获取网络状态
+        
+        缓存未过期时直接返回；已过期时返回旧结果并在后台刷新；
+        尚无任何结果时同步探测（并发调用方共享同一次探测）
+        
+        Args:
+            max_age: 可接受的最大缓存时间（秒），默认使用ttl
+        
+        Returns:
+            包含connected、checked_at、age、stale等字段的快照
+        """
+        max_age = self.ttl if max_age is None else max_age
+        snapshot = self._snapshot
+        if self._is_fresh(snapshot, max_age):
+            STATUS_REQUESTS.inc(source='cache')
+            return self._public(snapshot)
+        
+        if snapshot is not None:
+            STATUS_REQUESTS.inc(source='stale')
+            self._refresh_in_background()
+            return self._public(snapshot, stale=True)
+        
+        return self.refresh()
@@ -0,0 +1,222 @@
+"""
+认证门户参数自动发现
+从认证门户的重定向中提取登录URL（wlanuserip、wlanacname），按本机地址缓存，
+网络地址变化后自动失效，无需手动配置 network.login_url
+"""
+
+import html
+import logging
+import re
+import socket
+import threading
+import time
+import urllib.parse
+from functools import lru_cache
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from source_binding import mount_source_adapter
+
+
+# 门户重定向中带有 wlanuserip 参数的URL（Location头、meta refresh或JS跳转）
+PORTAL_URL_PATTERN = re.compile(rb'''https?://[^\s"'<>]+\?[^\s"'<>]*wlanuserip=[^\s"'<>]+''', re.IGNORECASE)
+
+
+@lru_cache(maxsize=64)
+def parse_portal_url(url: str) -> Tuple[Optional[str], Optional[str], str]:
+    """
+    解析门户登录URL（结果缓存，同一URL只解析一次）
+    
+    Returns:
+        (wlanuserip, wlanacname, 门户基础URL)
+    """
+    parsed_url = urllib.parse.urlparse(url)
+    query_params = urllib.parse.parse_qs(parsed_url.query)
+    wlanuserip = query_params.get('wlanuserip', [None])[0]
+    wlanacname = query_params.get('wlanacname', [None])[0]
+    base_url = f"{parsed_url.scheme}://{parsed_url.netloc}{parsed_url.path}"
+    return wlanuserip, wlanacname, base_url
+
+
+def find_portal_url(headers: Mapping[str, str], body: bytes = b'') -> Optional[str]:
+    """
+    从门户劫持响应中找出登录URL
+    
+    Args:
+        headers: 响应头，优先使用Location
+        body: 已读取的响应体（可以只是前几KB）
+    
+    Returns:
+        包含wlanuserip参数的登录URL，找不到时返回None
+    """
+    location = headers.get('Location')
+    if location and 'wlanuserip=' in location:
+        return location
+    
+    match = PORTAL_URL_PATTERN.search(body or b'')
+    if match:
+        return html.unescape(match.group(0).decode('utf-8', errors='ignore'))
+    return None
+
+
+class PortalDiscovery:
+    """认证门户登录URL发现与缓存"""
+    
+    def __init__(self, probe_url: str = "http://www.baidu.com", timeout: float = 5,
+                 portal_host: str = "172.29.35.36", max_entries: int = 8,
+                 source_address: Optional[str] = None):
+        """
+        初始化门户发现器
+        
+        Args:
+            probe_url: 主动发现时访问的URL，未登录时会被门户重定向
+            timeout: 主动发现的超时时间（秒）
+            portal_host: 认证门户地址，用于确定访问门户时使用的本机地址
+            max_entries: 最多缓存的本机地址数量
+            source_address: 绑定的本机源地址（多链路时每条链路一个发现器），为None时由路由表决定
+        """
+        self.probe_url = probe_url
+        self.timeout = timeout
+        self.portal_host = portal_host
+        self.max_entries = max_entries
+        self.source_address = source_address
+        self.logger = logging.getLogger(__name__)
+        self._cache: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+    
+    def local_ip(self) -> Optional[str]:
+        """
+        获取访问认证门户时使用的本机地址
+        
+        UDP套接字connect只查询路由表，不发送任何数据包；绑定了源地址时直接返回该地址
+        """
+        if self.source_address:
+            return self.source_address
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.connect((self.portal_host, 80))
+            return sock.getsockname()[0]
+        except OSError:
+            return None
+        finally:
+            sock.close()
+    
+    def remember(self, login_url: str, local_ip: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        缓存一个门户登录URL
+        
+        Args:
+            login_url: 从门户重定向中得到的登录URL
+            local_ip: 对应的本机地址，为None时自动获取
+        
+        Returns:
+            缓存的门户参数，URL缺少必要参数时返回None
+        """
+        wlanuserip, wlanacname, base_url = parse_portal_url(login_url)
+        if not wlanuserip or not wlanacname:
+            return None
+        
+        local_ip = local_ip or self.local_ip() or wlanuserip
+        entry = {
+            'login_url': login_url,
+            'wlanuserip': wlanuserip,
+            'wlanacname': wlanacname,
+            'portal_base_url': base_url,
+            'local_ip': local_ip,
+            'discovered_at': time.time()
+        }
+        
+        with self._lock:
+            if self._cache.get(local_ip, {}).get('login_url') != login_url:
+                self.logger.info(f"发现门户登录参数: wlanuserip={wlanuserip}, wlanacname={wlanacname}（本机地址 {local_ip}）")
+            self._cache[local_ip] = entry
+            while len(self._cache) > self.max_entries:
+                self._cache.pop(next(iter(self._cache)))
+        return entry
+    
+    def learn_from_response(self, headers: Mapping[str, str], body: bytes = b'') -> Optional[Dict[str, Any]]:
+        """从探测得到的门户劫持响应中学习登录URL，不产生额外请求"""
+        login_url = find_portal_url(headers, body)
+        if login_url:
+            return self.remember(login_url)
+        return None
+    
+    def get_cached(self) -> Optional[Dict[str, Any]]:
+        """获取当前本机地址对应的缓存门户参数"""
+        local_ip = self.local_ip()
+        with self._lock:
+            return self._cache.get(local_ip) if local_ip else None
+    
+    def discover(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        获取门户参数，缓存未命中时主动访问probe_url读取重定向（不跟随重定向）
+        
+        Args:
+            force: 忽略缓存重新发现
+        
+        Returns:
+            门户参数字典，已经在线或无法发现时返回None
+        """
+        if not force:
+            cached = self.get_cached()
+            if cached:
+                return cached
+        
+        import requests
+        
+        try:
+            with requests.Session() as session:
+                mount_source_adapter(session, self.source_address)
+                response = session.get(self.probe_url, timeout=self.timeout, allow_redirects=False, stream=True)
+                try:
+                    body = b''
+                    if response.status_code == 200:
+                        for chunk in response.iter_content(chunk_size=4096):
+                            body += chunk
+                            if len(body) >= 16384 or PORTAL_URL_PATTERN.search(body):
+                                break
+                finally:
+                    response.close()
+        except requests.exceptions.RequestException as e:
+            self.logger.warning(f"发现门户登录参数失败: {e}")
+            return None
+        
+        entry = self.learn_from_response(response.headers, body)
+        if entry is None:
+            self.logger.debug(f"访问 {self.probe_url} 未被门户重定向，无法发现登录参数")
+        return entry
+    
+    def resolve_login_url(self, configured_url: str = '') -> str:
+        """
+        确定本次登录使用的URL
+        
+        优先使用当前本机地址的缓存；配置的URL与本机地址一致时直接使用；
+        否则主动发现一次，仍失败时退回配置的URL
+        
+        Args:
+            configured_url: 配置文件中的 network.login_url
+        """
+        cached = self.get_cached()
+        if cached:
+            return cached['login_url']
+        
+        if configured_url:
+            wlanuserip, _, _ = parse_portal_url(configured_url)
+            if wlanuserip and wlanuserip == self.local_ip():
+                return configured_url
+        
+        entry = self.discover(force=True)
+        return entry['login_url'] if entry else configured_url
+    
+    def invalidate(self, local_ip: Optional[str] = None) -> None:
+        """
+        使缓存失效
+        
+        Args:
+            local_ip: 只清除该地址的缓存，为None时清除全部（网络地址变化时调用）
+        """
+        with self._lock:
+            if local_ip is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(local_ip, None)
+        self.logger.debug(f"门户登录参数缓存已失效: {local_ip or '全部'}")
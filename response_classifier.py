@@ -0,0 +1,175 @@
+"""
+响应分类
+流式读取响应体，一旦得出结论就停止读取：
+- 外网探测页面：逐块查找关键字，每块只检查新到达的数据（加上跨块边界所需的重叠部分）
+- quickauth.do：按JSON结构解析 code 字段，用明确的成功/失败代码判断，
+  不再在整个页面中查找 error/fail 子串
+"""
+
+import json
+from typing import Any, Iterable, Optional
+
+
+class KeywordScanner:
+    """在分块到达的响应体中查找关键字（不区分ASCII大小写）"""
+    
+    def __init__(self, keywords: Iterable[bytes]):
+        """
+        Args:
+            keywords: 已转为小写的关键字
+        """
+        self.keywords = tuple(keywords)
+        # 保留上一块末尾的若干字节，关键字跨越两个分块时也能找到
+        self._overlap = max((len(keyword) for keyword in self.keywords), default=1) - 1
+        self._tail = b''
+        self.found = False
+    
+    def feed(self, chunk: bytes) -> bool:
+        """检查新到达的一块数据，返回是否已找到关键字"""
+        if self.found:
+            return True
+        window = self._tail + chunk.lower()
+        self.found = any(keyword in window for keyword in self.keywords)
+        self._tail = window[-self._overlap:] if self._overlap else b''
+        return self.found
+
+
+class QuickauthVerdict:
+    """quickauth.do 响应的分类结果"""
+    
+    __slots__ = ('ok', 'code', 'message', 'bytes_read', 'detail', 'preview')
+    
+    def __init__(self, ok: Optional[bool], code: Optional[str] = None, message: str = '',
+                 bytes_read: int = 0, detail: str = '', preview: bytes = b''):
+        """
+        Args:
+            ok: True/False 为明确的成功/失败，None 表示响应中没有可识别的结果代码，需由外网验证决定
+            code: 响应JSON中的结果代码
+            message: 响应JSON中的提示信息
+            bytes_read: 读取的响应体字节数
+            detail: 分类说明
+            preview: 响应体开头，用于调试日志
+        """
+        self.ok = ok
+        self.code = code
+        self.message = message
+        self.bytes_read = bytes_read
+        self.detail = detail
+        self.preview = preview
+
+
+class QuickauthClassifier:
+    """
+    quickauth.do 响应分类器
+    
+    门户返回形如 {"code": "0", "message": "认证成功"} 的JSON。响应体按块读取，
+    JSON对象完整后立即解析并停止读取；响应开头不是JSON时读完第一块即停止，
+    结论交给登录后的外网验证
+    """
+    
+    # 结果代码（统一按字符串比较，兼容数字与字符串两种写法）
+    SUCCESS_CODES = frozenset({'0'})
+    FAILURE_CODES = frozenset({'1', '-1'})
+    CODE_KEYS = ('code', 'result')
+    MESSAGE_KEYS = ('message', 'msg')
+    # 判断是否为JSON前跳过的UTF-8 BOM与空白
+    LEADING_BYTES = b'\xef\xbb\xbf \t\r\n'
+    
+    def __init__(self, max_bytes: int = 65536):
+        """
+        Args:
+            max_bytes: 最多读取的响应体字节数，超过时不再等待JSON结束
+        """
+        self.max_bytes = max_bytes
+    
+    def classify(self, status_code: int, chunks: Iterable[bytes]) -> QuickauthVerdict:
+        """
+        读取并分类响应
+        
+        Args:
+            status_code: HTTP状态码
+            chunks: 响应体分块（requests的iter_content或http.client的read）
+        """
+        if status_code != 200:
+            return QuickauthVerdict(False, detail=f"状态码 {status_code}")
+        
+        reader = self.reader()
+        for chunk in chunks:
+            verdict = reader.feed(chunk)
+            if verdict is not None:
+                return verdict
+        return reader.finish()
+    
+    def reader(self) -> 'QuickauthReader':
+        """创建逐块读取的分类状态，供异步传输自行驱动读取"""
+        return QuickauthReader(self)
+    
+    def _verdict(self, document: Any, bytes_read: int, preview: bytes) -> QuickauthVerdict:
+        """根据解析出的JSON给出结论"""
+        if not isinstance(document, dict):
+            return QuickauthVerdict(None, bytes_read=bytes_read, detail="响应JSON不是对象", preview=preview)
+        
+        code = next((document[key] for key in self.CODE_KEYS if key in document), None)
+        message = next((str(document[key]) for key in self.MESSAGE_KEYS if document.get(key)), '')
+        if code is None or isinstance(code, (bool, dict, list)):
+            return QuickauthVerdict(None, message=message, bytes_read=bytes_read,
+                                    detail="响应JSON中没有结果代码", preview=preview)
+        
+        code = str(code).strip()
+        if code in self.SUCCESS_CODES:
+            ok: Optional[bool] = True
+        elif code in self.FAILURE_CODES:
+            ok = False
+        else:
+            ok = None
+        detail = f"结果代码 {code}" + (f"（{message}）" if message else '')
+        return QuickauthVerdict(ok, code=code, message=message, bytes_read=bytes_read, detail=detail, preview=preview)
+
+
+class QuickauthReader:
+    """单个 quickauth.do 响应的逐块分类状态（状态码已确认为200）"""
+    
+    def __init__(self, classifier: QuickauthClassifier):
+        self.classifier = classifier
+        self.body = bytearray()
+        self._started = False
+    
+    def feed(self, chunk: bytes) -> Optional[QuickauthVerdict]:
+        """读入一块响应体，已得出结论时返回结果，调用方应停止读取"""
+        body = self.body
+        body += chunk
+        if not self._started:
+            head = bytes(body).lstrip(self.classifier.LEADING_BYTES)
+            if not head:
+                return None
+            if head[:1] not in (b'{', b'['):
+                return self._unknown("响应不是JSON")
+            self._started = True
+        
+        # 只在本块以JSON结束符结尾（可能是完整JSON）时尝试解析
+        if chunk.rstrip()[-1:] in (b'}', b']'):
+            document = self._parse()
+            if document is not None:
+                return self.classifier._verdict(document, len(body), bytes(body[:200]))
+        if len(body) >= self.classifier.max_bytes:
+            return self._unknown(f"超过 {self.classifier.max_bytes} 字节仍未读到完整JSON")
+        return None
+    
+    def finish(self) -> QuickauthVerdict:
+        """响应体读完仍未得出结论时的结果"""
+        if not self._started:
+            return self._unknown("响应体为空")
+        document = self._parse()
+        if document is not None:
+            return self.classifier._verdict(document, len(self.body), bytes(self.body[:200]))
+        return self._unknown("响应JSON不完整或格式错误")
+    
+    def _parse(self) -> Any:
+        """解析JSON，不完整或格式错误时返回None"""
+        try:
+            return json.loads(bytes(self.body).decode('utf-8-sig'))
+        except (UnicodeDecodeError, ValueError):
+            return None
+    
+    def _unknown(self, detail: str) -> QuickauthVerdict:
+        return QuickauthVerdict(None, bytes_read=len(self.body), detail=detail, preview=bytes(self.body[:200]))
@@ -77,6 +77,10 @@ Unit=${SERVICE_NAME}.service
 WantedBy=timers.target
 EOF
 
+# 预先生成字节码：定时单次运行的服务用户可能没有写权限，否则每次启动都要重新编译源码
+echo "正在预编译Python模块..."
+/usr/bin/python3 -m compileall -q "$SCRIPT_DIR"/*.py > /dev/null
+
 # 重新加载systemd配置
 echo "重新加载systemd配置..."
 systemctl daemon-reload
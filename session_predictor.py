@@ -0,0 +1,206 @@
+"""
+会话时长预测
+门户在空闲或绝对超时后断开会话，定时检查最多要过一个检查间隔才能发现。
+这里从登录与探测历史中学习"成功登录 -> 检测到掉线"的会话时长分布，
+在预计过期前安排一次提前探测并续期登录，同时估计由此减少的离线时间
+"""
+
+import logging
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+if TYPE_CHECKING:
+    from history_store import HistoryStore
+
+
+# 登录历史中提前续期的登录原因
+RENEWAL_REASON = 'renewal'
+
+
+def sample_quantile(values: List[float], q: float) -> float:
+    """已排序列表的分位数（线性插值）"""
+    position = (len(values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+class SessionPredictor:
+    """基于历史会话时长的过期预测"""
+
+    def __init__(self, history: 'HistoryStore', min_samples: int = 3, quantile: float = 0.2,
+                 lead: float = 30, proactive_relogin: bool = True, sample_limit: int = 50):
+        """
+        初始化会话预测器
+
+        Args:
+            history: 登录与探测历史
+            min_samples: 至少观察到多少次掉线才开始预测
+            quantile: 预测使用的会话时长分位数，越小越保守（越早续期）
+            lead: 在预计过期前多少秒续期
+            proactive_relogin: 到达续期时间且仍在线时是否提前重新登录，否则只在预计过期时提前探测
+            sample_limit: 参与统计的最近会话数量
+        """
+        self.history = history
+        self.min_samples = max(1, int(min_samples))
+        self.quantile = min(max(float(quantile), 0.0), 1.0)
+        self.lead = max(0.0, float(lead))
+        self.proactive_relogin = proactive_relogin
+        self.sample_limit = sample_limit
+        self.logger = logging.getLogger(__name__)
+        # 绑定名称 -> (最近一次成功登录时间, 模型)，有新的成功登录时重新计算
+        self._models: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+        # 绑定名称 -> 已尝试续期的会话（登录时间），每个会话只续期一次
+        self._renewed: Dict[str, float] = {}
+
+    @classmethod
+    def from_config(cls, session_config: Mapping[str, Any],
+                    history: Optional['HistoryStore']) -> Optional['SessionPredictor']:
+        """根据配置文件的session部分创建预测器，未启用或没有历史存储时返回None"""
+        if history is None or not session_config.get('predictive', True):
+            return None
+        return cls(
+            history,
+            min_samples=session_config.get('min_samples', 3),
+            quantile=session_config.get('quantile', 0.2),
+            lead=session_config.get('lead', 30),
+            proactive_relogin=session_config.get('proactive_relogin', True),
+            sample_limit=session_config.get('sample_limit', 50)
+        )
+
+    @classmethod
+    def reconfigure(cls, current: Optional['SessionPredictor'], session_config: Mapping[str, Any],
+                    history: Optional['HistoryStore']) -> Optional['SessionPredictor']:
+        """
+        热更新配置：仍然启用时原地更新参数，保留每个会话只续期一次的记录；
+        切换 predictive 时重新创建或停用
+
+        Returns:
+            应继续使用的预测器，未启用时返回None
+        """
+        fresh = cls.from_config(session_config, history)
+        if current is None or fresh is None:
+            return fresh
+        current.apply_config(fresh)
+        return current
+
+    def apply_config(self, other: 'SessionPredictor') -> None:
+        """沿用续期记录，只替换参数（参数变化后按新参数重新计算模型）"""
+        self.min_samples = other.min_samples
+        self.quantile = other.quantile
+        self.lead = other.lead
+        self.proactive_relogin = other.proactive_relogin
+        self.sample_limit = other.sample_limit
+        self._models = {}
+
+    def _build_model(self, binding: str) -> Dict[str, Any]:
+        """从历史会话区间计算会话时长分布与被动发现掉线时的离线时间"""
+        # 续期与增益统计取最近的会话；会话时长取最近确实掉线的会话，续期持续成功时样本不会被挤出窗口
+        spans = self.history.session_spans(binding, self.sample_limit)
+        prevented = 0
+        for index, span in enumerate(spans):
+            # 未观察到掉线：被下一次提前续期接替的会话算作避免了一次掉线
+            following = spans[index + 1] if index + 1 < len(spans) else None
+            if span['dropped'] is None and following is not None and following['reason'] == RENEWAL_REASON:
+                prevented += 1
+
+        lifetimes, outages = [], []
+        for span in self.history.session_spans(binding, self.sample_limit, dropped_only=True):
+            # 掉线发生在最后一次在线与第一次离线的探测之间。会话时长取下限（最后一次在线），
+            # 探测稀疏时中点会高估会话时长、续期晚于过期；离线时间按中点估计
+            dropped_at = ((span['last_online'] or span['login']) + span['dropped']) / 2
+            lifetimes.append((span['last_online'] or dropped_at) - span['login'])
+            if span['next_login'] is not None:
+                outages.append(span['next_login'] - dropped_at)
+        lifetimes.sort()
+        avg_outage = sum(outages) / len(outages) if outages else None
+        return {
+            'last_login': spans[-1]['login'] if spans else None,
+            'samples': len(lifetimes),
+            'lifetime_median': sample_quantile(lifetimes, 0.5) if lifetimes else None,
+            'lifetime': sample_quantile(lifetimes, self.quantile) if len(lifetimes) >= self.min_samples else None,
+            'avg_outage': avg_outage,
+            'renewals': sum(1 for span in spans if span['reason'] == RENEWAL_REASON),
+            'prevented_drops': prevented,
+            'estimated_gain': prevented * avg_outage if avg_outage is not None else None
+        }
+
+    def model(self, binding: str = '') -> Dict[str, Any]:
+        """某条链路的会话模型（有新的成功登录时重新计算）"""
+        last = self.history.last_login('success', binding=binding)
+        last_ts = last['ts'] if last else 0.0
+        cached = self._models.get(binding)
+        if cached is None or cached[0] != last_ts:
+            cached = (last_ts, self._build_model(binding))
+            self._models[binding] = cached
+            self.logger.debug(f"会话模型已更新{f'（{binding}）' if binding else ''}: {cached[1]}")
+        return cached[1]
+
+    def expiry(self, binding: str = '') -> Optional[float]:
+        """当前会话的预计过期时间（Unix时间戳），样本不足时返回None"""
+        model = self.model(binding)
+        if model['lifetime'] is None or model['last_login'] is None:
+            return None
+        return model['last_login'] + model['lifetime']
+
+    def renewal_time(self, binding: str = '') -> Optional[float]:
+        """下一次提前探测（及续期）的时间"""
+        expiry = self.expiry(binding)
+        if expiry is None:
+            return None
+        if not self.proactive_relogin:
+            return expiry
+        renewal = expiry - self.lead
+        # 预测的会话时长比提前量还短时不续期，避免刚登录就再次登录
+        return renewal if renewal > self.model(binding)['last_login'] + self.lead else None
+
+    def renewal_due(self, binding: str = '', now: Optional[float] = None) -> bool:
+        """当前会话是否已到续期时间（每个会话只续期一次，续期失败后回到被动检测）"""
+        if not self.proactive_relogin:
+            return False
+        renewal = self.renewal_time(binding)
+        if renewal is None or renewal > (now or time.time()):
+            return False
+        session = self.model(binding)['last_login']
+        if self._renewed.get(binding) == session:
+            return False
+        self._renewed[binding] = session
+        return True
+
+    def clamp_interval(self, interval: float, bindings: Iterable[str] = ('',),
+                       now: Optional[float] = None) -> Tuple[float, bool]:
+        """
+        把等待时间缩短到最近的续期时间
+
+        Args:
+            interval: 调度器给出的等待时间（秒）
+            bindings: 要考虑的链路名称
+            now: 当前时间，默认 time.time()
+
+        Returns:
+            (等待时间, 是否因会话预测而缩短)
+        """
+        now = now or time.time()
+        upcoming = [
+            renewal for renewal in (self.renewal_time(binding) for binding in bindings)
+            if renewal is not None and renewal > now
+        ]
+        if upcoming and min(upcoming) - now < interval:
+            return round(max(1.0, min(upcoming) - now), 2), True
+        return interval, False
+
+    def summary(self, binding: str = '') -> Dict[str, Any]:
+        """状态展示用的会话统计"""
+        model = self.model(binding)
+        return {
+            'samples': model['samples'],
+            'lifetime_median': round(model['lifetime_median'], 1) if model['lifetime_median'] is not None else None,
+            'lifetime_quantile': round(model['lifetime'], 1) if model['lifetime'] is not None else None,
+            'quantile': self.quantile,
+            'expiry': self.expiry(binding),
+            'next_renewal': self.renewal_time(binding),
+            'renewals': model['renewals'],
+            'prevented_drops': model['prevented_drops'],
+            'avg_outage': round(model['avg_outage'], 1) if model['avg_outage'] is not None else None,
+            'estimated_gain': round(model['estimated_gain'], 1) if model['estimated_gain'] is not None else None
+        }
@@ -0,0 +1,73 @@
+"""
+源地址绑定
+多条上行链路的网关上，每条链路的探测与登录必须从该链路的地址发出，
+门户才会按对应的 wlanuserip 认证。这里负责把网卡名解析为地址，并把HTTP会话绑定到源地址
+"""
+
+import socket
+import struct
+import sys
+from typing import TYPE_CHECKING, Any, Optional
+
+if TYPE_CHECKING:
+    import requests
+
+# Linux ioctl：读取网卡的IPv4地址
+SIOCGIFADDR = 0x8915
+
+
+def interface_address(interface: str) -> Optional[str]:
+    """
+    获取网卡当前的IPv4地址（仅Linux）
+    
+    Returns:
+        地址字符串，网卡不存在、没有地址或平台不支持时返回None
+    """
+    if not sys.platform.startswith('linux'):
+        return None
+    import fcntl
+    
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        packed = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack('256s', interface[:15].encode('utf-8')))
+        return socket.inet_ntoa(packed[20:24])
+    except OSError:
+        return None
+    finally:
+        sock.close()
+
+
+def resolve_source_address(source_ip: str = '', interface: str = '') -> Optional[str]:
+    """
+    确定绑定使用的源地址：配置了source_ip时直接使用，否则读取网卡地址
+    
+    Returns:
+        源地址，两者都未配置或网卡暂时没有地址时返回None
+    """
+    if source_ip:
+        return source_ip
+    if interface:
+        return interface_address(interface)
+    return None
+
+
+def mount_source_adapter(session: 'requests.Session', source_address: Optional[str],
+                         pool_connections: int = 10, pool_maxsize: int = 10, max_retries: Any = 0) -> None:
+    """
+    为会话挂载连接池适配器，source_address不为空时所有连接从该地址发出
+    
+    Args:
+        session: requests会话
+        source_address: 源地址，为None时不绑定
+        pool_connections: 连接池缓存的主机数量
+        pool_maxsize: 每个主机保持的最大连接数
+        max_retries: 重试次数或urllib3 Retry对象
+    """
+    from requests.adapters import HTTPAdapter
+    
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=max_retries)
+    if source_address:
+        # 重新创建连接池管理器，附带源地址参数（端口0表示由系统分配）
+        adapter.init_poolmanager(pool_connections, pool_maxsize, source_address=(source_address, 0))
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
@@ -0,0 +1,109 @@
+"""
+多链路绑定
+网关有多条上行链路时，每条链路各自在门户登录（各自的 wlanuserip）。
+每个绑定持有绑定到该链路源地址的检查器、认证器与门户发现器，由同一个进程并发检查与登录
+"""
+
+import logging
+from typing import TYPE_CHECKING, Any, Mapping, Optional
+
+from config_snapshot import BindingSettings
+from henu_login_lib import HENUAuthenticator, NetworkChecker
+from portal_discovery import PortalDiscovery
+from source_binding import interface_address, resolve_source_address
+
+if TYPE_CHECKING:
+    from history_store import HistoryStore
+
+
+class UplinkBinding:
+    """一条上行链路的登录组件"""
+    
+    def __init__(self, settings: BindingSettings, network_config: Mapping[str, Any],
+                 endpoints: Optional[Mapping[str, str]] = None, history: Optional['HistoryStore'] = None):
+        """
+        初始化链路绑定
+        
+        Args:
+            settings: bindings 中的一项
+            network_config: 配置文件的network部分（超时、探测方式等各链路共用）
+            endpoints: 配置文件的portal部分
+            history: 登录与探测历史，记录时带上绑定名称
+        """
+        self.settings = settings
+        self.name = settings.name
+        self.logger = logging.getLogger(__name__)
+        self.source_address = resolve_source_address(settings.source_ip, settings.interface)
+        # 上一次检查的结论，None表示尚未检查或没有可用的源地址
+        self.connected: Optional[bool] = None
+        
+        self.network_checker = NetworkChecker.from_config(network_config, source_address=self.source_address)
+        self.network_checker.history = history
+        self.network_checker.label = self.name
+        self.portal_discovery: Optional[PortalDiscovery] = None
+        if network_config.get('auto_discover', True):
+            self.portal_discovery = PortalDiscovery(
+                probe_url=network_config.get('test_url', 'http://www.baidu.com'),
+                timeout=network_config.get('timeout', 5),
+                source_address=self.source_address
+            )
+            self.network_checker.discovery = self.portal_discovery
+        self.authenticator = HENUAuthenticator(
+            timeout=network_config.get('timeout', 10),
+            parallel_steps=network_config.get('parallel_login_steps', True),
+            endpoints=endpoints,
+            history=history,
+            source_address=self.source_address,
+            dns_cache=self.network_checker.dns_cache
+        )
+        self.authenticator.label = self.name
+    
+    def describe(self) -> str:
+        """用于日志与状态显示的链路说明，如 "wan1（eth1 10.0.0.2）" """
+        parts = [self.settings.interface, self.source_address or '无地址']
+        return f"{self.name}（{' '.join(part for part in parts if part)}）"
+    
+    def refresh_source(self) -> bool:
+        """
+        按网卡名重新读取源地址（DHCP续租、链路重连后地址可能变化）
+        
+        地址变化时重建检查器与认证器的会话，并使该链路缓存的门户参数失效
+        
+        Returns:
+            源地址是否发生变化
+        """
+        if self.settings.source_ip or not self.settings.interface:
+            return False
+        address = interface_address(self.settings.interface)
+        if address == self.source_address:
+            return False
+        
+        self.logger.info(f"链路 {self.name} 的源地址变化: {self.source_address or '无'} -> {address or '无'}")
+        self.source_address = address
+        self.connected = None
+        self.network_checker.set_source_address(address)
+        self.authenticator.set_source_address(address)
+        if self.portal_discovery:
+            self.portal_discovery.source_address = address
+            self.portal_discovery.invalidate()
+        return True
+    
+    def resolve_login_url(self, default_url: str = '') -> str:
+        """确定该链路的登录URL：优先使用该源地址发现的门户参数，其次是绑定或全局配置的URL"""
+        configured_url = self.settings.login_url or default_url
+        if self.portal_discovery is None:
+            return configured_url
+        return self.portal_discovery.resolve_login_url(configured_url)
+    
+    def apply_config(self, network_config: Mapping[str, Any], endpoints: Optional[Mapping[str, str]] = None) -> None:
+        """热更新共用的超时、探测方式与接口地址"""
+        self.network_checker.apply_config(network_config)
+        self.authenticator.apply_config(network_config, endpoints)
+        if self.portal_discovery:
+            self.portal_discovery.probe_url = network_config.get('test_url', 'http://www.baidu.com')
+            self.portal_discovery.timeout = network_config.get('timeout', 5)
+    
+    def close(self) -> None:
+        """关闭该链路的连接池与登录会话"""
+        self.network_checker.close()
+        self.authenticator.close()
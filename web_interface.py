@@ -7,15 +7,26 @@
 import os
 import sys
 import json
+import logging
 import threading
 import time
 from datetime import datetime
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, Response, render_template, request, jsonify, send_from_directory
 from flask_cors import CORS
 
 from henu_login_lib import NetworkChecker, HENUAuthenticator, HENULoginError
-from config_manager import ConfigManager
+from portal_discovery import PortalDiscovery
+from network_status import NetworkStatusService
+from log_reader import LogTailReader
+from event_stream import BroadcastLogHandler, EventBroadcaster, format_sse
+from config_manager import ConfigManager, thaw
+from config_watcher import ConfigWatcher
+from credential_manager import CredentialVault
 from logger_setup import LoggerSetup
+from adaptive_scheduler import AdaptiveScheduler
+from history_store import HistoryStore
+from session_predictor import RENEWAL_REASON, SessionPredictor
+import metrics
 
 app = Flask(__name__, static_folder='web_static', template_folder='web_templates')
 CORS(app)
@@ -27,11 +38,24 @@ network_checker = None
 logger = None
 auto_login_thread = None
 auto_login_running = False
+link_monitor = None
+scheduler = None
+portal_discovery = None
+status_service = None
+log_reader = None
+event_broadcaster = EventBroadcaster()
+status_pump_thread = None
+status_pump_lock = threading.Lock()
+config_watcher = None
+credential_vault = None
+history = None
+session_predictor = None
 
 
 def init_app():
     """初始化应用"""
-    global config_manager, authenticator, network_checker, logger
+    global config_manager, authenticator, network_checker, logger, portal_discovery, status_service, config_watcher
+    global credential_vault, history, session_predictor
     
     # 加载配置
     config_manager = ConfigManager()
@@ -41,51 +65,252 @@ def init_app():
     logger = LoggerSetup.setup_logger(
         level=log_config.get('level', 'INFO'),
         log_file=log_config.get('file', 'auto_login.log'),
-        console_output=True
+        console_output=True,
+        async_queue=log_config.get('async_queue', True),
+        queue_size=log_config.get('queue_size', 10000),
+        log_format=log_config.get('format', 'text'),
+        index_bucket=log_config.get('index_bucket', 60)
     )
     
+    # 日志同时推送给事件流订阅者
+    stream_handler = BroadcastLogHandler(event_broadcaster)
+    stream_handler.setFormatter(logging.Formatter(
+        LoggerSetup.DETAILED_FORMAT, datefmt=LoggerSetup.DETAILED_DATE_FORMAT
+    ))
+    logger.addHandler(stream_handler)
+    
     # 初始化组件
+    history = HistoryStore.from_config(config_manager.config.get('history', {}))
     network_config = config_manager.config.get('network', {})
-    network_checker = NetworkChecker(
-        test_url=network_config.get('test_url', 'http://www.baidu.com')
+    network_checker = NetworkChecker.from_config(network_config)
+    network_checker.history = history
+    if network_config.get('auto_discover', True):
+        portal_discovery = PortalDiscovery(
+            probe_url=network_config.get('test_url', 'http://www.baidu.com'),
+            timeout=network_config.get('timeout', 5)
+        )
+        network_checker.discovery = portal_discovery
+    status_service = NetworkStatusService.from_config(network_checker, network_config)
+    status_service.listeners.append(broadcast_status)
+    credential_vault = CredentialVault.from_config(config_manager.config.get('security', {}))
+    authenticator = HENUAuthenticator(
+        timeout=network_config.get('timeout', 10),
+        parallel_steps=network_config.get('parallel_login_steps', True),
+        endpoints=config_manager.config.get('portal'),
+        history=history,
+        dns_cache=network_checker.dns_cache
     )
-    authenticator = HENUAuthenticator(timeout=network_config.get('timeout', 10))
+    session_predictor = SessionPredictor.from_config(config_manager.config.get('session', {}), history)
+    
+    # 配置变化（文件被修改或通过界面保存）后热更新各组件
+    config_manager.subscribe(apply_config)
+    hot_reload_config = config_manager.config.get('hot_reload', {})
+    if hot_reload_config.get('enabled', True):
+        config_watcher = ConfigWatcher(
+            config_manager,
+            poll_interval=hot_reload_config.get('poll_interval', 2.0)
+        ).start()
     
     logger.info("Web界面已初始化")
 
 
+def apply_config(config):
+    """
+    把新配置快照应用到各组件，无需重启（在配置监视线程或Web请求线程中执行）
+    
+    检查器与认证器只记录新配置，在下一次检查或登录开始时由执行它的线程应用；
+    调度器与会话预测器由自动登录线程在下一次检查前应用（apply_worker_config）
+    """
+    network_config = config.get('network', {})
+    network_checker.apply_config(network_config)
+    authenticator.apply_config(network_config, config.get('portal'))
+    status_service.ttl = max(0.0, float(network_config.get('status_ttl', 10)))
+    if portal_discovery:
+        portal_discovery.probe_url = network_config.get('test_url', 'http://www.baidu.com')
+        portal_discovery.timeout = network_config.get('timeout', 5)
+    level = config.get('logging', {}).get('level', 'INFO')
+    logger.setLevel(getattr(logging, level.upper(), logging.INFO))
+    logger.info("新配置已生效")
+    if link_monitor:
+        link_monitor.wakeup()
+    broadcast_status()
+
+
+def apply_worker_config(config):
+    """把新配置应用到自动登录线程使用的调度器与会话预测器（在该线程中调用）"""
+    global session_predictor
+    scheduler.apply_config(config.get('scheduler', {}))
+    session_predictor = SessionPredictor.reconfigure(session_predictor, config.get('session', {}), history)
+
+
+def get_credentials() -> dict:
+    """获取登录凭证，配置中的密文由凭证保险库解密（结果在有效期内缓存）"""
+    credentials = config_manager.settings.credentials
+    if not credentials.encrypted:
+        return credentials.as_dict()
+    return credential_vault.decrypt_credentials({**credentials.as_dict(), 'encrypted': True})
+
+
+def resolve_login_url() -> str:
+    """确定登录URL：启用自动发现时优先使用当前网络地址对应的门户参数"""
+    configured_url = config_manager.settings.network.login_url
+    if portal_discovery is None:
+        return configured_url
+    return portal_discovery.resolve_login_url(configured_url)
+
+
+def build_status(network_status: dict) -> dict:
+    """组装 /api/status 与 status 事件共用的状态数据"""
+    auth_status = authenticator.get_status()
+    settings = config_manager.settings
+    
+    return {
+        'network': {
+            'connected': network_status['connected'],
+            'checked_at': datetime.fromtimestamp(network_status['checked_at']).isoformat(),
+            'age': network_status['age'],
+            'stale': network_status['stale'],
+            'test_url': settings.network.test_url,
+            'probe_type': network_status['probe_type'],
+            'last_probe': network_status['last_probe'],
+            'socket': network_status['socket']
+        },
+        'auth': {
+            'last_login_time': auth_status['last_login_time'],
+            'login_count': auth_status['login_count'],
+            'session_active': auth_status['session_active'],
+            'last_step_timings': auth_status['last_step_timings']
+        },
+        'config': {
+            'username': get_credentials()['username'],
+            'operator': settings.credentials.operator,
+            'login_url': settings.network.login_url,
+            'discovered_login_url': (portal_discovery.get_cached() or {}).get('login_url')
+            if portal_discovery else None,
+            'auto_login_enabled': auto_login_running,
+            'check_interval': settings.scheduler.check_interval,
+            'scheduler': scheduler.get_status() if scheduler else None
+        },
+        'history': history.summary() if history else None,
+        'session': session_predictor.summary() if session_predictor else None,
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def broadcast_status(network_status: dict = None) -> None:
+    """向事件流订阅者推送最新状态（没有订阅者时什么都不做）"""
+    if not event_broadcaster.has_subscribers('status'):
+        return
+    try:
+        event_broadcaster.publish('status', build_status(network_status or status_service.get()))
+    except Exception as e:
+        logger.debug(f"推送状态事件失败: {e}")
+
+
+def broadcast_login(username: str, success: bool, error: str = None) -> None:
+    """推送一次登录事件"""
+    event_broadcaster.publish('login', {
+        'username': username,
+        'success': success,
+        'error': error,
+        'step_timings': authenticator.last_step_timings,
+        'timestamp': datetime.now().isoformat()
+    })
+
+
+def status_pump():
+    """有订阅者时按TTL驱动状态刷新，新结果经监听器推送；没有订阅者后退出"""
+    global status_pump_thread
+    
+    while True:
+        with status_pump_lock:
+            if not event_broadcaster.has_subscribers('status'):
+                status_pump_thread = None
+                return
+        status_service.get()
+        time.sleep(max(1.0, status_service.ttl))
+
+
+def ensure_status_pump():
+    """确保状态推送线程在运行（所有客户端共享一个）"""
+    global status_pump_thread
+    
+    with status_pump_lock:
+        if status_pump_thread is None:
+            status_pump_thread = threading.Thread(target=status_pump, name='henu-status-pump', daemon=True)
+            status_pump_thread.start()
+
+
 def auto_login_worker():
     """自动登录工作线程"""
     global auto_login_running
     
     logger.info("自动登录线程已启动")
     
-    scheduler_config = config_manager.config.get('scheduler', {})
-    check_interval = scheduler_config.get('check_interval', 300)
+    global scheduler
+    scheduler = AdaptiveScheduler.from_config(config_manager.config.get('scheduler', {}))
+    if history:
+        scheduler.restore(history.consecutive_login_failures())
     
+    def wait_for_next_check(timeout):
+        events = link_monitor.wait(timeout)
+        if events and auto_login_running:
+            logger.info(f"检测到网络变化: {', '.join(events)}，立即检查")
+            network_checker.reset_session()
+            if portal_discovery and any(e.startswith('address') for e in events):
+                portal_discovery.invalidate()
+    
+    def login(reason=''):
+        # 获取凭证并登录
+        creds = get_credentials()
+                
+        success = authenticator.login(
+            url=resolve_login_url(),
+            username=creds['username'],
+            password=creds['password'],
+            operator=creds['operator'],
+            reason=reason
+        )
+        logger.info(f"自动登录{'成功' if success else '失败'}", extra={
+            'event': 'login', 'account': creds['username'], 'outcome': 'success' if success else 'failure',
+            'latency': authenticator.last_step_timings.get('total'), 'steps': authenticator.last_step_timings
+        })
+        broadcast_login(creds['username'], success)
+        if success:
+            network_checker.reset_session()
+            status_service.invalidate()
+        return success
+            
+    applied_version = None
     while auto_login_running:
         try:
-            # 检查网络状态
-            if not network_checker.check_internet_connection():
+            # 启动后与配置变化后，先在本线程中应用最新配置
+            if config_manager.version != applied_version:
+                applied_version = config_manager.version
+                apply_worker_config(config_manager.config)
+            
+            # 检查网络状态（与状态查询共享同一次探测）
+            connected = status_service.refresh()['connected']
+            scheduler.record_check(connected)
+            if not connected:
                 logger.info("检测到网络未连接，尝试登录...")
-                
-                # 获取凭证并登录
-                network_config = config_manager.config.get('network', {})
-                creds = config_manager.get_credentials()
-                
-                authenticator.login(
-                    url=network_config.get('login_url', ''),
-                    username=creds['username'],
-                    password=creds['password'],
-                    operator=creds['operator']
-                )
+                scheduler.record_login(login())
+            elif session_predictor and session_predictor.renewal_due():
+                logger.info("会话预计即将过期，提前重新登录")
+                # 续期失败时原会话可能仍然有效，不按登录失败退避
+                if login(RENEWAL_REASON):
+                    scheduler.record_login(True)
             
-            # 等待下一次检查
-            time.sleep(check_interval)
+            # 等待下一次检查，网络变化时提前唤醒；会话预计过期前提前检查
+            interval = scheduler.next_interval()
+            if session_predictor:
+                interval, _ = session_predictor.clamp_interval(interval)
+            wait_for_next_check(interval)
             
         except Exception as e:
             logger.error(f"自动登录线程错误: {e}", exc_info=True)
-            time.sleep(30)
+            scheduler.record_error()
+            wait_for_next_check(scheduler.next_interval())
     
     logger.info("自动登录线程已停止")
 
@@ -100,44 +325,64 @@ def index():
 def get_status():
     """获取系统状态"""
     try:
-        # 网络状态
-        is_connected = network_checker.check_internet_connection()
-        
-        # 认证器状态
-        auth_status = authenticator.get_status()
-        
-        # 配置状态
-        creds = config_manager.get_credentials()
-        network_config = config_manager.config.get('network', {})
-        scheduler_config = config_manager.config.get('scheduler', {})
+        # 网络状态：读取后台探测发布的缓存，refresh=1时强制探测
+        if request.args.get('refresh') in ('1', 'true'):
+            network_status = status_service.refresh()
+        else:
+            network_status = status_service.get()
         
         return jsonify({
             'success': True,
-            'data': {
-                'network': {
-                    'connected': is_connected,
-                    'test_url': network_config.get('test_url', '')
-                },
-                'auth': {
-                    'last_login_time': auth_status['last_login_time'],
-                    'login_count': auth_status['login_count'],
-                    'session_active': auth_status['session_active']
-                },
-                'config': {
-                    'username': creds['username'],
-                    'operator': creds['operator'],
-                    'login_url': network_config.get('login_url', ''),
-                    'auto_login_enabled': auto_login_running,
-                    'check_interval': scheduler_config.get('check_interval', 300)
-                },
-                'timestamp': datetime.now().isoformat()
-            }
+            'data': build_status(network_status)
         })
     except Exception as e:
         logger.error(f"获取状态失败: {e}", exc_info=True)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/stream')
+def stream_events():
+    """
+    以Server-Sent Events推送日志、状态与登录事件
+    
+    查询参数topics可选 log,status,login（逗号分隔），默认全部
+    """
+    topics = [t for t in request.args.get('topics', '').split(',') if t] or None
+    subscription = event_broadcaster.subscribe(topics)
+    initial = None
+    if subscription.wants('status'):
+        ensure_status_pump()
+        initial = format_sse('status', build_status(status_service.get()))
+    
+    def generate():
+        try:
+            yield 'retry: 3000\n\n'
+            if initial:
+                yield initial
+            while True:
+                frame = subscription.get(timeout=15)
+                # 定期发送注释行保活，同时及时发现已断开的客户端
+                yield frame if frame is not None else ': keepalive\n\n'
+        finally:
+            event_broadcaster.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+
+@app.route('/metrics')
+def get_metrics():
+    """以Prometheus文本格式导出运行指标"""
+    metrics.REGISTRY.gauge('henu_auto_login_enabled', '自动登录线程是否运行').set(1 if auto_login_running else 0)
+    if scheduler:
+        metrics.REGISTRY.gauge(
+            'henu_check_interval_seconds', '自适应调度器当前的检查间隔（秒）'
+        ).set(scheduler.get_status()['current_interval'])
+    return Response(metrics.REGISTRY.render(), content_type=metrics.CONTENT_TYPE)
+
+
 @app.route('/api/login', methods=['POST'])
 def do_login():
     """执行登录"""
@@ -145,13 +390,12 @@ def do_login():
         data = request.json or {}
         
         # 使用请求中的凭证或配置中的凭证
-        network_config = config_manager.config.get('network', {})
-        creds = config_manager.get_credentials()
+        creds = get_credentials()
         
         username = data.get('username') or creds['username']
         password = data.get('password') or creds['password']
         operator = data.get('operator') or creds['operator']
-        login_url = data.get('login_url') or network_config.get('login_url', '')
+        login_url = data.get('login_url') or resolve_login_url()
         
         # 验证参数
         if not all([username, password, login_url]):
@@ -167,6 +411,14 @@ def do_login():
             password=password,
             operator=operator
         )
+        logger.info(f"手动登录{'成功' if success else '失败'}", extra={
+            'event': 'login', 'account': username, 'outcome': 'success' if success else 'failure',
+            'latency': authenticator.last_step_timings.get('total'), 'steps': authenticator.last_step_timings
+        })
+        broadcast_login(username, success)
+        if success:
+            network_checker.reset_session()
+            status_service.invalidate()
         
         return jsonify({
             'success': success,
@@ -183,7 +435,7 @@ def handle_config():
     """获取或更新配置"""
     if request.method == 'GET':
         # 获取配置（隐藏敏感信息）
-        config = config_manager.config.copy()
+        config = thaw(config_manager.config)
         if 'credentials' in config and 'password' in config['credentials']:
             config['credentials']['password'] = '******'
         
@@ -201,9 +453,10 @@ def handle_config():
                 original_password = config_manager.get('credentials.password')
                 new_config['credentials']['password'] = original_password
             
-            # 更新配置
-            config_manager.config = new_config
-            config_manager.save_config()
+            # 校验、原子写入并发布新快照，工作线程始终读到完整的新配置或旧配置
+            success, errors = config_manager.update_config(new_config)
+            if not success:
+                return jsonify({'success': False, 'error': '; '.join(errors)}), 400
             
             return jsonify({
                 'success': True,
@@ -218,7 +471,7 @@ def handle_config():
 @app.route('/api/auto_login', methods=['POST'])
 def toggle_auto_login():
     """启动/停止自动登录"""
-    global auto_login_running, auto_login_thread
+    global auto_login_running, auto_login_thread, link_monitor
     
     try:
         data = request.json or {}
@@ -226,10 +479,19 @@ def toggle_auto_login():
         
         if enable and not auto_login_running:
             # 启动自动登录
+            if link_monitor is None:
+                from link_monitor import LinkMonitor
+                scheduler_settings = config_manager.settings.scheduler
+                link_monitor = LinkMonitor(
+                    debounce=scheduler_settings.link_debounce,
+                    enabled=scheduler_settings.event_driven
+                )
             auto_login_running = True
             auto_login_thread = threading.Thread(target=auto_login_worker, daemon=True)
             auto_login_thread.start()
             
+            broadcast_status()
+            
             return jsonify({
                 'success': True,
                 'message': '自动登录已启动'
@@ -238,9 +500,13 @@ def toggle_auto_login():
         elif not enable and auto_login_running:
             # 停止自动登录
             auto_login_running = False
+            if link_monitor:
+                link_monitor.wakeup()
             if auto_login_thread:
                 auto_login_thread.join(timeout=5)
             
+            broadcast_status()
+            
             return jsonify({
                 'success': True,
                 'message': '自动登录已停止'
@@ -256,12 +522,95 @@ def toggle_auto_login():
         return jsonify({'success': False, 'error': str(e)}), 500
 
 
+@app.route('/api/history')
+def get_history():
+    """获取最近的登录与网络检查记录"""
+    if history is None:
+        return jsonify({'success': False, 'error': '未启用历史记录（history.enabled）'}), 404
+    try:
+        limit = min(int(request.args.get('limit', 20)), 500)
+        window = float(request.args.get('window', 86400))
+        return jsonify({
+            'success': True,
+            'data': {
+                'logins': history.recent_logins(limit),
+                'probes': history.recent_probes(limit),
+                'summary': history.summary(window)
+            }
+        })
+    except Exception as e:
+        logger.error(f"读取历史记录失败: {e}", exc_info=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+
+def get_log_reader() -> LogTailReader:
+    """获取日志读取器，日志文件配置变化时重新创建"""
+    global log_reader
+    
+    logging_settings = config_manager.settings.logging
+    log_file = logging_settings.file
+    if log_reader is None or log_reader.log_file != log_file:
+        log_reader = LogTailReader(log_file, backup_count=logging_settings.backup_count)
+    return log_reader
+
+
+def render_record(record: dict) -> str:
+    """JSON行日志记录转换为界面显示的文本行"""
+    return f"{record.get('time')} - {record.get('level')} - {record.get('msg')}"
+
+
+def render_line(line: str) -> str:
+    """JSON行格式的日志行转换为文本，无法解析的行原样返回"""
+    if not line.startswith('{'):
+        return line
+    try:
+        return render_record(json.loads(line))
+    except ValueError:
+        return line
+
+
+def parse_since(value: str) -> float:
+    """since参数：Unix时间戳或ISO格式时间"""
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+
 @app.route('/api/logs')
 def get_logs():
-    """获取日志"""
+    """
+    获取日志
+    
+    默认返回最后lines行；带since（Unix时间戳或ISO时间）或level（DEBUG/INFO/WARNING/ERROR）参数时，
+    按条件查询JSON行格式的日志（需要 logging.format 为json），返回结构化记录
+    """
     try:
-        log_file = config_manager.get('logging.file', 'auto_login.log')
+        reader = get_log_reader()
+        log_file = reader.log_file
         lines = int(request.args.get('lines', 100))
+        since_arg = request.args.get('since')
+        level_arg = request.args.get('level')
+        
+        if since_arg or level_arg:
+            if config_manager.settings.logging.format != 'json':
+                return jsonify({'success': False, 'error': '按条件查询需要 logging.format 设置为 json'}), 400
+            try:
+                since = parse_since(since_arg) if since_arg else None
+            except ValueError:
+                return jsonify({'success': False, 'error': f'无效的since参数: {since_arg}'}), 400
+            level = logging.getLevelName(level_arg.upper()) if level_arg else None
+            if level is not None and not isinstance(level, int):
+                return jsonify({'success': False, 'error': f'无效的level参数: {level_arg}'}), 400
+            
+            records = reader.query(since=since, level=level, limit=lines)
+            return jsonify({
+                'success': True,
+                'data': {
+                    'records': records,
+                    'logs': [render_record(record) for record in records]
+                }
+            })
         
         if not os.path.exists(log_file):
             return jsonify({
@@ -272,16 +621,15 @@ def get_logs():
                 }
             })
         
-        # 读取最后N行日志
-        with open(log_file, 'r', encoding='utf-8') as f:
-            all_lines = f.readlines()
-            recent_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-        
+        # 从文件末尾反向读取最后N行，不足时继续读取轮转的备份文件
+        logs = [line.strip() for line in reader.tail(lines)]
+        if config_manager.settings.logging.format == 'json':
+            logs = [render_line(line) for line in logs]
         return jsonify({
             'success': True,
             'data': {
-                'logs': [line.strip() for line in recent_lines],
-                'total_lines': len(all_lines)
+                'logs': logs,
+                'total_lines': reader.count_lines()
             }
         })
         